@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Float
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, DateTime, Float, Index, and_, func, or_, select, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime
 import os
 
+from services import birth_rate_store, generations, production_cache, week_calendar
+
 # --- DATABASE SETUP ---
 # Use absolute path to ensure database persists across server restarts
 DB_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,6 +14,8 @@ DATABASE_URL = f"sqlite:///{os.path.join(DB_DIR, DB_NAME)}"
 Base = declarative_base()
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Bumps services.generations counters after commits touching summary inputs
+generations.track_session_writes(SessionLocal)
 
 # --- MODELS ---
 # --- MODELS ---
@@ -93,6 +97,9 @@ class VenditaAssegnazione(Base):
 # --- PRODUCTION CACHE MODEL (as per RULES.md) ---
 class ProductionCache(Base):
     __tablename__ = "production_cache"
+    __table_args__ = (
+        Index("ux_production_cache_lotto_week", "lotto_id", "anno", "settimana", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     anno = Column(Integer, index=True)
@@ -104,6 +111,51 @@ class ProductionCache(Base):
     valid = Column(Boolean, default=True)
     calculated_at = Column(DateTime, default=datetime.utcnow)
 
+# --- WEEKLY PRODUCT TOTALS (riepilogo G001 materializzato, services.weekly_totals) ---
+class WeeklyProductTotal(Base):
+    __tablename__ = "weekly_product_totals"
+    __table_args__ = (
+        Index("ux_weekly_product_totals_week", "prodotto", "week_key", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    prodotto = Column(String)
+    anno = Column(Integer)
+    settimana = Column(Integer)
+    week_key = Column(Integer)  # anno * 100 + settimana (services.week_calendar), range-scanned
+    produzione_lorda = Column(Integer, default=0)
+    produzione_netta = Column(Integer, default=0)  # sheds after sales decurtation
+    manuali = Column(Integer, default=0)
+    acquisti = Column(Integer, default=0)
+    vendite = Column(Integer, default=0)
+    vendite_non_assegnate = Column(Integer, default=0)
+    totale_netto = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "prodotto": self.prodotto,
+            "anno": self.anno,
+            "settimana": self.settimana,
+            "week_key": self.week_key,
+            "produzione_lorda": self.produzione_lorda,
+            "produzione_netta": self.produzione_netta,
+            "manuali": self.manuali,
+            "acquisti": self.acquisti,
+            "vendite": self.vendite,
+            "vendite_non_assegnate": self.vendite_non_assegnate,
+            "totale_netto": self.totale_netto,
+        }
+
+# Weeks whose weekly_product_totals rows are stale, written in the same
+# transaction as the input change; week_key NULL = weeks unknown (full refresh)
+class WeeklyTotalsPending(Base):
+    __tablename__ = "weekly_totals_pending"
+
+    id = Column(Integer, primary_key=True, index=True)
+    week_key = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # --- GENETIC CONFIG MODEL (T006 - Genetica Gallina) ---
 class GeneticConfig(Base):
     __tablename__ = "genetic_config"
@@ -219,7 +271,7 @@ class Incubation(Base):
     __tablename__ = "incubations"
     
     id = Column(Integer, primary_key=True, index=True)
-    data_incubazione = Column(String)  # YYYY-MM-DD
+    data_incubazione = Column(String, index=True)  # YYYY-MM-DD
     data_schiusa = Column(String)  # YYYY-MM-DD (calculated: +21 days)
     pre_incubazione_ore = Column(Integer, default=0)  # Pre-incubation hours
     partenza_macchine = Column(String)  # HH:MM
@@ -294,6 +346,30 @@ class IncubationBatch(Base):
         }
 
 
+# --- INCUBATOR MACHINE MODEL (capacità per incubatrice) ---
+class IncubatorMachine(Base):
+    __tablename__ = "incubator_machines"
+
+    nome = Column(String, primary_key=True)  # "1".."19", "1F".."4F" as in Incubation.incubatrici
+    capacita = Column(Integer, default=0)  # Eggs the machine holds
+    ordine = Column(Integer, default=0)
+
+    def to_dict(self):
+        return {
+            "nome": self.nome,
+            "capacita": self.capacita or 0,
+            "ordine": self.ordine,
+        }
+
+
+# Seeded by init_db on an empty table; the total is the 387,200 places T017 has always
+# assumed (MAX_INCUBABILE), split over the 19 main machines and the 4 F ones
+INCUBATOR_MACHINE_DEFAULTS = (
+    [(str(n), 19200) for n in range(1, 20)]
+    + [(f"{n}F", 5600) for n in range(1, 5)]
+)
+
+
 # --- PLANNING TABLE SETTINGS MODEL ---
 class PlanningTableSettings(Base):
     __tablename__ = "planning_table_settings"
@@ -593,6 +669,21 @@ def init_db():
              conn.commit()
         except Exception:
              pass
+        # Production cache unique (lotto_id, anno, settimana): drop duplicates
+        # (keeping the most recent row) before creating the index
+        try:
+             conn.execute(text(
+                 "DELETE FROM production_cache WHERE id NOT IN ("
+                 "SELECT MAX(id) FROM production_cache GROUP BY lotto_id, anno, settimana)"
+             ))
+             conn.execute(text(
+                 "CREATE UNIQUE INDEX IF NOT EXISTS ux_production_cache_lotto_week "
+                 "ON production_cache (lotto_id, anno, settimana)"
+             ))
+             conn.commit()
+        except Exception as e:
+             conn.rollback()
+             print(f"⚠️ Migrazione indice production_cache non riuscita: {e}")
         # Fase pollastra migration (A6)
         try:
              conn.execute(text("ALTER TABLE lotti ADD COLUMN fase VARCHAR"))
@@ -645,6 +736,53 @@ def init_db():
              conn.commit()
         except Exception:
              pass
+        # data_incubazione index (incubation list filters and paging)
+        try:
+             conn.execute(text(
+                 "CREATE INDEX IF NOT EXISTS ix_incubations_data_incubazione "
+                 "ON incubations (data_incubazione)"
+             ))
+             conn.commit()
+        except Exception:
+             pass
+        # chick_planning unique (anno, settimana, product): drop duplicates
+        # (keeping the row get_chick_planning showed, the last one) first
+        try:
+             conn.execute(text(
+                 "DELETE FROM chick_planning WHERE id NOT IN ("
+                 "SELECT MAX(id) FROM chick_planning GROUP BY anno, settimana, product)"
+             ))
+             conn.execute(text(
+                 "CREATE UNIQUE INDEX IF NOT EXISTS ux_chick_planning_week "
+                 "ON chick_planning (anno, settimana, product)"
+             ))
+             conn.commit()
+        except Exception as e:
+             conn.rollback()
+             print(f"⚠️ Migrazione indice chick_planning non riuscita: {e}")
+        # One-time copy of the per-product client tables into client_demand
+        try:
+             migrate_client_demand(conn)
+             conn.commit()
+        except Exception as e:
+             conn.rollback()
+             print(f"⚠️ Migrazione client_demand non riuscita: {e}")
+        # Default incubators (T017 capacity) on a new database
+        try:
+             seed_incubator_machines()
+        except Exception as e:
+             print(f"⚠️ Seed incubator_machines non riuscito: {e}")
+        # Empty weekly_product_totals (new table or new database): the first
+        # reader fills it with a full refresh
+        try:
+             conn.execute(text(
+                 "INSERT INTO weekly_totals_pending (week_key) SELECT NULL "
+                 "WHERE NOT EXISTS (SELECT 1 FROM weekly_product_totals) "
+                 "AND NOT EXISTS (SELECT 1 FROM weekly_totals_pending)"
+             ))
+             conn.commit()
+        except Exception:
+             pass
 
 def get_db():
     """Yields a database session."""
@@ -654,6 +792,15 @@ def get_db():
     finally:
         db.close()
 
+def begin_immediate(db):
+    """
+    Opens the session's transaction with BEGIN IMMEDIATE, taking SQLite's
+    write lock before the first read: concurrent read-modify-write
+    sequences then run one after the other instead of racing. Must be
+    the first statement of the session.
+    """
+    db.execute(text("BEGIN IMMEDIATE"))
+
 def get_lotti():
     """Returns all lotti as a list of dictionaries."""
     db = SessionLocal()
@@ -779,20 +926,110 @@ def add_trading_config(tipo, azienda, prodotto, razza=""):
     finally:
         db.close()
 
-def get_trading_data(tipo):
+def week_window_filter(model, from_week=None, to_week=None):
+    """SQL conditions keeping rows of `model` whose (anno, settimana) lies
+    between from_week and to_week, both (anno, settimana) and inclusive.
+    A None bound leaves that side open."""
+    conditions = []
+    if from_week:
+        anno, settimana = from_week
+        conditions.append(or_(model.anno > anno, and_(model.anno == anno, model.settimana >= settimana)))
+    if to_week:
+        anno, settimana = to_week
+        conditions.append(or_(model.anno < anno, and_(model.anno == anno, model.settimana <= settimana)))
+    return conditions
+
+
+def get_trading_data(tipo, from_week=None, to_week=None):
     db = SessionLocal()
     try:
         # Returns raw list of objs
-        return db.query(TradingData).filter(TradingData.tipo == tipo).all()
+        return (
+            db.query(TradingData)
+              .filter(TradingData.tipo == tipo, *week_window_filter(TradingData, from_week, to_week))
+              .all()
+        )
     finally:
         db.close()
 
 
-def get_manual_adjustments(product_filter: str = None):
-    """Returns ManualProductionAdjustment rows, optionally filtered by product."""
+def get_vendita_assegnazioni(from_week=None, to_week=None):
+    """VenditaAssegnazione rows whose vendita falls in the (anno, settimana) window."""
     db = SessionLocal()
     try:
-        q = db.query(ManualProductionAdjustment)
+        q = db.query(VenditaAssegnazione)
+        window = week_window_filter(TradingData, from_week, to_week)
+        if window:
+            q = q.filter(VenditaAssegnazione.vendita_id.in_(select(TradingData.id).where(*window)))
+        return q.all()
+    finally:
+        db.close()
+
+
+def get_assegnazioni_by_week(products=None, from_week=None, to_week=None):
+    """Quantities assigned to each shed, summed in SQL per (prodotto, week,
+    allevamento) over the visible vendite (quantita > 0) of the window.
+    Returns {prodotto: {week_calendar.week_key: {allevamento: quantita}}}."""
+    db = SessionLocal()
+    try:
+        q = (
+            db.query(TradingData.prodotto, TradingData.anno, TradingData.settimana,
+                     VenditaAssegnazione.allevamento, func.sum(VenditaAssegnazione.quantita))
+              .join(TradingData, TradingData.id == VenditaAssegnazione.vendita_id)
+              .filter(TradingData.tipo == "vendita")
+              # Ghost vendita rows (quantita<=0) must not decurt the sheds
+              .filter(TradingData.quantita > 0)
+              .filter(*week_window_filter(TradingData, from_week, to_week))
+        )
+        if products is not None:
+            q = q.filter(TradingData.prodotto.in_(list(products)))
+        q = q.group_by(TradingData.prodotto, TradingData.anno, TradingData.settimana,
+                       VenditaAssegnazione.allevamento)
+        out = {}
+        for prodotto, anno, settimana, allevamento, quantita in q.all():
+            per_week = out.setdefault(prodotto, {}).setdefault(week_calendar.week_key(anno, settimana), {})
+            per_week[allevamento] = quantita or 0
+        return out
+    finally:
+        db.close()
+
+
+def get_trading_for_weeks(weeks):
+    """Trading rows (both tipi) and their vendita assegnazioni for the given
+    (anno, settimana) pairs. Returns (acquisti, vendite, assegnazioni)."""
+    weeks = list(weeks)
+    if not weeks:
+        return [], [], []
+    db = SessionLocal()
+    try:
+        week_filter = or_(*[
+            and_(TradingData.anno == anno, TradingData.settimana == settimana)
+            for anno, settimana in weeks
+        ])
+        rows = db.query(TradingData).filter(week_filter).all()
+        vendita_ids = [r.id for r in rows if r.tipo == "vendita"]
+        assegnazioni = []
+        if vendita_ids:
+            assegnazioni = (
+                db.query(VenditaAssegnazione)
+                  .filter(VenditaAssegnazione.vendita_id.in_(vendita_ids))
+                  .all()
+            )
+        acquisti = [r for r in rows if r.tipo == "acquisto"]
+        vendite = [r for r in rows if r.tipo == "vendita"]
+        return acquisti, vendite, assegnazioni
+    finally:
+        db.close()
+
+
+def get_manual_adjustments(product_filter: str = None, from_week=None, to_week=None):
+    """Returns ManualProductionAdjustment rows, optionally filtered by product
+    and (anno, settimana) window."""
+    db = SessionLocal()
+    try:
+        q = db.query(ManualProductionAdjustment).filter(
+            *week_window_filter(ManualProductionAdjustment, from_week, to_week)
+        )
         if product_filter:
             # Empty prodotto means the row applies to all products
             q = q.filter(
@@ -886,6 +1123,10 @@ def replace_assegnazioni_for_vendita(vendita_id: int, items: list):
     items: list of {allevamento, quantita}. Zero/negative quantita entries are dropped."""
     db = SessionLocal()
     try:
+        # Only this vendita's week changes: lets the summary recompute just that week
+        vendita = db.query(TradingData.anno, TradingData.settimana).filter(TradingData.id == vendita_id).first()
+        if vendita:
+            generations.mark_weeks(db, "vendita_assegnazione", [(vendita.anno, vendita.settimana)])
         db.query(VenditaAssegnazione).filter(VenditaAssegnazione.vendita_id == vendita_id).delete()
         for it in items:
             q = int(it.get("quantita") or 0)
@@ -1014,6 +1255,9 @@ def delete_trading_config(config_id):
         db.close()
 
 # --- PRODUCTION CACHE HELPERS ---
+# Every helper also drops the in-memory lotto blocks and marks the weekly
+# totals stale: routers call them after the commit that changed the lotto,
+# so a refresh in between may have read the old blocks.
 def invalidate_cache_by_lotto(lotto_id: int):
     """Marks all cache entries for a specific lotto as invalid."""
     db = SessionLocal()
@@ -1024,6 +1268,8 @@ def invalidate_cache_by_lotto(lotto_id: int):
         db.commit()
     finally:
         db.close()
+    production_cache.drop_lotti([lotto_id])
+    mark_weekly_totals_stale()
 
 def invalidate_cache_by_curve(curva_nome: str):
     """Invalidates cache for all lotti using a specific curve.
@@ -1048,6 +1294,9 @@ def invalidate_cache_by_curve(curva_nome: str):
             print(f"✅ Cache invalidated for {len(lotto_ids)} lotti using curve: {normalized}")
     finally:
         db.close()
+    production_cache.drop_lotti(lotto_ids)
+    if lotto_ids:
+        mark_weekly_totals_stale()
 
 def delete_cache_by_lotto(lotto_id: int):
     """Deletes all cache entries for a specific lotto."""
@@ -1059,51 +1308,80 @@ def delete_cache_by_lotto(lotto_id: int):
         db.commit()
     finally:
         db.close()
+    production_cache.drop_lotti([lotto_id])
+    mark_weekly_totals_stale()
 
-def get_valid_cache(product_filter: str = None):
-    """Returns all valid cache entries, optionally filtered by product."""
+def get_valid_cache(product_filter: str = None, lotto_ids: list = None):
+    """Returns all valid cache entries, optionally filtered by product and lotti."""
     db = SessionLocal()
     try:
         query = db.query(ProductionCache).filter(ProductionCache.valid == True)
         if product_filter:
             query = query.filter(ProductionCache.prodotto == product_filter)
+        if lotto_ids is not None:
+            query = query.filter(ProductionCache.lotto_id.in_(lotto_ids))
         return query.all()
     finally:
         db.close()
 
-def save_production_cache_bulk(cache_entries: list):
+PRODUCTION_CACHE_CHUNK = 500
+
+def save_production_cache_bulk(cache_entries: list, lotto_ids: list = None):
     """
-    Saves production cache entries.
-    cache_entries: list of dicts {anno, settimana, lotto_id, prodotto, uova}
+    Saves production cache entries with a set-based upsert on
+    (lotto_id, anno, settimana).
+    cache_entries: list of dicts {anno, settimana, lotto_id, prodotto, uova, eta}
+    lotto_ids: lotti that were recomputed (default: those in cache_entries).
+        Their weeks not present in cache_entries are purged in the same transaction.
     """
-    db = SessionLocal()
-    try:
-        for entry in cache_entries:
-            # Check if exists
-            existing = db.query(ProductionCache).filter(
-                ProductionCache.anno == entry['anno'],
-                ProductionCache.settimana == entry['settimana'],
-                ProductionCache.lotto_id == entry['lotto_id']
-            ).first()
-            
-            if existing:
-                existing.uova = entry['uova']
-                existing.eta = entry.get('eta', 0)
-                existing.prodotto = entry['prodotto']
-                existing.valid = True
-                existing.calculated_at = datetime.utcnow()
-            else:
-                new_entry = ProductionCache(
-                    anno=entry['anno'],
-                    settimana=entry['settimana'],
-                    lotto_id=entry['lotto_id'],
-                    prodotto=entry['prodotto'],
-                    uova=entry['uova'],
-                    eta=entry.get('eta', 0),
-                    valid=True,
-                    calculated_at=datetime.utcnow()
+    from sqlalchemy import delete
+    from sqlalchemy.dialects.sqlite import insert
+
+    if lotto_ids is None:
+        lotto_ids = {e['lotto_id'] for e in cache_entries}
+    lotto_ids = list(lotto_ids)
+    if not cache_entries and not lotto_ids:
+        return
+
+    calculated_at = datetime.utcnow()
+    rows = [
+        {
+            "anno": e['anno'],
+            "settimana": e['settimana'],
+            "lotto_id": e['lotto_id'],
+            "prodotto": e['prodotto'],
+            "uova": e['uova'],
+            "eta": e.get('eta', 0),
+            "valid": True,
+            "calculated_at": calculated_at,
+        }
+        for e in cache_entries
+    ]
+    stmt = insert(ProductionCache)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["lotto_id", "anno", "settimana"],
+        set_={
+            "prodotto": stmt.excluded.prodotto,
+            "uova": stmt.excluded.uova,
+            "eta": stmt.excluded.eta,
+            "valid": True,
+            "calculated_at": stmt.excluded.calculated_at,
+        },
+    )
+
+    db = SessionLocal()
+    try:
+        for i in range(0, len(rows), PRODUCTION_CACHE_CHUNK):
+            db.execute(stmt, rows[i:i + PRODUCTION_CACHE_CHUNK])
+        # Every row just written carries calculated_at: anything older for
+        # these lotti is a week that is no longer produced.
+        for i in range(0, len(lotto_ids), PRODUCTION_CACHE_CHUNK):
+            db.execute(
+                delete(ProductionCache).where(
+                    ProductionCache.lotto_id.in_(lotto_ids[i:i + PRODUCTION_CACHE_CHUNK]),
+                    (ProductionCache.calculated_at != calculated_at) | (ProductionCache.calculated_at == None),
                 )
-                db.add(new_entry)
+            )
         db.commit()
     finally:
         db.close()
@@ -1116,6 +1394,121 @@ def invalidate_all_cache():
         db.commit()
     finally:
         db.close()
+    production_cache.drop_all()
+    mark_weekly_totals_stale()
+
+# --- WEEKLY PRODUCT TOTALS HELPERS ---
+WEEKLY_TOTALS_CHUNK = 500
+
+def get_weekly_product_totals(products=None, from_week=None, to_week=None):
+    """weekly_product_totals rows as dicts, ordered by (prodotto, week); one
+    range scan on (prodotto, week_key) for the optional product list and
+    (anno, settimana) window."""
+    db = SessionLocal()
+    try:
+        q = db.query(WeeklyProductTotal)
+        if products is not None:
+            q = q.filter(WeeklyProductTotal.prodotto.in_(products))
+        if from_week:
+            q = q.filter(WeeklyProductTotal.week_key >= week_calendar.week_key(*from_week))
+        if to_week:
+            q = q.filter(WeeklyProductTotal.week_key <= week_calendar.week_key(*to_week))
+        return [r.to_dict() for r in q.order_by(WeeklyProductTotal.prodotto, WeeklyProductTotal.week_key).all()]
+    finally:
+        db.close()
+
+def get_weekly_totals_products():
+    """Distinct prodotto of weekly_product_totals."""
+    db = SessionLocal()
+    try:
+        return [p for (p,) in db.query(WeeklyProductTotal.prodotto).distinct().all()]
+    finally:
+        db.close()
+
+def get_known_products():
+    """Distinct non-empty prodotto of lotti, trading rows and manual adjustments."""
+    db = SessionLocal()
+    try:
+        products = set()
+        for column in (Lotto.prodotto, TradingData.prodotto, ManualProductionAdjustment.prodotto):
+            products.update(p for (p,) in db.query(column).distinct().all() if p)
+        return sorted(products)
+    finally:
+        db.close()
+
+@event.listens_for(SessionLocal, "before_commit")
+def _mark_weekly_totals_pending(session):
+    """
+    Records in weekly_totals_pending, inside the committing transaction,
+    the weeks an input write touched: one row per week when they are all
+    known (trading_data, vendita_assegnazione), one NULL row otherwise.
+    """
+    session.flush()
+    touched, weeks = generations.pending_changes(session)
+    tables = [t for t in touched if t in generations.TRACKED_TABLES]
+    if not tables:
+        return
+    if all(t in weeks for t in tables):
+        keys = {week_calendar.week_key(*w) for t in tables for w in weeks[t]}
+    else:
+        keys = {None}
+    if keys:
+        from sqlalchemy import insert
+        session.execute(insert(WeeklyTotalsPending), [{"week_key": k} for k in keys])
+
+def mark_weekly_totals_stale():
+    """Full weekly_product_totals refresh on the next read; for writes made
+    outside ORM sessions (pandas to_sql, raw sqlite3)."""
+    db = SessionLocal()
+    try:
+        db.add(WeeklyTotalsPending(week_key=None))
+        db.commit()
+    finally:
+        db.close()
+
+def get_weekly_totals_pending():
+    """(id, week_key) of the pending weekly_product_totals refreshes, oldest first."""
+    db = SessionLocal()
+    try:
+        return db.query(WeeklyTotalsPending.id, WeeklyTotalsPending.week_key).order_by(WeeklyTotalsPending.id).all()
+    finally:
+        db.close()
+
+def write_weekly_product_totals(upserts, deletes, replace_all=False, pending_upto=None):
+    """
+    Applies a diff to weekly_product_totals in one transaction: `upserts`
+    are row dicts (prodotto, anno, settimana, week_key and the totals),
+    `deletes` (prodotto, week_key) pairs. replace_all empties the table
+    first; pending_upto clears the weekly_totals_pending rows up to that id.
+    """
+    from sqlalchemy import delete, tuple_
+    from sqlalchemy.dialects.sqlite import insert
+
+    updated_at = datetime.utcnow()
+    rows = [{**r, "updated_at": updated_at} for r in upserts]
+    db = SessionLocal()
+    try:
+        if replace_all:
+            db.execute(delete(WeeklyProductTotal))
+        for i in range(0, len(deletes), WEEKLY_TOTALS_CHUNK):
+            db.execute(
+                delete(WeeklyProductTotal).where(
+                    tuple_(WeeklyProductTotal.prodotto, WeeklyProductTotal.week_key).in_(deletes[i:i + WEEKLY_TOTALS_CHUNK])
+                )
+            )
+        if rows:
+            stmt = insert(WeeklyProductTotal)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["prodotto", "week_key"],
+                set_={c: getattr(stmt.excluded, c) for c in rows[0] if c not in ("prodotto", "week_key")},
+            )
+            for i in range(0, len(rows), WEEKLY_TOTALS_CHUNK):
+                db.execute(stmt, rows[i:i + WEEKLY_TOTALS_CHUNK])
+        if pending_upto is not None:
+            db.execute(delete(WeeklyTotalsPending).where(WeeklyTotalsPending.id <= pending_upto))
+        db.commit()
+    finally:
+        db.close()
 
 # --- GENETIC CONFIG HELPERS (T006) ---
 def get_genetic_config():
@@ -1377,16 +1770,7 @@ def calculate_solar_week(anno_start: int, sett_start: int, eta_animali: int):
     Calculates the solar week given the start date and animal age.
     Returns (anno, settimana).
     """
-    total_weeks = sett_start + eta_animali
-    anno = anno_start
-    settimana = total_weeks
-    
-    # Handle year overflow
-    while settimana > 52:
-        settimana -= 52
-        anno += 1
-    
-    return anno, settimana
+    return week_calendar.normalize(anno_start, sett_start + eta_animali)
 
 # --- BIRTH RATES MODEL (T008 - Tabelle di Nascita) ---
 from sqlalchemy import Float
@@ -1445,6 +1829,7 @@ def update_birth_rate(week: int, product: str, rate: float):
             db.add(record)
         
         db.commit()
+        birth_rate_store.invalidate_birth_rates()
         db.refresh(record)
         return record.to_dict()
     finally:
@@ -1466,6 +1851,7 @@ def seed_birth_rates():
                 db.add(rate)
 
         db.commit()
+        birth_rate_store.invalidate_birth_rates()
         print(f"Seeded birth rates: {52 * 4} entries (W24-W75 x 4 products)")
     finally:
         db.close()
@@ -1510,6 +1896,7 @@ def update_purchase_birth_rate(product: str, rate: float):
             db.add(record)
         
         db.commit()
+        birth_rate_store.invalidate_birth_rates()
         db.refresh(record)
         return record.to_dict()
     finally:
@@ -1529,6 +1916,7 @@ def seed_purchase_birth_rates():
             db.add(rate)
         
         db.commit()
+        birth_rate_store.invalidate_birth_rates()
         print(f"Seeded purchase birth rates: 4 entries")
     finally:
         db.close()
@@ -1873,6 +2261,9 @@ def delete_production_farm(farm_id: int):
 # --- CHICK PLANNING MODEL (T010 - Pianificazione Nascite) ---
 class ChickPlanning(Base):
     __tablename__ = "chick_planning"
+    __table_args__ = (
+        Index("ux_chick_planning_week", "anno", "settimana", "product", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     anno = Column(Integer, index=True)
@@ -1892,6 +2283,8 @@ class ChickPlanning(Base):
         }
 
 # --- CHICK PLANNING HELPERS (T010) ---
+CHICK_PLANNING_CHUNK = 500
+
 def get_chick_planning(product: str):
     """Returns all chick planning data for a product as a dict {(anno, settimana): {richiesta_guidi, altri_clienti}}."""
     db = SessionLocal()
@@ -1903,32 +2296,59 @@ def get_chick_planning(product: str):
 
 def update_chick_planning(anno: int, settimana: int, product: str, richiesta_guidi: int = None, altri_clienti: int = None):
     """Updates or creates a chick planning entry."""
-    db = SessionLocal()
-    try:
-        record = db.query(ChickPlanning).filter(
-            ChickPlanning.anno == anno,
-            ChickPlanning.settimana == settimana,
-            ChickPlanning.product == product
-        ).first()
-        
-        if record:
-            if richiesta_guidi is not None:
-                record.richiesta_guidi = richiesta_guidi
-            if altri_clienti is not None:
-                record.altri_clienti = altri_clienti
-        else:
-            record = ChickPlanning(
-                anno=anno,
-                settimana=settimana,
-                product=product,
-                richiesta_guidi=richiesta_guidi if richiesta_guidi is not None else 80000,
-                altri_clienti=altri_clienti if altri_clienti is not None else 3000
-            )
-            db.add(record)
-        
+    return upsert_chick_planning(product, [
+        {"anno": anno, "settimana": settimana, "richiesta_guidi": richiesta_guidi, "altri_clienti": altri_clienti}
+    ])[0]
+
+CHICK_PLANNING_FIELDS = ("richiesta_guidi", "altri_clienti")
+# Values given to the other field when a week is saved for the first time
+CHICK_PLANNING_NEW_ROW = {"richiesta_guidi": 80000, "altri_clienti": 3000}
+
+def upsert_chick_planning(product: str, rows):
+    """
+    Writes chick planning weeks of a product in one transaction: `rows` are
+    {anno, settimana, richiesta_guidi?, altri_clienti?} dicts, a missing or
+    None field is left as it is (CHICK_PLANNING_NEW_ROW on new weeks).
+    Rows are inserted or updated on (anno, settimana, product), one
+    statement per combination of fields. Returns the stored rows, in input order.
+    """
+    from sqlalchemy import tuple_
+    from sqlalchemy.dialects.sqlite import insert
+
+    by_fields = {}
+    for r in rows:
+        fields = tuple(f for f in CHICK_PLANNING_FIELDS if r.get(f) is not None)
+        by_fields.setdefault(fields, []).append({
+            "anno": r['anno'],
+            "settimana": r['settimana'],
+            "product": product,
+            **{f: r[f] if f in fields else CHICK_PLANNING_NEW_ROW[f] for f in CHICK_PLANNING_FIELDS},
+        })
+    if not by_fields:
+        return []
+    db = SessionLocal()
+    try:
+        for fields, values in by_fields.items():
+            stmt = insert(ChickPlanning)
+            if fields:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["anno", "settimana", "product"],
+                    set_={f: getattr(stmt.excluded, f) for f in fields},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["anno", "settimana", "product"])
+            for i in range(0, len(values), CHICK_PLANNING_CHUNK):
+                db.execute(stmt, values[i:i + CHICK_PLANNING_CHUNK])
         db.commit()
-        db.refresh(record)
-        return record.to_dict()
+        weeks = list(dict.fromkeys((r['anno'], r['settimana']) for r in rows))
+        stored = {}
+        for i in range(0, len(weeks), CHICK_PLANNING_CHUNK):
+            for record in db.query(ChickPlanning).filter(
+                ChickPlanning.product == product,
+                tuple_(ChickPlanning.anno, ChickPlanning.settimana).in_(weeks[i:i + CHICK_PLANNING_CHUNK])
+            ):
+                stored[(record.anno, record.settimana)] = record.to_dict()
+        return [stored[(r['anno'], r['settimana'])] for r in rows]
     finally:
         db.close()
 
@@ -1948,256 +2368,51 @@ def get_chick_planning_value(anno: int, settimana: int, product: str):
     finally:
         db.close()
 
-# --- ROSS CLIENT CONFIG MODEL (T013 - Clienti Dinamici) ---
-class RossClientConfig(Base):
-    __tablename__ = "ross_client_config"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    nome_cliente = Column(String)
-    sex_type = Column(String)  # 'maschi', 'femmine', 'entrambi'
-    active = Column(Boolean, default=True)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nome_cliente": self.nome_cliente,
-            "sex_type": self.sex_type,
-            "active": self.active
-        }
-
-class RossClientData(Base):
-    __tablename__ = "ross_client_data"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    anno = Column(Integer, index=True)
-    settimana = Column(Integer, index=True)
-    cliente_id = Column(Integer, index=True)  # FK verso RossClientConfig
-    quantita = Column(Integer, default=0)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "anno": self.anno,
-            "settimana": self.settimana,
-            "cliente_id": self.cliente_id,
-            "quantita": self.quantita
-        }
-
-# --- ROSS CLIENT HELPERS ---
-def get_ross_clients():
-    """Returns all active Ross clients."""
-    db = SessionLocal()
-    try:
-        clients = db.query(RossClientConfig).filter(RossClientConfig.active == True).all()
-        return [c.to_dict() for c in clients]
-    finally:
-        db.close()
-
-def add_ross_client(nome_cliente: str, sex_type: str):
-    """Adds a new Ross client."""
-    db = SessionLocal()
-    try:
-        new_client = RossClientConfig(
-            nome_cliente=nome_cliente,
-            sex_type=sex_type,
-            active=True
-        )
-        db.add(new_client)
-        db.commit()
-        db.refresh(new_client)
-        return new_client.to_dict()
-    finally:
-        db.close()
-
-def delete_ross_client(client_id: int):
-    """Soft deletes a Ross client and removes associated data."""
-    db = SessionLocal()
-    try:
-        client = db.query(RossClientConfig).filter(RossClientConfig.id == client_id).first()
-        if client:
-            # Delete associated data
-            db.query(RossClientData).filter(RossClientData.cliente_id == client_id).delete()
-            # Soft delete the config
-            client.active = False
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
+# --- CLIENT DEMAND MODELS (T010-T013 - Clienti Dinamici) ---
+# One store for the client columns of the four planning tables, keyed by
+# product (granpollo, pollo70, colorYeald, ross). It replaces the former
+# ross_/coloryeald_/pollo70_/granpollo_client_config and *_client_data
+# tables, copied in once by init_db (migrate_client_demand).
+CLIENT_DEMAND_PRODUCTS = ("granpollo", "pollo70", "colorYeald", "ross")
+CLIENT_DEMAND_CHUNK = 500
+# Product -> prefix of its former *_client_config / *_client_data tables
+LEGACY_CLIENT_TABLES = {"granpollo": "granpollo", "pollo70": "pollo70", "colorYeald": "coloryeald", "ross": "ross"}
 
-def get_ross_client_data():
-    """Returns all Ross client data as a dict {(anno, settimana, cliente_id): quantita}."""
-    db = SessionLocal()
-    try:
-        records = db.query(RossClientData).all()
-        return {(r.anno, r.settimana, r.cliente_id): r.quantita for r in records}
-    finally:
-        db.close()
-
-def update_ross_client_data(anno: int, settimana: int, cliente_id: int, quantita: int):
-    """Updates or creates a Ross client data entry."""
-    db = SessionLocal()
-    try:
-        record = db.query(RossClientData).filter(
-            RossClientData.anno == anno,
-            RossClientData.settimana == settimana,
-            RossClientData.cliente_id == cliente_id
-        ).first()
-        
-        if record:
-            record.quantita = quantita
-        else:
-            record = RossClientData(
-                anno=anno,
-                settimana=settimana,
-                cliente_id=cliente_id,
-                quantita=quantita
-            )
-            db.add(record)
-        
-        db.commit()
-        db.refresh(record)
-        return record.to_dict()
-    finally:
-        db.close()
+class ClientDemandConfig(Base):
+    __tablename__ = "client_demand_config"
+    __table_args__ = (
+        Index("ux_client_demand_config_client", "product", "cliente_id", unique=True),
+    )
 
-# --- COLOR YEALD CLIENT CONFIG MODEL (T012 - Clienti Dinamici) ---
-class ColorYealdClientConfig(Base):
-    __tablename__ = "coloryeald_client_config"
-    
     id = Column(Integer, primary_key=True, index=True)
+    product = Column(String)
+    cliente_id = Column(Integer)  # numbered per product: the id the API exposes
     nome_cliente = Column(String)
-    sex_type = Column(String)  # 'maschi', 'femmine', 'entrambi'
+    sex_type = Column(String, default="entrambi")  # 'maschi', 'femmine', 'entrambi'
     active = Column(Boolean, default=True)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nome_cliente": self.nome_cliente,
-            "sex_type": self.sex_type,
-            "active": self.active
-        }
 
-class ColorYealdClientData(Base):
-    __tablename__ = "coloryeald_client_data"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    anno = Column(Integer, index=True)
-    settimana = Column(Integer, index=True)
-    cliente_id = Column(Integer, index=True)
-    quantita = Column(Integer, default=0)
-    
     def to_dict(self):
         return {
-            "id": self.id,
-            "anno": self.anno,
-            "settimana": self.settimana,
-            "cliente_id": self.cliente_id,
-            "quantita": self.quantita
-        }
-
-# --- COLOR YEALD CLIENT HELPERS ---
-def get_coloryeald_clients():
-    """Returns all active ColorYeald clients."""
-    db = SessionLocal()
-    try:
-        clients = db.query(ColorYealdClientConfig).filter(ColorYealdClientConfig.active == True).all()
-        return [c.to_dict() for c in clients]
-    finally:
-        db.close()
-
-def add_coloryeald_client(nome_cliente: str, sex_type: str):
-    """Adds a new ColorYeald client."""
-    db = SessionLocal()
-    try:
-        new_client = ColorYealdClientConfig(
-            nome_cliente=nome_cliente,
-            sex_type=sex_type,
-            active=True
-        )
-        db.add(new_client)
-        db.commit()
-        db.refresh(new_client)
-        return new_client.to_dict()
-    finally:
-        db.close()
-
-def delete_coloryeald_client(client_id: int):
-    """Soft deletes a ColorYeald client and removes associated data."""
-    db = SessionLocal()
-    try:
-        client = db.query(ColorYealdClientConfig).filter(ColorYealdClientConfig.id == client_id).first()
-        if client:
-            db.query(ColorYealdClientData).filter(ColorYealdClientData.cliente_id == client_id).delete()
-            client.active = False
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
-
-def get_coloryeald_client_data():
-    """Returns all ColorYeald client data as a dict {(anno, settimana, cliente_id): quantita}."""
-    db = SessionLocal()
-    try:
-        records = db.query(ColorYealdClientData).all()
-        return {(r.anno, r.settimana, r.cliente_id): r.quantita for r in records}
-    finally:
-        db.close()
-
-def update_coloryeald_client_data(anno: int, settimana: int, cliente_id: int, quantita: int):
-    """Updates or creates a ColorYeald client data entry."""
-    db = SessionLocal()
-    try:
-        record = db.query(ColorYealdClientData).filter(
-            ColorYealdClientData.anno == anno,
-            ColorYealdClientData.settimana == settimana,
-            ColorYealdClientData.cliente_id == cliente_id
-        ).first()
-        
-        if record:
-            record.quantita = quantita
-        else:
-            record = ColorYealdClientData(
-                anno=anno,
-                settimana=settimana,
-                cliente_id=cliente_id,
-                quantita=quantita
-            )
-            db.add(record)
-        
-        db.commit()
-        db.refresh(record)
-        return record.to_dict()
-    finally:
-        db.close()
-
-# --- POLLO70 CLIENT CONFIG MODEL (T011 - Clienti Dinamici) ---
-class Pollo70ClientConfig(Base):
-    __tablename__ = "pollo70_client_config"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    nome_cliente = Column(String)
-    sex_type = Column(String)  # 'maschi', 'femmine', 'entrambi'
-    active = Column(Boolean, default=True)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
+            "id": self.cliente_id,
             "nome_cliente": self.nome_cliente,
             "sex_type": self.sex_type,
             "active": self.active
         }
 
-class Pollo70ClientData(Base):
-    __tablename__ = "pollo70_client_data"
-    
+class ClientDemandData(Base):
+    __tablename__ = "client_demand"
+    __table_args__ = (
+        Index("ux_client_demand_week", "product", "week_key", "cliente_id", unique=True),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    anno = Column(Integer, index=True)
-    settimana = Column(Integer, index=True)
-    cliente_id = Column(Integer, index=True)
+    product = Column(String)
+    anno = Column(Integer)
+    settimana = Column(Integer)
+    week_key = Column(Integer)  # anno * 100 + settimana (services.week_calendar), range-scanned
+    cliente_id = Column(Integer)  # ClientDemandConfig.cliente_id of the same product
     quantita = Column(Integer, default=0)
-    
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -2207,21 +2422,65 @@ class Pollo70ClientData(Base):
             "quantita": self.quantita
         }
 
-# --- POLLO70 CLIENT HELPERS ---
-def get_pollo70_clients():
-    """Returns all active Pollo70 clients."""
-    db = SessionLocal()
-    try:
-        clients = db.query(Pollo70ClientConfig).filter(Pollo70ClientConfig.active == True).all()
+def migrate_client_demand(conn):
+    """
+    Copies the former per-product client tables into client_demand_config /
+    client_demand, for each product that has no client in the new store
+    yet. Client ids are kept; of duplicated (anno, settimana, cliente_id)
+    rows the last one wins, as the old readers did. The old tables are
+    left in place.
+    """
+    from sqlalchemy import inspect, text
+    tables = set(inspect(conn).get_table_names())
+    for product, prefix in LEGACY_CLIENT_TABLES.items():
+        config_table, data_table = f"{prefix}_client_config", f"{prefix}_client_data"
+        if config_table not in tables:
+            continue
+        migrated = conn.execute(
+            text("SELECT 1 FROM client_demand_config WHERE product = :product LIMIT 1"), {"product": product}
+        ).first()
+        if migrated:
+            continue
+        conn.execute(text(
+            "INSERT INTO client_demand_config (product, cliente_id, nome_cliente, sex_type, active) "
+            f"SELECT :product, id, nome_cliente, sex_type, active FROM {config_table} ORDER BY id"
+        ), {"product": product})
+        if data_table in tables:
+            conn.execute(text(
+                "INSERT INTO client_demand (product, anno, settimana, week_key, cliente_id, quantita) "
+                f"SELECT :product, anno, settimana, anno * 100 + settimana, cliente_id, quantita FROM {data_table} "
+                f"WHERE id IN (SELECT MAX(id) FROM {data_table} "
+                "WHERE anno IS NOT NULL AND settimana IS NOT NULL AND cliente_id IS NOT NULL "
+                "GROUP BY anno, settimana, cliente_id)"
+            ), {"product": product})
+
+# --- CLIENT DEMAND HELPERS ---
+def get_demand_clients(product: str):
+    """Returns the active clients of a planning table, in creation order."""
+    db = SessionLocal()
+    try:
+        clients = (
+            db.query(ClientDemandConfig)
+              .filter(ClientDemandConfig.product == product, ClientDemandConfig.active == True)
+              .order_by(ClientDemandConfig.cliente_id)
+              .all()
+        )
         return [c.to_dict() for c in clients]
     finally:
         db.close()
 
-def add_pollo70_client(nome_cliente: str, sex_type: str):
-    """Adds a new Pollo70 client."""
+def add_demand_client(product: str, nome_cliente: str, sex_type: str):
+    """Adds a client to a planning table (ids are numbered per product)."""
     db = SessionLocal()
     try:
-        new_client = Pollo70ClientConfig(
+        last_id = (
+            db.query(func.max(ClientDemandConfig.cliente_id))
+              .filter(ClientDemandConfig.product == product)
+              .scalar()
+        )
+        new_client = ClientDemandConfig(
+            product=product,
+            cliente_id=(last_id or 0) + 1,
             nome_cliente=nome_cliente,
             sex_type=sex_type,
             active=True
@@ -2233,13 +2492,19 @@ def add_pollo70_client(nome_cliente: str, sex_type: str):
     finally:
         db.close()
 
-def delete_pollo70_client(client_id: int):
-    """Soft deletes a Pollo70 client and removes associated data."""
+def delete_demand_client(product: str, client_id: int):
+    """Soft deletes a client of a planning table and removes its weekly data."""
     db = SessionLocal()
     try:
-        client = db.query(Pollo70ClientConfig).filter(Pollo70ClientConfig.id == client_id).first()
+        client = db.query(ClientDemandConfig).filter(
+            ClientDemandConfig.product == product,
+            ClientDemandConfig.cliente_id == client_id
+        ).first()
         if client:
-            db.query(Pollo70ClientData).filter(Pollo70ClientData.cliente_id == client_id).delete()
+            db.query(ClientDemandData).filter(
+                ClientDemandData.product == product,
+                ClientDemandData.cliente_id == client_id
+            ).delete()
             client.active = False
             db.commit()
             return True
@@ -2247,155 +2512,80 @@ def delete_pollo70_client(client_id: int):
     finally:
         db.close()
 
-def get_pollo70_client_data():
-    """Returns all Pollo70 client data as a dict {(anno, settimana, cliente_id): quantita}."""
-    db = SessionLocal()
-    try:
-        records = db.query(Pollo70ClientData).all()
-        return {(r.anno, r.settimana, r.cliente_id): r.quantita for r in records}
-    finally:
-        db.close()
-
-def update_pollo70_client_data(anno: int, settimana: int, cliente_id: int, quantita: int):
-    """Updates or creates a Pollo70 client data entry."""
-    db = SessionLocal()
-    try:
-        record = db.query(Pollo70ClientData).filter(
-            Pollo70ClientData.anno == anno,
-            Pollo70ClientData.settimana == settimana,
-            Pollo70ClientData.cliente_id == cliente_id
-        ).first()
-        
-        if record:
-            record.quantita = quantita
-        else:
-            record = Pollo70ClientData(
-                anno=anno,
-                settimana=settimana,
-                cliente_id=cliente_id,
-                quantita=quantita
-            )
-            db.add(record)
-        
-        db.commit()
-        db.refresh(record)
-        return record.to_dict()
+def get_client_demand(products, from_week=None, to_week=None):
+    """
+    Client quantities of the planning tables of `products`, as
+    {product: {(anno, settimana, cliente_id): quantita}}, optionally only
+    for the from_week..to_week window ((anno, settimana), inclusive).
+    One range scan on the (product, week_key) index.
+    """
+    products = list(products)
+    db = SessionLocal()
+    try:
+        q = db.query(
+            ClientDemandData.product, ClientDemandData.anno, ClientDemandData.settimana,
+            ClientDemandData.cliente_id, ClientDemandData.quantita,
+        ).filter(ClientDemandData.product.in_(products))
+        if from_week:
+            q = q.filter(ClientDemandData.week_key >= week_calendar.week_key(*from_week))
+        if to_week:
+            q = q.filter(ClientDemandData.week_key <= week_calendar.week_key(*to_week))
+        out = {product: {} for product in products}
+        for product, anno, settimana, cliente_id, quantita in q.all():
+            out[product][(anno, settimana, cliente_id)] = quantita
+        return out
     finally:
         db.close()
 
-
-# --- GRANPOLLO CLIENT MODELS (T010) ---
-class GranpolloClientConfig(Base):
-    """Client configuration for Granpollo planning (T010)."""
-    __tablename__ = "granpollo_client_config"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    nome_cliente = Column(String, nullable=False)
-    sex_type = Column(String, default="entrambi")  # maschi, femmine, entrambi
-    active = Column(Boolean, default=True)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nome_cliente": self.nome_cliente,
-            "sex_type": self.sex_type,
-            "active": self.active
-        }
-
-class GranpolloClientData(Base):
-    """Weekly client data for Granpollo planning (T010)."""
-    __tablename__ = "granpollo_client_data"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    anno = Column(Integer, index=True)
-    settimana = Column(Integer, index=True)
-    cliente_id = Column(Integer, index=True)
-    quantita = Column(Integer, default=0)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "anno": self.anno,
-            "settimana": self.settimana,
-            "cliente_id": self.cliente_id,
-            "quantita": self.quantita
+def upsert_client_demand(product: str, rows):
+    """
+    Writes client cells of a planning table in one transaction: `rows` are
+    {anno, settimana, cliente_id, quantita} dicts, inserted or updated on
+    (product, week, cliente_id). Returns the stored rows, in input order.
+    """
+    from sqlalchemy import tuple_
+    from sqlalchemy.dialects.sqlite import insert
+
+    values = [
+        {
+            "product": product,
+            "anno": r['anno'],
+            "settimana": r['settimana'],
+            "week_key": week_calendar.week_key(r['anno'], r['settimana']),
+            "cliente_id": r['cliente_id'],
+            "quantita": r['quantita'],
         }
-
-# --- GRANPOLLO CLIENT HELPERS ---
-def get_granpollo_clients():
-    """Returns all active Granpollo clients."""
-    db = SessionLocal()
-    try:
-        clients = db.query(GranpolloClientConfig).filter(GranpolloClientConfig.active == True).all()
-        return [c.to_dict() for c in clients]
-    finally:
-        db.close()
-
-def add_granpollo_client(nome_cliente: str, sex_type: str):
-    """Adds a new Granpollo client."""
-    db = SessionLocal()
-    try:
-        new_client = GranpolloClientConfig(
-            nome_cliente=nome_cliente,
-            sex_type=sex_type,
-            active=True
-        )
-        db.add(new_client)
+        for r in rows
+    ]
+    if not values:
+        return []
+    stmt = insert(ClientDemandData)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product", "week_key", "cliente_id"],
+        set_={"quantita": stmt.excluded.quantita},
+    )
+    db = SessionLocal()
+    try:
+        for i in range(0, len(values), CLIENT_DEMAND_CHUNK):
+            db.execute(stmt, values[i:i + CLIENT_DEMAND_CHUNK])
         db.commit()
-        db.refresh(new_client)
-        return new_client.to_dict()
+        keys = list(dict.fromkeys((v["week_key"], v["cliente_id"]) for v in values))
+        stored = {}
+        for i in range(0, len(keys), CLIENT_DEMAND_CHUNK):
+            for record in db.query(ClientDemandData).filter(
+                ClientDemandData.product == product,
+                tuple_(ClientDemandData.week_key, ClientDemandData.cliente_id).in_(keys[i:i + CLIENT_DEMAND_CHUNK])
+            ):
+                stored[(record.week_key, record.cliente_id)] = record.to_dict()
+        return [stored[(v["week_key"], v["cliente_id"])] for v in values]
     finally:
         db.close()
 
-def delete_granpollo_client(client_id: int):
-    """Soft deletes a Granpollo client and removes associated data."""
-    db = SessionLocal()
-    try:
-        client = db.query(GranpolloClientConfig).filter(GranpolloClientConfig.id == client_id).first()
-        if client:
-            db.query(GranpolloClientData).filter(GranpolloClientData.cliente_id == client_id).delete()
-            client.active = False
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
-
-def get_granpollo_client_data():
-    """Returns all Granpollo client data as a dict {(anno, settimana, cliente_id): quantita}."""
-    db = SessionLocal()
-    try:
-        records = db.query(GranpolloClientData).all()
-        return {(r.anno, r.settimana, r.cliente_id): r.quantita for r in records}
-    finally:
-        db.close()
-
-def update_granpollo_client_data(anno: int, settimana: int, cliente_id: int, quantita: int):
-    """Updates or creates a Granpollo client data entry."""
-    db = SessionLocal()
-    try:
-        record = db.query(GranpolloClientData).filter(
-            GranpolloClientData.anno == anno,
-            GranpolloClientData.settimana == settimana,
-            GranpolloClientData.cliente_id == cliente_id
-        ).first()
-        
-        if record:
-            record.quantita = quantita
-        else:
-            record = GranpolloClientData(
-                anno=anno,
-                settimana=settimana,
-                cliente_id=cliente_id,
-                quantita=quantita
-            )
-            db.add(record)
-        
-        db.commit()
-        db.refresh(record)
-        return record.to_dict()
-    finally:
-        db.close()
+def update_client_demand(product: str, anno: int, settimana: int, cliente_id: int, quantita: int):
+    """Updates or creates one client cell of a planning table."""
+    return upsert_client_demand(product, [
+        {"anno": anno, "settimana": settimana, "cliente_id": cliente_id, "quantita": quantita}
+    ])[0]
 
 
 # --- EGG STORAGE HELPERS (T014 - Magazzino Uova) ---
@@ -2687,6 +2877,54 @@ def ensure_incubation_planning_conto_default():
         db.close()
 
 
+# --- INCUBATOR MACHINES ---
+def seed_incubator_machines():
+    """
+    Inserts INCUBATOR_MACHINE_DEFAULTS when incubator_machines is empty.
+    INSERT OR IGNORE on nome: processes starting together cannot collide.
+    """
+    from sqlalchemy.dialects.sqlite import insert
+
+    db = SessionLocal()
+    try:
+        if db.query(IncubatorMachine.nome).first() is None:
+            db.execute(
+                insert(IncubatorMachine).on_conflict_do_nothing(index_elements=["nome"]),
+                [{"nome": nome, "capacita": capacita, "ordine": ordine}
+                 for ordine, (nome, capacita) in enumerate(INCUBATOR_MACHINE_DEFAULTS)],
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def get_incubator_machines():
+    """Incubators with their capacity, in display order."""
+    db = SessionLocal()
+    try:
+        machines = db.query(IncubatorMachine).order_by(IncubatorMachine.ordine, IncubatorMachine.nome).all()
+        return [m.to_dict() for m in machines]
+    finally:
+        db.close()
+
+
+def update_incubator_machine(nome: str, capacita: int):
+    """Sets the capacity of an incubator, adding it at the end when new."""
+    db = SessionLocal()
+    try:
+        machine = db.query(IncubatorMachine).filter(IncubatorMachine.nome == nome).first()
+        if machine is None:
+            last = db.query(func.max(IncubatorMachine.ordine)).scalar()
+            machine = IncubatorMachine(nome=nome, ordine=(last if last is not None else -1) + 1)
+            db.add(machine)
+        machine.capacita = capacita
+        db.commit()
+        db.refresh(machine)
+        return machine.to_dict()
+    finally:
+        db.close()
+
+
 # --- TRASFERIMENTO CRUD (A7) ---
 def get_trasferimenti(incubation_id: int = None):
     db = SessionLocal()
@@ -6,7 +6,6 @@ Provides weekly egg production totals by breed and manages dynamic
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
-from datetime import date
 from database import (
     get_incubation_planning_conti,
     add_incubation_planning_conto,
@@ -15,13 +14,13 @@ from database import (
     get_incubation_planning_data,
     update_incubation_planning_data,
     ensure_incubation_planning_conto_default,
+    INCUBATOR_MACHINE_DEFAULTS,
 )
+from services import incubator_occupancy, week_calendar
 from services.production_service import ProductionService
 
 router = APIRouter(prefix="/api/incubation-planning", tags=["incubation-planning"])
 
-MAX_INCUBABILE = 387200
-
 
 class ContoCreate(BaseModel):
     nome: str
@@ -38,39 +37,25 @@ class PlanningDataUpdate(BaseModel):
     quantita: int
 
 
-def get_current_week():
-    today = date.today()
-    year, week, _ = today.isocalendar()
-    return year, week
+get_current_week = week_calendar.current_week
+normalize_year_week = week_calendar.normalize
 
 
-def normalize_year_week(year: int, week: int):
-    while week > 52:
-        week -= 52
-        year += 1
-    while week < 1:
-        week += 52
-        year -= 1
-    return year, week
+def generate_weeks(num_weeks: int):
+    return list(week_calendar.week_range(*get_current_week(), num_weeks))
 
 
-def generate_weeks(num_weeks: int):
-    current_year, current_week = get_current_week()
-    weeks = []
-    year, week = current_year, current_week
-    for _ in range(num_weeks):
-        weeks.append((year, week))
-        week += 1
-        if week > 52:
-            week = 1
-            year += 1
-    return weeks
+PLANNING_PRODUCTS = ["Granpollo", "Pollo70", "Color Yeald", "Ross"]
 
 
-def get_breed_totals_by_week(product: str) -> dict:
-    """Returns {(anno, settimana): total_netto} for a given product."""
-    summary = ProductionService.calculate_weekly_summary(product)
-    return {(row["anno"], row["settimana"]): row["totale_netto"] for row in summary}
+def get_breed_totals_by_week(products: list, from_week=None, to_week=None) -> dict:
+    """Returns {product: {(anno, settimana): total_netto}} computed in a single pass,
+    limited to the from_week..to_week window when given."""
+    summaries = ProductionService.calculate_weekly_summaries(products, from_week, to_week)
+    return {
+        product: {(row["anno"], row["settimana"]): row["totale_netto"] for row in summary}
+        for product, summary in summaries.items()
+    }
 
 
 @router.get("/data")
@@ -85,22 +70,17 @@ def get_planning_data(
     except Exception as e:
         print(f"[T017] ensure_default failed: {e}")
 
+    # Build rows for current week + num_weeks
+    weeks = generate_weeks(num_weeks)
+
     try:
-        granpollo_map = get_breed_totals_by_week("Granpollo")
-    except Exception:
-        granpollo_map = {}
-    try:
-        pollo70_map = get_breed_totals_by_week("Pollo70")
-    except Exception:
-        pollo70_map = {}
-    try:
-        coloryeald_map = get_breed_totals_by_week("Color Yeald")
-    except Exception:
-        coloryeald_map = {}
-    try:
-        ross_map = get_breed_totals_by_week("Ross")
+        breed_totals = get_breed_totals_by_week(PLANNING_PRODUCTS, weeks[0], weeks[-1])
     except Exception:
-        ross_map = {}
+        breed_totals = {}
+    granpollo_map = breed_totals.get("Granpollo", {})
+    pollo70_map = breed_totals.get("Pollo70", {})
+    coloryeald_map = breed_totals.get("Color Yeald", {})
+    ross_map = breed_totals.get("Ross", {})
 
     try:
         conti = get_incubation_planning_conti()
@@ -112,8 +92,17 @@ def get_planning_data(
     except Exception:
         planning_data = {}
 
-    # Build rows for current week + num_weeks
-    weeks = generate_weeks(num_weeks)
+    # Capacity of the configured incubators and eggs already incubated,
+    # from the same timeline as the occupancy table
+    try:
+        occupancy = incubator_occupancy.get_timeline()
+        max_incubabile = occupancy.capacita_totale
+        incubate_map = occupancy.weekly_totals()
+    except Exception as e:
+        print(f"[T017] incubator occupancy failed: {e}")
+        max_incubabile = sum(capacita for _, capacita in INCUBATOR_MACHINE_DEFAULTS)
+        incubate_map = {}
+
     rows = []
     for anno, settimana in weeks:
         granpollo = granpollo_map.get((anno, settimana), 0)
@@ -130,8 +119,8 @@ def get_planning_data(
         somma_incubato = granpollo + pollo70 + coloryeald + ross + \
             sum(conto_values.values()) + zona_faraone
 
-        posti_restanti = MAX_INCUBABILE - somma_incubato
-        occupazione = (somma_incubato / MAX_INCUBABILE * 100) if MAX_INCUBABILE > 0 else 0
+        posti_restanti = max_incubabile - somma_incubato
+        occupazione = (somma_incubato / max_incubabile * 100) if max_incubabile > 0 else 0
 
         rows.append({
             "anno": anno,
@@ -146,12 +135,13 @@ def get_planning_data(
             "somma_incubato": somma_incubato,
             "posti_restanti": posti_restanti,
             "occupazione": round(occupazione, 1),
+            "uova_incubate": incubate_map.get((anno, settimana), 0),
         })
 
     return {
         "conti": conti,
         "rows": rows,
-        "max_incubabile": MAX_INCUBABILE,
+        "max_incubabile": max_incubabile,
     }
 
 
@@ -1,11 +1,21 @@
 """
 Incubazioni Router - API endpoints for egg incubation management (T016)
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
-from database import SessionLocal, Incubation, IncubationBatch, EggStorage
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
+from database import (
+    SessionLocal,
+    begin_immediate,
+    Incubation,
+    IncubationBatch,
+    EggStorage,
+    get_incubator_machines,
+    update_incubator_machine,
+)
+from services import incubator_occupancy
 
 router = APIRouter(prefix="/api/incubazioni", tags=["incubazioni"])
 
@@ -48,12 +58,20 @@ class BatchCreate(BaseModel):
     quantita: Optional[int] = 0  # Deprecated, kept for compatibility
 
 
+class MachineUpdate(BaseModel):
+    capacita: int
+
+
 class BatchUpdate(BaseModel):
     uova_utilizzate: Optional[int] = None
     storico_override: Optional[float] = None
     preparata: Optional[bool] = None
 
 
+# used_* totals returned with each incubation (one per product)
+USED_TOTALS = ("used_granpollo", "used_pollo70", "used_color_yeald", "used_ross")
+
+
 # --- Helper Functions ---
 def calculate_schiusa_date(data_incubazione: str) -> str:
     """Calculate hatching date (+21 days from incubation date)"""
@@ -65,36 +83,143 @@ def calculate_schiusa_date(data_incubazione: str) -> str:
         return ""
 
 
+def _used_by_storage(batches) -> dict:
+    """{egg_storage_id: eggs used} summed over the batches that used any."""
+    used = {}
+    for batch in batches:
+        if batch.uova_utilizzate and batch.uova_utilizzate > 0:
+            used[batch.egg_storage_id] = used.get(batch.egg_storage_id, 0) + batch.uova_utilizzate
+    return used
+
+
+def _take_from_storage(db, batches):
+    """Subtracts the eggs of `batches` from storage (one UPDATE) and deletes the entries left empty."""
+    used = _used_by_storage(batches)
+    if not used:
+        return
+    storage = EggStorage.__table__
+    db.execute(
+        update(storage)
+        .where(storage.c.id == bindparam("storage_id"))
+        .values(numero=func.coalesce(storage.c.numero, 0) - bindparam("used")),
+        [{"storage_id": storage_id, "used": qty} for storage_id, qty in used.items()],
+    )
+    db.execute(delete(storage).where(storage.c.id.in_(list(used)), storage.c.numero <= 0))
+
+
+def _return_to_storage(db, batches):
+    """
+    Gives the eggs of `batches` back to storage: existing entries are
+    incremented (one UPDATE), deleted ones are recreated from the batch
+    data (one INSERT).
+    """
+    used = _used_by_storage(batches)
+    if not used:
+        return
+    storage = EggStorage.__table__
+    existing = {
+        storage_id for (storage_id,) in
+        db.query(EggStorage.id).filter(EggStorage.id.in_(list(used)))
+    }
+    if existing:
+        db.execute(
+            update(storage)
+            .where(storage.c.id == bindparam("storage_id"))
+            .values(numero=func.coalesce(storage.c.numero, 0) + bindparam("used")),
+            [{"storage_id": storage_id, "used": used[storage_id]} for storage_id in existing],
+        )
+    recreated = {}
+    for batch in batches:
+        storage_id = batch.egg_storage_id
+        if storage_id in used and storage_id not in existing and storage_id not in recreated:
+            recreated[storage_id] = {
+                "id": storage_id,
+                "prodotto": batch.prodotto,
+                "nome": batch.nome,
+                "origine": batch.origine,
+                "capannone": batch.capannone or "",
+                "numero": used[storage_id],
+                "eta": batch.eta,
+                "arrivate_il": batch.data_arrivo,
+                "numero_ddt": "",  # Unknown if deleted
+            }
+    if recreated:
+        db.execute(insert(storage), list(recreated.values()))
+
+
+def _storage_snapshot(db) -> list:
+    """Egg storage after the change, as GET /api/magazzino-uova returns it."""
+    return [e.to_dict() for e in db.query(EggStorage).all()]
+
+
 # --- Endpoints ---
 @router.get("")
-def get_incubations():
-    """Get all incubations"""
+def get_incubations(
+    from_date: Optional[str] = Query(None, description="First data_incubazione included, YYYY-MM-DD"),
+    to_date: Optional[str] = Query(None, description="Last data_incubazione included, YYYY-MM-DD"),
+    stato: Optional[str] = Query(None, description="Comma-separated states, e.g. in_corso,completata"),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (all incubations if omitted)"),
+    after_data: Optional[str] = Query(None, description="Keyset cursor: data_incubazione of the last row of the previous page"),
+    after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
+):
+    """
+    Get incubations, newest first (data_incubazione, then id), with their
+    batches and used_* totals per product. The next page starts after the
+    last row returned: pass its data_incubazione and id as after_data/after_id.
+    """
     db = SessionLocal()
     try:
-        incubations = db.query(Incubation).order_by(Incubation.data_incubazione.desc()).all()
+        query = db.query(Incubation)
+        if from_date:
+            query = query.filter(Incubation.data_incubazione >= from_date)
+        if to_date:
+            query = query.filter(Incubation.data_incubazione <= to_date)
+        if stato:
+            query = query.filter(Incubation.stato.in_([s.strip() for s in stato.split(",") if s.strip()]))
+        if after_data is not None:
+            if after_id is None:
+                query = query.filter(Incubation.data_incubazione < after_data)
+            else:
+                query = query.filter(or_(
+                    Incubation.data_incubazione < after_data,
+                    and_(Incubation.data_incubazione == after_data, Incubation.id < after_id),
+                ))
+        query = query.order_by(Incubation.data_incubazione.desc(), Incubation.id.desc())
+        if limit:
+            query = query.limit(limit)
+        incubations = query.all()
+        if not incubations:
+            return []
+
+        # Batches and used_* totals of the page: one query each, on the same ids
+        page_ids = query.with_entities(Incubation.id).subquery()
+        batches_by_incubation = {}
+        for batch in (
+            db.query(IncubationBatch)
+              .filter(IncubationBatch.incubation_id.in_(select(page_ids.c.id)))
+              .order_by(IncubationBatch.id)
+        ):
+            batches_by_incubation.setdefault(batch.incubation_id, []).append(batch.to_dict())
+
+        product_key = func.lower(func.replace(IncubationBatch.prodotto, " ", "_"))
+        used = {}
+        for incubation_id, product, total in (
+            db.query(IncubationBatch.incubation_id, product_key, func.sum(IncubationBatch.uova_utilizzate))
+              .filter(
+                  IncubationBatch.incubation_id.in_(select(page_ids.c.id)),
+                  IncubationBatch.prodotto.isnot(None),
+                  IncubationBatch.prodotto != "",
+              )
+              .group_by(IncubationBatch.incubation_id, product_key)
+        ):
+            used[(incubation_id, f"used_{product}")] = total or 0
+
         result = []
         for inc in incubations:
             inc_dict = inc.to_dict()
-            # Get batches for this incubation
-            batches = db.query(IncubationBatch).filter(
-                IncubationBatch.incubation_id == inc.id
-            ).all()
-            inc_dict["batches"] = [b.to_dict() for b in batches]
-            
-            # Calculate totals used per product
-            totals = {
-                "used_granpollo": 0,
-                "used_pollo70": 0,
-                "used_color_yeald": 0,
-                "used_ross": 0
-            }
-            for batch in batches:
-                if not batch.prodotto:
-                    continue
-                product_key = f"used_{batch.prodotto.lower().replace(' ', '_')}"
-                if product_key in totals:
-                    totals[product_key] += (batch.uova_utilizzate or 0)
-            inc_dict.update(totals)
+            inc_dict["batches"] = batches_by_incubation.get(inc.id, [])
+            for key in USED_TOTALS:
+                inc_dict[key] = used.get((inc.id, key), 0)
             result.append(inc_dict)
         return result
     finally:
@@ -103,50 +228,31 @@ def get_incubations():
 
 @router.get("/occupancy/weekly")
 def get_incubator_occupancy():
-    """Get weekly incubator occupancy based on active incubations."""
-    db = SessionLocal()
-    try:
-        # Get all incubations from the last 60 days to future
-        cutoff_date = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d")
-        incubations = db.query(Incubation).filter(Incubation.data_incubazione >= cutoff_date).all()
-        
-        occupancy_by_week = {}  # (iso_year, iso_week) -> total_eggs
-        
-        for inc in incubations:
-            try:
-                inc_date = datetime.strptime(inc.data_incubazione, "%Y-%m-%d")
-            except ValueError:
-                continue
-                
-            # Get total eggs
-            batches = db.query(IncubationBatch).filter(IncubationBatch.incubation_id == inc.id).all()
-            total_eggs = sum(b.uova_utilizzate or 0 for b in batches)
-            if total_eggs == 0:
-                continue
-                
-            # It occupies the incubator for 3 weeks: week of incubation, week+1, week+2
-            for i in range(3):
-                occ_date = inc_date + timedelta(days=i*7)
-                iso_year, iso_week, _ = occ_date.isocalendar()
-                key = (iso_year, iso_week)
-                if key not in occupancy_by_week:
-                    occupancy_by_week[key] = 0
-                occupancy_by_week[key] += total_eggs
-                
-        result = []
-        for key in sorted(occupancy_by_week.keys()):
-            iso_year, iso_week = key
-            result.append({
-                "anno": iso_year,
-                "settimana": iso_week,
-                "uova_totali": occupancy_by_week[key],
-                "capacita_massima": 374400,
-                "percentuale": round((occupancy_by_week[key] / 374400) * 100, 1)
-            })
-            
-        return result
-    finally:
-        db.close()
+    """Weekly incubator occupancy (total and per machine) of the recent and future incubations."""
+    return incubator_occupancy.get_timeline().week_rows()
+
+
+@router.get("/occupancy/daily")
+def get_incubator_occupancy_daily():
+    """Daily incubator occupancy (total and per machine) of the recent and future incubations."""
+    return incubator_occupancy.get_timeline().day_rows()
+
+
+@router.get("/machines")
+def list_incubator_machines():
+    """Incubators with their capacity."""
+    return get_incubator_machines()
+
+
+@router.put("/machines/{nome}")
+def set_incubator_machine(nome: str, data: MachineUpdate):
+    """Set the capacity of an incubator (added if new)."""
+    nome = nome.strip().upper()
+    if not nome or "," in nome:
+        raise HTTPException(status_code=400, detail="Invalid incubator name")
+    if data.capacita < 0:
+        raise HTTPException(status_code=400, detail="Capacita cannot be negative")
+    return update_incubator_machine(nome, data.capacita)
 
 
 @router.get("/{incubation_id}")
@@ -246,46 +352,26 @@ def delete_incubation(incubation_id: int):
     """Delete incubation and its batches, restoring eggs if committed"""
     db = SessionLocal()
     try:
+        begin_immediate(db)
         incubation = db.query(Incubation).filter(Incubation.id == incubation_id).first()
         if not incubation:
             raise HTTPException(status_code=404, detail="Incubation not found")
         
-        batches = db.query(IncubationBatch).filter(
-            IncubationBatch.incubation_id == incubation_id
-        ).all()
-        
         # Restore eggs if committed
         if incubation.committed:
-            for batch in batches:
-                if batch.uova_utilizzate and batch.uova_utilizzate > 0:
-                    storage = db.query(EggStorage).filter(
-                        EggStorage.id == batch.egg_storage_id
-                    ).first()
-                    
-                    if storage:
-                        storage.numero += batch.uova_utilizzate
-                    else:
-                        # Recreate storage if deleted
-                        new_storage = EggStorage(
-                            id=batch.egg_storage_id,
-                            prodotto=batch.prodotto,
-                            nome=batch.nome,
-                            origine=batch.origine,
-                            capannone=batch.capannone or "",
-                            numero=batch.uova_utilizzate,
-                            eta=batch.eta,
-                            arrivate_il=batch.data_arrivo,
-                            numero_ddt="" # Unknown if previously deleted
-                        )
-                        db.add(new_storage)
+            batches = db.query(IncubationBatch).filter(
+                IncubationBatch.incubation_id == incubation_id
+            ).all()
+            _return_to_storage(db, batches)
         
         # Delete associated batches
-        for b in batches:
-            db.delete(b)
+        db.query(IncubationBatch).filter(
+            IncubationBatch.incubation_id == incubation_id
+        ).delete(synchronize_session=False)
         
         db.delete(incubation)
         db.commit()
-        return {"message": "Incubation deleted successfully"}
+        return {"message": "Incubation deleted successfully", "storage": _storage_snapshot(db)}
     finally:
         db.close()
 
@@ -399,6 +485,7 @@ def commit_incubation(incubation_id: int):
     """Commit incubation: update egg storage with used quantities"""
     db = SessionLocal()
     try:
+        begin_immediate(db)
         # Get incubation
         incubation = db.query(Incubation).filter(Incubation.id == incubation_id).first()
         if not incubation:
@@ -412,26 +499,18 @@ def commit_incubation(incubation_id: int):
             IncubationBatch.incubation_id == incubation_id
         ).all()
         
-        # Update egg storage for each batch
-        for batch in batches:
-            if batch.uova_utilizzate and batch.uova_utilizzate > 0:
-                storage = db.query(EggStorage).filter(
-                    EggStorage.id == batch.egg_storage_id
-                ).first()
-                
-                if storage:
-                    new_quantity = storage.numero - batch.uova_utilizzate
-                    if new_quantity <= 0:
-                        # Delete the storage entry if empty
-                        db.delete(storage)
-                    else:
-                        storage.numero = new_quantity
+        # Update egg storage for all batches, deleting entries left empty
+        _take_from_storage(db, batches)
         
         # Mark incubation as committed
         incubation.committed = True
         db.commit()
         
-        return {"success": True, "message": "Incubation committed successfully"}
+        return {
+            "success": True,
+            "message": "Incubation committed successfully",
+            "storage": _storage_snapshot(db),
+        }
     finally:
         db.close()
 
@@ -440,6 +519,7 @@ def uncommit_incubation(incubation_id: int):
     """Uncommit incubation: restore egg storage with used quantities (Modifica)"""
     db = SessionLocal()
     try:
+        begin_immediate(db)
         # Get incubation
         incubation = db.query(Incubation).filter(Incubation.id == incubation_id).first()
         if not incubation:
@@ -454,33 +534,16 @@ def uncommit_incubation(incubation_id: int):
         ).all()
         
         # Restore eggs to storage
-        for batch in batches:
-            if batch.uova_utilizzate and batch.uova_utilizzate > 0:
-                storage = db.query(EggStorage).filter(
-                    EggStorage.id == batch.egg_storage_id
-                ).first()
-                
-                if storage:
-                    storage.numero += batch.uova_utilizzate
-                else:
-                    # Recreate storage if deleted completely
-                    new_storage = EggStorage(
-                        id=batch.egg_storage_id,
-                        prodotto=batch.prodotto,
-                        nome=batch.nome,
-                        origine=batch.origine,
-                        capannone=batch.capannone or "",
-                        numero=batch.uova_utilizzate,
-                        eta=batch.eta,
-                        arrivate_il=batch.data_arrivo,
-                        numero_ddt="" # Unknown if deleted
-                    )
-                    db.add(new_storage)
+        _return_to_storage(db, batches)
         
         # Mark incubation as uncommitted
         incubation.committed = False
         db.commit()
         
-        return {"success": True, "message": "Incubation uncommitted successfully"}
+        return {
+            "success": True,
+            "message": "Incubation uncommitted successfully",
+            "storage": _storage_snapshot(db),
+        }
     finally:
         db.close()
@@ -1,16 +1,218 @@
-from fastapi import APIRouter, Query
-from typing import Optional
+import json
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
 from services.production_service import ProductionService
+from services import weekly_totals
+from services.scenarios import Scenario, evaluate_scenarios
 
 router = APIRouter(
     prefix="/api/production",
     tags=["production"]
 )
 
+class ScenarioLotto(BaseModel):
+    """T001 fields of a lotto; in `overrides` only the fields set are changed."""
+    id: Optional[int] = None
+    Allevamento: Optional[str] = None
+    Capannone: Optional[str] = None
+    Razza: Optional[str] = None
+    Razza_Gallo: Optional[str] = None
+    Prodotto: Optional[str] = None
+    Capi: Optional[int] = None
+    Anno_Start: Optional[int] = None
+    Sett_Start: Optional[int] = None
+    Data_Fine_Prevista: Optional[str] = None
+    Curva_Produzione: Optional[str] = None
+    Attivo: Optional[bool] = None
+
+class ScenarioTrading(BaseModel):
+    tipo: str  # "acquisto" | "vendita"
+    prodotto: str
+    anno: int
+    settimana: int
+    quantita: int
+
+class ScenarioIn(BaseModel):
+    name: str
+    overrides: List[ScenarioLotto] = []
+    additions: List[ScenarioLotto] = []
+    removals: List[int] = []
+    trading: List[ScenarioTrading] = []
+
+class ScenariosRequest(BaseModel):
+    scenarios: List[ScenarioIn]
+    products: Optional[List[str]] = None
+    from_week: Optional[str] = None  # YYYY-WW
+    to_week: Optional[str] = None
+
+def parse_year_week(value: Optional[str], name: str):
+    """Parses a 'YYYY-WW' query value into (anno, settimana)."""
+    if not value:
+        return None
+    try:
+        anno, settimana = (int(part) for part in value.split("-"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} deve essere nel formato AAAA-SS (es. 2025-07)")
+    if not 1 <= settimana <= 53:
+        raise HTTPException(status_code=400, detail=f"{name}: settimana fuori intervallo (1-53)")
+    return anno, settimana
+
+
+SUMMARY_DETAIL_MODES = ("none", "totals", "full")
+
+
 @router.get("/summary")
-def get_weekly_summary(product: Optional[str] = Query(None, description="Filter by product name")):
+def get_weekly_summary(
+    product: Optional[str] = Query(None, description="Filter by product name"),
+    products: Optional[str] = Query(None, description="Comma-separated products, e.g. Granpollo,Ross"),
+    from_week: Optional[str] = Query(None, description="First week included, YYYY-WW"),
+    to_week: Optional[str] = Query(None, description="Last week included, YYYY-WW"),
+    format: Optional[str] = Query(None, description="'ndjson' streams one week per line"),
+    detail: str = Query("full", description="none | totals | full"),
+):
     """
     Returns the weekly summary of production, purchases, and sales.
+
+    With `products=a,b,c` all inputs are loaded once and the response is
+    {product: summary} for each requested product.
+
+    `from_week` / `to_week` limit the summary to a window of weeks; only
+    that window is computed and returned.
+
+    With `format=ndjson` the response is streamed, one JSON week per line,
+    as each week is aggregated. With `products` every line also carries
+    the requested `product`.
+
+    `detail=none` leaves out the dettagli_* lists, `detail=totals` replaces
+    them with the per-week breakdown and the net production per product;
+    a single week's lists are then read from /summary/{anno}/{settimana}.
+    """
+    window = (parse_year_week(from_week, "from_week"), parse_year_week(to_week, "to_week"))
+    if format is not None and format != "ndjson":
+        raise HTTPException(status_code=400, detail="format supportato: ndjson")
+    if detail not in SUMMARY_DETAIL_MODES:
+        raise HTTPException(status_code=400, detail="detail supportati: none, totals, full")
+    if format == "ndjson":
+        requested = [p.strip() for p in products.split(",") if p.strip()] if products else None
+        return StreamingResponse(stream_summary_ndjson(product, requested, window, detail), media_type="application/x-ndjson")
+    if products:
+        requested = [p.strip() for p in products.split(",") if p.strip()]
+        summaries = ProductionService.calculate_weekly_summaries(requested, *window)
+        if detail == "full":
+            return summaries
+        return {
+            p: [ProductionService.summary_row_view(row, detail) for row in summary]
+            for p, summary in summaries.items()
+        }
+    summary = ProductionService.calculate_weekly_summary(product, *window)
+    if detail == "full":
+        return summary
+    return [ProductionService.summary_row_view(row, detail) for row in summary]
+
+
+@router.get("/summary/{anno}/{settimana}")
+def get_weekly_summary_week(
+    anno: int,
+    settimana: int,
+    product: Optional[str] = Query(None, description="Filter by product name"),
+):
+    """
+    Returns one week of the summary with all its detail lists (production
+    per shed, purchases, sales with assegnazioni, manual rows).
+    """
+    if not 1 <= settimana <= 53:
+        raise HTTPException(status_code=400, detail="settimana fuori intervallo (1-53)")
+    row = ProductionService.get_summary_week(product, anno, settimana)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Nessun dato per la settimana {anno}-{settimana:02d}")
+    return row
+
+
+def stream_summary_ndjson(product: Optional[str], products: Optional[list], window: tuple, detail: str = "full"):
+    """Yields summary weeks as NDJSON lines, one product after the other."""
+    if products is None:
+        for row in ProductionService.iter_weekly_summary(product, *window):
+            yield json.dumps(ProductionService.summary_row_view(row, detail)) + "\n"
+        return
+    for requested in products:
+        for row in ProductionService.iter_weekly_summary(requested, *window):
+            yield json.dumps({"product": requested, **ProductionService.summary_row_view(row, detail)}) + "\n"
+
+
+@router.get("/summary-cache")
+def get_summary_cache_stats():
+    """
+    Returns size and hit/miss counters of the weekly summary memoization.
+    """
+    return ProductionService.summary_cache_stats()
+
+
+@router.get("/weekly-totals")
+def get_weekly_totals(
+    products: Optional[str] = Query(None, description="Comma-separated products, e.g. Granpollo,Ross"),
+    from_week: Optional[str] = Query(None, description="First week included, YYYY-WW"),
+    to_week: Optional[str] = Query(None, description="Last week included, YYYY-WW"),
+):
+    """
+    Returns the materialized per-product weekly totals (no detail lists):
+    produzione lorda/netta, manuali, acquisti, vendite, vendite non
+    assegnate and totale netto, ordered by product and week.
+    """
+    window = (parse_year_week(from_week, "from_week"), parse_year_week(to_week, "to_week"))
+    requested = [p.strip() for p in products.split(",") if p.strip()] if products else None
+    try:
+        return weekly_totals.get_weekly_totals(requested, *window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/weekly-totals/rebuild")
+def rebuild_weekly_totals():
+    """Regenerates weekly_product_totals from scratch."""
+    return weekly_totals.rebuild()
+
+
+@router.post("/scenarios")
+def evaluate_production_scenarios(body: ScenariosRequest):
+    """
+    Evaluates what-if lotto plans without writing anything.
+
+    Each scenario lists lotto `overrides` (id + changed T001 fields),
+    `additions`, `removals` (lotto ids) and optional `trading` rows that
+    replace a week's purchase/sale total. All scenarios are computed in one
+    batch on the same inputs; the response holds, per scenario, weekly egg
+    totals and the T010-T013 chick estimate (animali_possibili) of each
+    product and production week.
     """
-    summary = ProductionService.calculate_weekly_summary(product)
-    return summary
+    window = (parse_year_week(body.from_week, "from_week"), parse_year_week(body.to_week, "to_week"))
+    for sc in body.scenarios:
+        if any(o.id is None for o in sc.overrides):
+            raise HTTPException(status_code=400, detail=f"Scenario '{sc.name}': ogni override richiede l'id del lotto")
+        if any(t.tipo not in ("acquisto", "vendita") for t in sc.trading):
+            raise HTTPException(status_code=400, detail=f"Scenario '{sc.name}': tipo deve essere acquisto o vendita")
+        missing = [a for a in sc.additions
+                   if not (a.Allevamento and a.Capannone and a.Prodotto and a.Capi is not None
+                           and a.Anno_Start and a.Sett_Start and a.Curva_Produzione)]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Scenario '{sc.name}': i lotti aggiunti richiedono Allevamento, Capannone, Prodotto, "
+                       f"Capi, Anno_Start, Sett_Start e Curva_Produzione",
+            )
+    scenarios = [
+        Scenario(
+            sc.name,
+            overrides={o.id: o.model_dump(exclude_unset=True, exclude={"id"}) for o in sc.overrides},
+            additions=[a.model_dump(exclude_none=True, exclude={"id"}) for a in sc.additions],
+            removals=sc.removals,
+            trading=[t.model_dump() for t in sc.trading],
+        )
+        for sc in body.scenarios
+    ]
+    try:
+        return evaluate_scenarios(scenarios, body.products, *window)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from utils.helpers import carica_dati_v20
-from database import engine
+from database import engine, mark_weekly_totals_stale
 from services.production_service import ProductionService
+from services.curve_store import invalidate_curves
 import pandas as pd
 
 router = APIRouter(prefix="/api/production-tables", tags=["production-tables"])
@@ -103,6 +104,8 @@ async def update_production_table_cell(update: CellUpdate):
         # Save to database
         try:
             df.to_sql("standard_curves", engine, if_exists='replace', index=False)
+            invalidate_curves()
+            mark_weekly_totals_stale()
             print(f"Successfully updated cell and saved to database")
             
             # Invalidate cache for all lotti using this curve (as per RULES.md)
@@ -152,6 +155,8 @@ async def add_production_table_column(column_data: ColumnCreate):
         
         # Save to database
         df.to_sql("standard_curves", engine, if_exists='replace', index=False)
+        invalidate_curves()
+        mark_weekly_totals_stale()
         return {"success": True, "message": f"Column {column_name} added successfully"}
     except HTTPException:
         raise
@@ -198,6 +203,8 @@ async def delete_production_table_column(column_name: str):
         
         # Save to database
         df.to_sql("standard_curves", engine, if_exists='replace', index=False)
+        invalidate_curves()
+        mark_weekly_totals_stale()
         return {"success": True, "message": f"Column {target_col} deleted successfully"}
     except HTTPException:
         raise
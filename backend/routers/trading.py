@@ -12,7 +12,7 @@ from database import (
     replace_assegnazioni_for_vendita,
     find_or_create_vendita,
 )
-from datetime import date
+from services import week_calendar
 
 router = APIRouter(prefix="/api/trading", tags=["trading"])
 
@@ -46,26 +46,11 @@ class AssegnazioniBulkUpdate(BaseModel):
     items: List[AssegnazioneItem]
 
 # Helper function to get current week
-def get_current_week():
-    today = date.today()
-    year, week, _ = today.isocalendar()
-    return year, week
+get_current_week = week_calendar.current_week
 
 # Helper function to generate 52 weeks starting from current week
 def generate_52_weeks():
-    current_year, current_week = get_current_week()
-    weeks = []
-    year = current_year
-    week = current_week
-    
-    for _ in range(52):
-        weeks.append((year, week))
-        week += 1
-        if week > 52:
-            week = 1
-            year += 1
-    
-    return weeks
+    return list(week_calendar.week_range(*get_current_week(), 52))
 
 # --- CONFIG ENDPOINTS ---
 
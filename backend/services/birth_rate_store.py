@@ -0,0 +1,114 @@
+"""
+Birth Rate Store - Tabelle di nascita T008/T009 compilate in memoria
+
+birth_rates viene letta una sola volta per versione e convertita in una
+matrice densa [prodotto][settimana] di percentuali, riempita con il 82%
+di default dove la tabella non ha righe; purchase_birth_rates diventa un
+dizionario {prodotto: percentuale}. I cicli della pianificazione pulcini
+leggono quindi i tassi senza aprire sessioni né fare query.
+
+Gli helper di database.py che scrivono le due tabelle (update_* e seed_*)
+chiamano invalidate_birth_rates(); lo snapshot viene ricompilato alla
+lettura successiva.
+"""
+import threading
+from types import MappingProxyType
+from typing import Dict, Optional
+
+import numpy as np
+
+DEFAULT_BIRTH_RATE = 82.0
+DEFAULT_PURCHASE_RATE = 84.0
+
+
+class BirthRateTable:
+    """Immutable snapshot of T008 (dense product × week matrix) and T009."""
+
+    __slots__ = ("version", "products", "rates", "present", "_index", "_purchase")
+
+    def __init__(self, version: int, rows, purchase: Dict[str, float]):
+        self.version = version
+        products = sorted({r["product"] for r in rows if r["product"] is not None and r["week"] is not None})
+        self._index = MappingProxyType({p: i for i, p in enumerate(products)})
+        self.products = tuple(products)
+        weeks = max((r["week"] for r in rows if r["week"] is not None and r["week"] >= 0), default=-1) + 1
+        self.rates = np.full((len(products), weeks), DEFAULT_BIRTH_RATE, dtype=np.float64)
+        self.present = np.zeros((len(products), weeks), dtype=bool)
+        # First row per (product, week) wins, as get_birth_rate's .first() did
+        for r in sorted(rows, key=lambda r: r["id"]):
+            i = self._index.get(r["product"])
+            week = r["week"]
+            if i is None or week is None or week < 0 or self.present[i, week]:
+                continue
+            self.rates[i, week] = DEFAULT_BIRTH_RATE if r["rate"] is None else r["rate"]
+            self.present[i, week] = True
+        self.rates.flags.writeable = False
+        self.present.flags.writeable = False
+        self._purchase = MappingProxyType(dict(purchase))
+
+    def rate(self, product: str, week: int) -> float:
+        """T008 percentage for `product` at age `week`, DEFAULT_BIRTH_RATE when missing."""
+        i = self._index.get(product)
+        if i is None or not 0 <= week < self.rates.shape[1]:
+            return DEFAULT_BIRTH_RATE
+        return float(self.rates[i, week])
+
+    def lookup(self, product: str, week: int) -> Optional[float]:
+        """T008 percentage, or None when birth_rates has no row for it."""
+        i = self._index.get(product)
+        if i is None or not 0 <= week < self.rates.shape[1] or not self.present[i, week]:
+            return None
+        return float(self.rates[i, week])
+
+    def rates_for(self, product: str, weeks) -> np.ndarray:
+        """Vectorized rate(): one percentage per entry of `weeks`."""
+        weeks = np.asarray(weeks, dtype=np.int64)
+        out = np.full(weeks.shape, DEFAULT_BIRTH_RATE, dtype=np.float64)
+        i = self._index.get(product)
+        if i is None:
+            return out
+        inside = (weeks >= 0) & (weeks < self.rates.shape[1])
+        out[inside] = self.rates[i, weeks[inside]]
+        return out
+
+    def present_for(self, product: str, weeks) -> np.ndarray:
+        """Vectorized lookup() test: True where birth_rates has a row for the age."""
+        weeks = np.asarray(weeks, dtype=np.int64)
+        out = np.zeros(weeks.shape, dtype=bool)
+        i = self._index.get(product)
+        if i is None:
+            return out
+        inside = (weeks >= 0) & (weeks < self.present.shape[1])
+        out[inside] = self.present[i, weeks[inside]]
+        return out
+
+    def purchase_rate(self, product: str, default: float = DEFAULT_PURCHASE_RATE) -> float:
+        """T009 percentage for eggs bought for `product`."""
+        return self._purchase.get(product, default)
+
+
+_lock = threading.Lock()
+_version = 1
+_table: Optional[BirthRateTable] = None
+
+
+def get_birth_rate_table() -> BirthRateTable:
+    """Current compiled snapshot, rebuilt if the version moved."""
+    global _table
+    table = _table
+    if table is not None and table.version == _version:
+        return table
+    with _lock:
+        if _table is None or _table.version != _version:
+            # Imported here: database imports this module to invalidate it
+            from database import get_birth_rates, get_purchase_birth_rates
+            _table = BirthRateTable(_version, get_birth_rates(), get_purchase_birth_rates())
+        return _table
+
+
+def invalidate_birth_rates() -> int:
+    """Bumps the version after a write to birth_rates or purchase_birth_rates."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
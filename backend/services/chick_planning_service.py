@@ -0,0 +1,402 @@
+"""
+Chick Planning Service - Motore unico della pianificazione nascite T010-T013
+
+Le tabelle pulcini dei quattro prodotti seguono tutte la stessa formula:
+settimana di nascita = settimana di produzione + 3, uova per capannone al
+netto delle vendite (stesso allocatore del riepilogo), pulcini con il
+tasso T008 per età del capannone e il tasso T009 sulle uova acquistate,
+arrotondati al centinaio. Cambiano solo pochi parametri, raccolti in
+ProductPlan:
+
+- nome del prodotto in T001/T004/T005 e chiave dei tassi T008/T009;
+- tasso mancante: 82% di default di T008, oppure 84% dove birth_rates
+  non ha una riga (Color Yeald e Pollo70 estesi);
+- pulcini per capannone arrotondati (round) o troncati (int);
+- dettagli per i tooltip (produzione, acquisti, calcolo animali).
+
+La domanda è una strategia a parte: ClientDemand per le tabelle *-extended
+(colonne per cliente da client_demand e residuo maschi/femmine),
+GuidiDemand per la T010 generica (richiesta_guidi / altri_clienti salvati
+in chick_planning).
+
+La produzione per capannone arriva dai blocchi per lotto di
+production_cache, gli stessi da cui parte il riepilogo settimanale
+(ProductionService.production_entries_for_lotti): i lotti già in memoria
+non vengono ricalcolati.
+
+Gli input (produzione, trading, assegnazioni, impostazioni ciclo, tassi)
+sono raccolti in PlanningInputs: all_extended_planning() li carica una
+volta sola per i quattro prodotti (GET /api/chick-planning/all).
+"""
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from database import (
+    get_assegnazioni_by_week,
+    get_chick_planning,
+    get_client_demand,
+    get_cycle_settings,
+    get_demand_clients,
+    get_lotti,
+    get_trading_data,
+)
+from services import week_calendar
+from services.birth_rate_store import get_birth_rate_table
+from services.production_service import ProductionService
+from services.sales_allocation import allocate_sales
+
+INCUBATION_WEEKS = 3  # birth week = production week + 3
+FIRST_BIRTH_OFFSET = 3  # tables start three weeks after the current one
+PLANNING_WEEKS = 52
+
+# Product key of the routes (lowercased) -> product name in T001 / T004 / T005
+DB_PRODUCT_NAMES = {"granpollo": "Granpollo", "pollo70": "Pollo70", "coloryeald": "Color Yeald", "ross": "Ross"}
+
+# richiesta_guidi / altri_clienti of the weeks never saved in chick_planning
+DEFAULT_DEMAND = {
+    "granpollo": {"richiesta_guidi": 80000, "altri_clienti": 3000},
+    "pollo70": {"richiesta_guidi": 40000, "altri_clienti": 5400},
+    "colorYeald": {"richiesta_guidi": 2500, "altri_clienti": 500},
+    "ross": {"richiesta_guidi": 50000, "altri_clienti": 5000},
+}
+FALLBACK_DEMAND = {"richiesta_guidi": 50000, "altri_clienti": 5000}
+
+
+class ProductPlan:
+    """Parameters that set one product's planning table apart."""
+
+    __slots__ = ("product", "db_product", "missing_rate", "rounding", "details")
+
+    def __init__(self, product: str, db_product: str, missing_rate: Optional[float] = None,
+                 rounding: Callable[[float], int] = round, details: bool = False):
+        self.product = product  # T008 / T009 key, echoed as "product"
+        self.db_product = db_product
+        # None: T008 rate with its 82% default; otherwise the percentage used
+        # where birth_rates has no row (or a zero rate) for that age
+        self.missing_rate = missing_rate
+        self.rounding = rounding
+        self.details = details  # production/purchase/animali details per week
+
+
+class ClientDemand:
+    """Per-client requests of the *-extended tables (client_demand), split on maschi/femmine."""
+
+    __slots__ = ("product",)
+
+    def __init__(self, product: str):
+        self.product = product
+
+    def load(self, inputs: "PlanningInputs"):
+        client_data = inputs.client_demand.get(self.product)
+        if client_data is None:
+            client_data = get_client_demand([self.product], inputs.weeks[0], inputs.weeks[-1])[self.product]
+        return get_demand_clients(self.product), client_data
+
+    def header(self, loaded) -> Dict:
+        clients, _ = loaded
+        return {"clients": clients}
+
+    def columns(self, loaded, anno: int, settimana: int, animali_possibili: int) -> Dict:
+        clients, client_data = loaded
+        client_values = {}
+        richieste_maschi = 0
+        richieste_femmine = 0
+        for client in clients:
+            quantita = client_data.get((anno, settimana, client['id']), 0)
+            client_values[client['id']] = quantita
+            if client['sex_type'] == 'maschi':
+                richieste_maschi += quantita
+            elif client['sex_type'] == 'femmine':
+                richieste_femmine += quantita
+            else:  # entrambi - 50/50 split
+                richieste_maschi += quantita // 2
+                richieste_femmine += quantita // 2
+        # Available chicks are split 50/50
+        return {
+            "client_values": client_values,
+            "totale_maschi": animali_possibili // 2 - richieste_maschi,
+            "totale_femmine": animali_possibili // 2 - richieste_femmine,
+        }
+
+
+class GuidiDemand:
+    """richiesta_guidi / altri_clienti saved in chick_planning (T010 generic table)."""
+
+    __slots__ = ("product", "defaults")
+
+    def __init__(self, product: str):
+        self.product = product
+        self.defaults = DEFAULT_DEMAND.get(product, FALLBACK_DEMAND)
+
+    def load(self, inputs: "PlanningInputs"):
+        return get_chick_planning(self.product)
+
+    def header(self, loaded) -> Dict:
+        return {}
+
+    def columns(self, loaded, anno: int, settimana: int, animali_possibili: int) -> Dict:
+        planning = loaded.get((anno, settimana), self.defaults)
+        richiesta_guidi = planning['richiesta_guidi']
+        altri_clienti = planning['altri_clienti']
+        return {
+            "richiesta_guidi": richiesta_guidi,
+            "altri_clienti": altri_clienti,
+            "mancanze_esubero": animali_possibili - richiesta_guidi - altri_clienti,
+        }
+
+
+# *-extended tables (T010-T013 with client columns)
+# Array form of the ProductPlan roundings (both round half to even / toward zero)
+_ARRAY_ROUNDING = {round: np.rint, int: np.trunc}
+
+EXTENDED_PLANS = {
+    "granpollo": ProductPlan("granpollo", "Granpollo", rounding=int, details=True),
+    "pollo70": ProductPlan("pollo70", "Pollo70", missing_rate=84.0, rounding=int),
+    "colorYeald": ProductPlan("colorYeald", "Color Yeald", missing_rate=84.0, rounding=int),
+    "ross": ProductPlan("ross", "Ross"),
+}
+CLIENT_DEMANDS = {product: ClientDemand(product) for product in EXTENDED_PLANS}
+
+
+def planning_weeks(start_offset: int = FIRST_BIRTH_OFFSET, num_weeks: int = PLANNING_WEEKS) -> List[tuple]:
+    """Birth weeks of the tables, starting from current + offset."""
+    current_year, current_week = week_calendar.current_week()
+    return list(week_calendar.week_range(*week_calendar.normalize(current_year, current_week + start_offset), num_weeks))
+
+
+def production_window(weeks) -> tuple:
+    """(first, last) production week feeding the given birth weeks (birth - 3)."""
+    first = week_calendar.normalize(weeks[0][0], weeks[0][1] - INCUBATION_WEEKS)
+    last = week_calendar.normalize(weeks[-1][0], weeks[-1][1] - INCUBATION_WEEKS)
+    return first, last
+
+
+class PlanningInputs:
+    """
+    Everything the planning tables of a set of products read, loaded once:
+    production per shed, trading rows, assignments, auto_assign_sales and
+    the birth-rate snapshot, all limited to the production window of `weeks`,
+    plus the client_demand cells of `demand_products` over the birth weeks.
+    """
+
+    __slots__ = ("weeks", "from_week", "to_week", "lotto_details", "purchases", "purchase_details",
+                 "sales", "assegnazioni", "auto_assign", "birth_rates", "client_demand")
+
+    def __init__(self, db_products: List[str], weeks: Optional[List[tuple]] = None,
+                 demand_products: Iterable[str] = ()):
+        self.weeks = weeks or planning_weeks()
+        self.from_week, self.to_week = production_window(self.weeks)
+        db_products = list(dict.fromkeys(db_products))
+        self.lotto_details = _production_details(db_products, self.from_week, self.to_week)
+        self.purchases, self.purchase_details = _trading_by_week("acquisto", db_products, self.from_week, self.to_week)
+        self.sales, _ = _trading_by_week("vendita", db_products, self.from_week, self.to_week)
+        self.assegnazioni = get_assegnazioni_by_week(db_products, self.from_week, self.to_week)
+        self.auto_assign = bool(get_cycle_settings().get('auto_assign_sales'))
+        self.birth_rates = get_birth_rate_table()
+        demand_products = list(demand_products)
+        self.client_demand = (
+            get_client_demand(demand_products, self.weeks[0], self.weeks[-1]) if demand_products else {}
+        )
+
+
+def extended_planning(product: str) -> Dict:
+    """The *-extended table of `product` (a key of EXTENDED_PLANS)."""
+    return build_planning(EXTENDED_PLANS[product], CLIENT_DEMANDS[product])
+
+
+def all_extended_planning() -> Dict[str, Dict]:
+    """All *-extended tables, {product: table} in EXTENDED_PLANS order, on one PlanningInputs."""
+    inputs = PlanningInputs([plan.db_product for plan in EXTENDED_PLANS.values()],
+                            demand_products=EXTENDED_PLANS)
+    return {
+        product: build_planning(plan, CLIENT_DEMANDS[product], inputs)
+        for product, plan in EXTENDED_PLANS.items()
+    }
+
+
+def product_planning(product: str) -> Dict:
+    """The T010 generic table of `product`, with richiesta Guidi / altri clienti."""
+    plan = ProductPlan(product, DB_PRODUCT_NAMES.get(product.lower(), product), details=True)
+    return build_planning(plan, GuidiDemand(product))
+
+
+def build_planning(plan: ProductPlan, demand, inputs: Optional[PlanningInputs] = None) -> Dict:
+    """
+    Planning table of one product: {"product", "has_vendite",
+    "has_acquisti", [demand header], "data": [one row per birth week]}.
+    Without `inputs`, they are loaded for this product alone over the 52
+    birth weeks from current + 3.
+    """
+    if inputs is None:
+        inputs = PlanningInputs([plan.db_product])
+    weeks = inputs.weeks
+    sources = [week_calendar.normalize(anno, settimana - INCUBATION_WEEKS) for anno, settimana in weeks]
+    db_key = plan.db_product.lower()
+    lotto_details = inputs.lotto_details.get(db_key, {})
+    purchases_map = inputs.purchases.get(db_key, {})
+    purchase_details_map = inputs.purchase_details.get(db_key, {})
+    sales_map = inputs.sales.get(db_key, {})
+    assegnazioni = inputs.assegnazioni.get(plan.db_product, {})
+    birth_rates = inputs.birth_rates
+    purchase_rate_percent = birth_rates.purchase_rate(plan.product)
+    loaded = demand.load(inputs)
+
+    # Sales subtracted from each shed for all source weeks in one sweep,
+    # same rules as the production summary
+    flat = [(i, entry) for i, source in enumerate(sources) for entry in lotto_details.get(source, [])]
+    eta_flat = [entry.get('eta', 0) for _, entry in flat]
+    remaining = allocate_sales(
+        [i for i, _ in flat],
+        [entry.get('allevamento') for _, entry in flat],
+        eta_flat,
+        [entry.get('uova', 0) for _, entry in flat],
+        {i: assegnazioni.get(week_calendar.week_key(*source), {}) for i, source in enumerate(sources)},
+        {i: sales_map.get(source, 0) for i, source in enumerate(sources)},
+        inputs.auto_assign,
+    )
+    rates = rate_percents(plan, birth_rates, eta_flat)
+    chicks = shed_chicks(plan, rates, remaining)
+    remaining_by_week: Dict[int, List[tuple]] = {}
+    for (i, entry), uova_remaining, rate_percent, result_value in zip(
+            flat, remaining.tolist(), rates.tolist(), chicks.tolist()):
+        remaining_by_week.setdefault(i, []).append((entry, uova_remaining, rate_percent, result_value))
+
+    has_vendite = False
+    has_acquisti = False
+    result = []
+    for i, ((birth_year, birth_week), source_key) in enumerate(zip(weeks, sources)):
+        # GROSS production of the sheds: the summary's produzione_totale is
+        # already net of assignments and would double-count the deduction
+        uova_prodotte = sum(e.get('uova', 0) for e in lotto_details.get(source_key, []))
+        uova_acquistate = purchases_map.get(source_key, 0)
+        uova_vendute = sales_map.get(source_key, 0)
+        if uova_vendute > 0:
+            has_vendite = True
+        if uova_acquistate > 0:
+            has_acquisti = True
+
+        animali = 0
+        animali_calc_details = []
+        for entry, uova_remaining, rate_percent, result_value in remaining_by_week.get(i, []):
+            if uova_remaining > 0:
+                animali += result_value
+                animali_calc_details.append({
+                    "source": entry.get('allevamento', '?'),
+                    "uova": uova_remaining,
+                    "eta": entry['eta'],
+                    "rate_percent": rate_percent,
+                    "animali": result_value
+                })
+        if uova_acquistate > 0:
+            result_value = purchase_chicks(plan, birth_rates, uova_acquistate)
+            animali += result_value
+            animali_calc_details.append({
+                "source": "Uova Acquistate",
+                "uova": uova_acquistate,
+                "eta": None,
+                "rate_percent": purchase_rate_percent,
+                "animali": result_value
+            })
+
+        # Round to nearest 100
+        animali_possibili = round(animali / 100) * 100
+
+        row = {
+            "settimana_nascita": f"{birth_year}/{birth_week:02d}",
+            "anno": birth_year,
+            "settimana": birth_week,
+            "uova_prodotte": uova_prodotte,
+            "uova_acquistate": uova_acquistate,
+            "uova_vendute": uova_vendute,
+            "uova_totali": uova_prodotte + uova_acquistate - uova_vendute,
+            "animali_possibili": animali_possibili,
+        }
+        row.update(demand.columns(loaded, birth_year, birth_week, animali_possibili))
+        if plan.details:
+            row["production_details"] = lotto_details.get(source_key, [])
+            row["purchase_details"] = purchase_details_map.get(source_key, [])
+            row["animali_calc_details"] = animali_calc_details
+        result.append(row)
+
+    return {
+        "product": plan.product,
+        "has_vendite": has_vendite,
+        "has_acquisti": has_acquisti,
+        **demand.header(loaded),
+        "data": result,
+    }
+
+
+def _production_details(db_products: List[str], from_week: tuple,
+                        to_week: tuple) -> Dict[str, Dict[tuple, List[Dict]]]:
+    """
+    {product (lowercase): {(anno, settimana): [gross production of each shed]}}
+    of the active lotti of `db_products`, matched case-insensitively as
+    T001 is typed by hand. Production of all of them is read in one pass.
+    """
+    wanted = {p.lower() for p in db_products}
+    lotti = [l for l in get_lotti() if l.get('Attivo', True) and (l.get('Prodotto') or '').lower() in wanted]
+    details: Dict[str, Dict[tuple, List[Dict]]] = {p: {} for p in wanted}
+    for lotto, entries in zip(lotti, ProductionService.production_entries_for_lotti(lotti, from_week, to_week)):
+        lotto_details = details[lotto['Prodotto'].lower()]
+        for entry in entries:
+            lotto_details.setdefault((entry['anno'], entry['settimana']), []).append({
+                "allevamento": entry.get('allevamento', f"Lotto {lotto.get('id')}"),
+                "capannone": lotto.get('Capannone', ''),
+                "razza": lotto.get('Razza', ''),
+                "razza_gallo": lotto.get('Razza_Gallo', ''),
+                "eta": entry.get('eta', 30),
+                "uova": entry['uova']
+            })
+    return details
+
+
+def _trading_by_week(tipo: str, db_products: List[str], from_week: tuple, to_week: tuple) -> tuple:
+    """
+    ({product: {(anno, settimana): total}}, {product: {(anno, settimana):
+    [{azienda, quantita}]}}) of the positive rows, products lowercased.
+    """
+    wanted = {p.lower() for p in db_products}
+    totals: Dict[str, Dict[tuple, int]] = {p: {} for p in wanted}
+    details: Dict[str, Dict[tuple, List[Dict]]] = {p: {} for p in wanted}
+    for row in get_trading_data(tipo, from_week, to_week):
+        product = (row.prodotto or '').lower()
+        if product in wanted and row.quantita > 0:
+            key = (row.anno, row.settimana)
+            totals[product][key] = totals[product].get(key, 0) + row.quantita
+            details[product].setdefault(key, []).append({
+                "azienda": row.azienda,
+                "quantita": row.quantita
+            })
+    return totals, details
+
+
+def plan_for(db_product: str) -> ProductPlan:
+    """Plan of a T001 product name (any case): its *-extended plan, defaults for other products."""
+    for plan in EXTENDED_PLANS.values():
+        if plan.db_product.lower() == str(db_product).lower():
+            return plan
+    return ProductPlan(str(db_product).lower(), db_product)
+
+
+def rate_percents(plan: ProductPlan, birth_rates, eta) -> np.ndarray:
+    """T008 percentage applied to sheds aged `eta` (one per entry)."""
+    rates = birth_rates.rates_for(plan.product, eta)
+    if plan.missing_rate is None:
+        return rates
+    # lookup() or missing_rate: no row, or a zero rate, falls back
+    present = birth_rates.present_for(plan.product, eta) & (rates != 0)
+    return np.where(present, rates, plan.missing_rate)
+
+
+def shed_chicks(plan: ProductPlan, rates: np.ndarray, uova) -> np.ndarray:
+    """Chicks from each shed: eggs left after sales × rate, rounded as the plan says; 0 without eggs."""
+    uova = np.asarray(uova, dtype=np.int64)
+    chicks = _ARRAY_ROUNDING[plan.rounding](uova * (rates / 100.0)).astype(np.int64)
+    return np.where(uova > 0, chicks, 0)
+
+
+def purchase_chicks(plan: ProductPlan, birth_rates, uova: int) -> int:
+    """Chicks from purchased eggs: T009 rate, rounded as the plan says."""
+    return plan.rounding(uova * (birth_rates.purchase_rate(plan.product) / 100.0))
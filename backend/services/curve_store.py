@@ -0,0 +1,125 @@
+"""
+Curve Store - Curve di produzione T003 compilate in memoria
+
+standard_curves viene letta e convertita una sola volta per processo:
+- W parsato in un array float (NaN dove non numerico)
+- ogni colonna curva in un array float64 di frazioni (NaN dove vuota)
+
+I lettori ricevono uno snapshot immutabile: nessuna query SQL né lavoro
+pandas sul percorso caldo. Gli endpoint che scrivono standard_curves
+chiamano invalidate_curves(), che incrementa la versione; lo snapshot
+viene ricompilato alla lettura successiva.
+"""
+import re
+import threading
+from types import MappingProxyType
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import carica_dati_v20, pulisci_percentuale
+
+
+def normalize_curve_name(name: str) -> str:
+    """Collapses whitespace the same way carica_dati_v20 normalizes column names."""
+    return re.sub(r'\s+', ' ', str(name)).strip()
+
+
+def _parse_w(valore) -> float:
+    """Parses a W cell (age in weeks); NaN when not a plain non-negative number."""
+    if valore is None or (isinstance(valore, float) and np.isnan(valore)):
+        return np.nan
+    val_w = str(valore).replace(',', '.').strip()
+    if not val_w.replace('.', '', 1).isdigit():
+        return np.nan
+    try:
+        return float(val_w)
+    except ValueError:
+        return np.nan
+
+
+def _parse_curve_cell(valore) -> float:
+    """Parses a curve cell into a fraction; NaN for missing cells."""
+    if valore is None or pd.isna(valore):
+        return np.nan
+    return pulisci_percentuale(valore)
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+class CurveSnapshot:
+    """Immutable, pre-parsed view of standard_curves at a given version."""
+
+    __slots__ = ("version", "w", "columns", "_curves")
+
+    def __init__(self, version: int, w: np.ndarray, curves: Dict[str, np.ndarray]):
+        self.version = version
+        self.w = _readonly(w)
+        self.columns = tuple(curves.keys())
+        self._curves = MappingProxyType({k: _readonly(v) for k, v in curves.items()})
+
+    @property
+    def empty(self) -> bool:
+        return len(self.w) == 0
+
+    def get(self, curve_name: Optional[str]) -> Optional[np.ndarray]:
+        """Returns the fractions array aligned with `w`, looked up by normalized name."""
+        if not curve_name:
+            return None
+        return self._curves.get(normalize_curve_name(curve_name))
+
+    def __contains__(self, curve_name) -> bool:
+        return self.get(curve_name) is not None
+
+    def __reduce__(self):
+        # Picklable for the production pool workers (mappingproxy is not)
+        return (CurveSnapshot, (self.version, self.w, dict(self._curves)))
+
+
+_lock = threading.Lock()
+_version = 1
+_snapshot: Optional[CurveSnapshot] = None
+
+
+def _compile(version: int) -> CurveSnapshot:
+    df = carica_dati_v20()
+    if df.empty or 'W' not in df.columns:
+        return CurveSnapshot(version, np.array([], dtype=np.float64), {})
+
+    w = np.array([_parse_w(v) for v in df['W'].tolist()], dtype=np.float64)
+    curves: Dict[str, np.ndarray] = {}
+    for pos, col in enumerate(df.columns):
+        if col == 'W' or col in curves:
+            continue
+        values = df.iloc[:, pos].tolist()
+        curves[col] = np.array([_parse_curve_cell(v) for v in values], dtype=np.float64)
+    return CurveSnapshot(version, w, curves)
+
+
+def get_curve_snapshot() -> CurveSnapshot:
+    """Returns the current compiled snapshot, rebuilding it if the version moved."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == _version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != _version:
+            _snapshot = _compile(_version)
+        return _snapshot
+
+
+def get_curves_version() -> int:
+    """Current version stamp of standard_curves."""
+    return _version
+
+
+def invalidate_curves() -> int:
+    """Bumps the version stamp after a write to standard_curves."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
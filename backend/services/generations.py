@@ -0,0 +1,240 @@
+"""
+Generations - Contatori di versione per tabella di input
+
+Ogni tabella da cui dipende il riepilogo produzione ha un contatore
+monotono, incrementato dopo ogni commit che l'ha modificata. Il vettore
+dei contatori identifica lo stato degli input: due letture con lo stesso
+vettore vedono gli stessi dati e possono condividere il risultato.
+
+Le scritture ORM (helper di database.py e router) sono tracciate in
+automatico dagli eventi di sessione: flush per add/modifica/cancellazione,
+do_orm_execute per update()/delete() in blocco. Il contatore sale solo
+dopo il commit, mai su rollback. standard_curves è scritta via pandas
+to_sql e usa la versione di curve_store.
+
+Per trading_data e vendita_assegnazione ogni incremento registra anche le
+settimane (anno, settimana) toccate, così il riepilogo può ricalcolare
+solo quelle (changed_weeks). Le righe TradingData portano la propria
+settimana; le scritture senza settimana nota (update/delete in blocco,
+VenditaAssegnazione) la dichiarano con mark_weeks, altrimenti contano
+come "settimane ignote" e forzano un ricalcolo completo.
+
+Le scritture fuori da una sessione ORM non passano dagli eventi e non
+incrementano nulla: connessioni engine.connect()/sqlite3 con text() o
+Core, pandas to_sql, e anche text() eseguito in una sessione (non se ne
+conosce la tabella). Chi scrive così una tabella tracciata deve chiamare
+bump() dopo il commit (invalidate_curves per standard_curves) e
+database.mark_weekly_totals_stale() per i totali materializzati. Le
+migrazioni di init_db girano all'avvio, prima che qualunque cache sia
+riempita, e oggi toccano solo tabelle non tracciate.
+
+production_blocks non è una tabella: è il contatore dei blocchi per lotto
+di services.production_cache. I router li scartano dopo il commit che li
+ha resi vecchi (invalidate_cache_by_lotto, delete_cache_by_lotto...); un
+riepilogo calcolato in quell'intervallo legge il blocco vecchio sotto il
+vettore nuovo, quindi anche lo scarto deve muovere il vettore.
+
+Le tabelle di SIDE_TABLES (incubazioni e incubatrici) hanno un contatore
+letto con get_generation ma restano fuori dal vettore: servono alla
+cache dell'occupazione incubatrici, non al riepilogo produzione.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+TRACKED_TABLES = (
+    "lotti",
+    "trading_data",
+    "vendita_assegnazione",
+    "manual_production_adjustments",
+    "standard_curves",
+    "cycle_settings",
+    "schede_settimanali",
+    "cycle_weekly_data",
+    # Not a table: bumped by services.production_cache when lotto blocks are
+    # dropped, which happens after the commit that made them stale
+    "production_blocks",
+)
+
+# Counted for their own caches (incubator occupancy) but left out of
+# generation_vector, so their writes do not invalidate the summaries
+SIDE_TABLES = ("incubations", "incubation_batches", "incubator_machines")
+
+# Tables whose writes are journaled with the weeks they touched
+WEEK_SCOPED_TABLES = ("trading_data", "vendita_assegnazione")
+WEEK_LOG_SIZE = 256
+
+Week = Tuple[int, int]
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {t: 0 for t in TRACKED_TABLES + SIDE_TABLES if t != "standard_curves"}
+# table -> {generation: weeks written by that bump, None if unknown}
+_week_log: Dict[str, "OrderedDict[int, Optional[FrozenSet[Week]]]"] = {
+    t: OrderedDict() for t in WEEK_SCOPED_TABLES
+}
+
+
+def bump(*tables: str, weeks: Optional[Dict[str, Optional[Iterable[Week]]]] = None):
+    """
+    Increments the counter of each tracked table in `tables`. Called by
+    the session listeners, and directly after writes made outside ORM
+    sessions.
+    `weeks` maps a week-scoped table to the weeks the write touched;
+    missing entries are journaled as unknown.
+    """
+    weeks = weeks or {}
+    with _lock:
+        for table in tables:
+            if table not in _counters:
+                continue
+            _counters[table] += 1
+            if table in _week_log:
+                touched = weeks.get(table)
+                log = _week_log[table]
+                log[_counters[table]] = frozenset(touched) if touched is not None else None
+                while len(log) > WEEK_LOG_SIZE:
+                    log.popitem(last=False)
+
+
+def generation_vector() -> Tuple[int, ...]:
+    """Current counters, one per TRACKED_TABLES entry (same order)."""
+    # Imported here: curve_store depends on utils.helpers, which imports database
+    from services.curve_store import get_curves_version
+    with _lock:
+        return tuple(
+            get_curves_version() if t == "standard_curves" else _counters[t]
+            for t in TRACKED_TABLES
+        )
+
+
+def get_generation(table: str) -> int:
+    """Current counter of a single tracked table."""
+    if table == "standard_curves":
+        from services.curve_store import get_curves_version
+        return get_curves_version()
+    with _lock:
+        return _counters[table]
+
+
+def changed_weeks(old_vector: Tuple[int, ...], new_vector: Tuple[int, ...]) -> Optional[Set[Week]]:
+    """
+    Weeks written between two generation vectors, or None when that is not
+    known: a table outside WEEK_SCOPED_TABLES moved, a write had no week
+    information or the journal no longer reaches back to old_vector.
+    """
+    weeks: Set[Week] = set()
+    with _lock:
+        for table, old, new in zip(TRACKED_TABLES, old_vector, new_vector):
+            if old == new:
+                continue
+            if table not in _week_log or new < old:
+                return None
+            log = _week_log[table]
+            for generation in range(old + 1, new + 1):
+                touched = log.get(generation)
+                if touched is None:
+                    return None
+                weeks |= touched
+    return weeks
+
+
+def mark_weeks(session, table: str, weeks: Iterable[Week]):
+    """
+    Declares the weeks a pending write on `table` touches. Use it for
+    writes whose rows do not carry anno/settimana (bulk update/delete,
+    vendita_assegnazione); declared weeks override "unknown".
+    """
+    _declared(session).setdefault(table, set()).update(weeks)
+
+
+def pending_changes(session) -> Tuple[Set[str], Dict[str, Set[Week]]]:
+    """
+    Counted tables the session has flushed writes to since its last
+    commit, and the weeks of the week-scoped ones whose weeks are known
+    (the same information bump() journals at commit). For before_commit
+    listeners; call session.flush() first.
+    """
+    touched = set(session.info.get("generations_touched", ()))
+    row_weeks = _row_weeks(session)
+    unscoped = _unscoped(session)
+    declared = _declared(session)
+    weeks = {}
+    for table in touched:
+        if table in declared:
+            weeks[table] = declared[table] | row_weeks.get(table, set())
+        elif table in row_weeks and table not in unscoped:
+            weeks[table] = row_weeks[table]
+    return touched, weeks
+
+
+def _touched(session) -> set:
+    return session.info.setdefault("generations_touched", set())
+
+
+def _row_weeks(session) -> Dict[str, Set[Week]]:
+    return session.info.setdefault("generations_row_weeks", {})
+
+
+def _unscoped(session) -> set:
+    return session.info.setdefault("generations_unscoped", set())
+
+
+def _declared(session) -> Dict[str, Set[Week]]:
+    return session.info.setdefault("generations_declared", {})
+
+
+def _object_weeks(obj) -> Optional[Set[Week]]:
+    """(anno, settimana) of an ORM row, old and new values, None if it has none."""
+    if not (hasattr(obj, "anno") and hasattr(obj, "settimana")):
+        return None
+    state = inspect(obj)
+    annos = set(state.attrs.anno.history.deleted or ()) | {obj.anno}
+    settimane = set(state.attrs.settimana.history.deleted or ()) | {obj.settimana}
+    return {(a, s) for a in annos for s in settimane}
+
+
+def _clear(session):
+    for key in ("generations_touched", "generations_row_weeks",
+                "generations_unscoped", "generations_declared"):
+        session.info.pop(key, None)
+
+
+def track_session_writes(session_factory):
+    """Installs the session listeners that bump counters after each commit."""
+
+    @event.listens_for(session_factory, "after_flush")
+    def _after_flush(session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            table = getattr(obj, "__tablename__", None)
+            if table in _counters:
+                _touched(session).add(table)
+                if table in _week_log:
+                    weeks = _object_weeks(obj)
+                    if weeks is None:
+                        _unscoped(session).add(table)
+                    else:
+                        _row_weeks(session).setdefault(table, set()).update(weeks)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _do_orm_execute(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        table = getattr(orm_execute_state.statement, "table", None)
+        name = getattr(table, "name", None)
+        if name in _counters:
+            _touched(orm_execute_state.session).add(name)
+            if name in _week_log:
+                _unscoped(orm_execute_state.session).add(name)
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        touched, weeks = pending_changes(session)
+        if touched:
+            bump(*touched, weeks=weeks)
+        _clear(session)
+
+    @event.listens_for(session_factory, "after_soft_rollback")
+    def _after_rollback(session, previous_transaction):
+        _clear(session)
@@ -0,0 +1,237 @@
+"""
+Incubator Occupancy - Occupazione delle incubatrici per macchina
+
+Le uova di ogni incubazione (una sola GROUP BY su incubation_batches)
+vengono ripartite sulle macchine elencate in Incubation.incubatrici in
+proporzione alla capacità configurata (incubator_machines). Le macchine
+non configurate entrano con capacità 0; le incubazioni senza macchine
+finiscono in NO_MACHINE.
+
+La linea temporale giornaliera [macchina × giorno] si ottiene con un
+solo passaggio numpy: +uova il giorno di incubazione, -uova dopo
+INCUBATION_DAYS, somma cumulata. Per settimana ISO si riportano:
+- uova: incubazioni partite nella settimana o nelle due precedenti,
+  come ha sempre fatto la tabella di occupazione settimanale;
+- picco: massimo giornaliero della settimana.
+
+Il risultato è condiviso tra la tabella occupazione e T017 e resta in
+cache finché non cambiano incubations, incubation_batches o
+incubator_machines (services.generations) o la data di partenza.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from services import generations
+from services.summary_cache import SummaryCache
+
+INCUBATION_DAYS = 21
+OCCUPANCY_WEEKS = 3  # Week of incubazione and the next two
+LOOKBACK_DAYS = 60
+NO_MACHINE = "-"
+
+_timelines = SummaryCache(maxsize=8)
+
+
+def parse_incubatrici(value: Optional[str]) -> List[str]:
+    """'1, 3,5f' -> ['1', '3', '5F']: trimmed, upper-case, without repeats."""
+    machines = []
+    for name in (value or "").split(","):
+        name = name.strip().upper()
+        if name and name not in machines:
+            machines.append(name)
+    return machines
+
+
+def split_eggs(uova: int, capacities: List[int]) -> List[int]:
+    """
+    Integer split of `uova` proportional to `capacities` (equal parts when
+    they are all 0); the remainder goes to the first machines.
+    """
+    total = sum(capacities)
+    weights = capacities if total > 0 else [1] * len(capacities)
+    total = sum(weights)
+    shares = [uova * w // total for w in weights]
+    for i in range(uova - sum(shares)):
+        shares[i % len(shares)] += 1
+    return shares
+
+
+class OccupancyTimeline:
+    """
+    Per-machine occupancy from `start` (a Monday) for len(weeks) whole ISO
+    weeks: daily [machine, day], weekly and weekly_peak [machine, week].
+    Shared between requests: read only.
+    """
+
+    __slots__ = ("machines", "capacities", "start", "weeks", "daily", "weekly", "weekly_peak")
+
+    def __init__(self, machines: List[str], capacities: List[int], start: date,
+                 weeks: List[Tuple[int, int]], daily: np.ndarray, weekly: np.ndarray,
+                 weekly_peak: np.ndarray):
+        self.machines = tuple(machines)
+        self.capacities = np.asarray(capacities, dtype=np.int64)
+        self.start = start
+        self.weeks = tuple(weeks)
+        self.daily = daily
+        self.weekly = weekly
+        self.weekly_peak = weekly_peak
+        for array in (self.capacities, daily, weekly, weekly_peak):
+            array.flags.writeable = False
+
+    @property
+    def capacita_totale(self) -> int:
+        return int(self.capacities.sum())
+
+    def weekly_totals(self) -> Dict[Tuple[int, int], int]:
+        """{(anno, settimana): eggs in all machines}, weeks with eggs only."""
+        totals = self.weekly.sum(axis=0)
+        return {week: int(totals[i]) for i, week in enumerate(self.weeks) if totals[i] > 0}
+
+    def week_rows(self) -> List[Dict]:
+        """Weekly table, weeks with eggs only, with the per-machine breakdown."""
+        capacita = self.capacita_totale
+        totals = self.weekly.sum(axis=0)
+        rows = []
+        for i, (anno, settimana) in enumerate(self.weeks):
+            if totals[i] <= 0:
+                continue
+            rows.append({
+                "anno": anno,
+                "settimana": settimana,
+                "uova_totali": int(totals[i]),
+                "capacita_massima": capacita,
+                "percentuale": _percent(totals[i], capacita),
+                "macchine": self._machine_cells(self.weekly[:, i], self.weekly_peak[:, i]),
+            })
+        return rows
+
+    def day_rows(self) -> List[Dict]:
+        """Daily table, days with eggs only, with the per-machine breakdown."""
+        capacita = self.capacita_totale
+        totals = self.daily.sum(axis=0)
+        rows = []
+        for d in np.flatnonzero(totals > 0):
+            rows.append({
+                "data": (self.start + timedelta(days=int(d))).isoformat(),
+                "uova_totali": int(totals[d]),
+                "capacita_massima": capacita,
+                "percentuale": _percent(totals[d], capacita),
+                "macchine": self._machine_cells(self.daily[:, d]),
+            })
+        return rows
+
+    def _machine_cells(self, uova: np.ndarray, picco: Optional[np.ndarray] = None) -> List[Dict]:
+        cells = []
+        for m, nome in enumerate(self.machines):
+            if uova[m] <= 0 and self.capacities[m] <= 0:
+                continue
+            cell = {
+                "nome": nome,
+                "uova": int(uova[m]),
+                "capacita": int(self.capacities[m]),
+                "percentuale": _percent(uova[m], self.capacities[m]),
+            }
+            if picco is not None:
+                cell["picco"] = int(picco[m])
+            cells.append(cell)
+        return cells
+
+
+def get_timeline(since: Optional[date] = None) -> OccupancyTimeline:
+    """
+    Occupancy of the incubations from `since` (default: LOOKBACK_DAYS
+    ago) onwards, cached on the incubation and machine generations.
+    """
+    if since is None:
+        since = date.today() - timedelta(days=LOOKBACK_DAYS)
+    key = (since, *(generations.get_generation(t) for t in generations.SIDE_TABLES))
+    timeline = _timelines.get(key)
+    if timeline is None:
+        timeline = build_timeline(since)
+        _timelines.put(key, timeline)
+    return timeline
+
+
+def build_timeline(since: date) -> OccupancyTimeline:
+    """Loads machines and eggs per incubation and runs the sweep."""
+    from database import get_incubator_machines
+    machines = get_incubator_machines()
+    names = [m["nome"] for m in machines]
+    capacities = [m["capacita"] for m in machines]
+    index = {name: i for i, name in enumerate(names)}
+
+    rows_m, rows_day, rows_qty = [], [], []
+    starts = []
+    for data_incubazione, incubatrici, uova in _eggs_by_incubation(since):
+        try:
+            day = datetime.strptime(data_incubazione, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            continue
+        listed = parse_incubatrici(incubatrici) or [NO_MACHINE]
+        for name in listed:
+            if name not in index:
+                index[name] = len(names)
+                names.append(name)
+                capacities.append(0)
+        shares = split_eggs(uova, [capacities[index[name]] for name in listed])
+        for name, share in zip(listed, shares):
+            rows_m.append(index[name])
+            rows_day.append(day)
+            rows_qty.append(share)
+        starts.append(day)
+
+    if not starts:
+        empty = np.zeros((len(names), 0), dtype=np.int64)
+        return OccupancyTimeline(names, capacities, since, [], empty, empty.copy(), empty.copy())
+
+    first = min(starts)
+    start = first - timedelta(days=first.weekday())
+    last = max(starts) + timedelta(days=max(INCUBATION_DAYS, 7 * OCCUPANCY_WEEKS))
+    num_weeks = (last - start).days // 7 + 1
+    num_days = num_weeks * 7
+
+    m = np.asarray(rows_m, dtype=np.int64)
+    d = np.asarray([(day - start).days for day in rows_day], dtype=np.int64)
+    q = np.asarray(rows_qty, dtype=np.int64)
+
+    # Daily: difference array over [machine, day] and one cumulative sum
+    diff = np.zeros((len(names), num_days + INCUBATION_DAYS), dtype=np.int64)
+    np.add.at(diff, (m, d), q)
+    np.add.at(diff, (m, d + INCUBATION_DAYS), -q)
+    daily = np.cumsum(diff, axis=1)[:, :num_days]
+
+    # Weekly: eggs started in each week, spread over OCCUPANCY_WEEKS weeks
+    started = np.zeros((len(names), num_weeks + OCCUPANCY_WEEKS), dtype=np.int64)
+    np.add.at(started, (m, d // 7), q)
+    weekly = np.zeros((len(names), num_weeks), dtype=np.int64)
+    for k in range(OCCUPANCY_WEEKS):
+        weekly[:, k:] += started[:, :num_weeks - k]
+    weekly_peak = daily.reshape(len(names), num_weeks, 7).max(axis=2)
+
+    weeks = [tuple((start + timedelta(weeks=w)).isocalendar()[:2]) for w in range(num_weeks)]
+    return OccupancyTimeline(names, capacities, start, weeks, daily, weekly, weekly_peak)
+
+
+def _eggs_by_incubation(since: date):
+    """(data_incubazione, incubatrici, uova) of the incubations with eggs, one GROUP BY."""
+    from database import SessionLocal, Incubation, IncubationBatch
+    db = SessionLocal()
+    try:
+        uova = func.sum(func.coalesce(IncubationBatch.uova_utilizzate, 0))
+        return (
+            db.query(Incubation.data_incubazione, Incubation.incubatrici, uova)
+              .join(IncubationBatch, IncubationBatch.incubation_id == Incubation.id)
+              .filter(Incubation.data_incubazione >= since.isoformat())
+              .group_by(Incubation.id)
+              .having(uova > 0)
+              .all()
+        )
+    finally:
+        db.close()
+
+
+def _percent(uova, capacita) -> float:
+    return round(float(uova) / float(capacita) * 100, 1) if capacita > 0 else 0.0
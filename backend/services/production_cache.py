@@ -0,0 +1,124 @@
+"""
+Production Cache - Produzione per lotto tenuta in memoria di processo
+
+Ogni lotto ha un blocco compatto di array (anno, settimana, uova, eta)
+indicizzato per lotto_id. I blocchi vengono popolati in modo lazy da
+ProductionService (dalla tabella production_cache o da un ricalcolo) e
+scartati dagli stessi helper di database.py che invalidano o cancellano
+production_cache: invalidate_cache_by_lotto, delete_cache_by_lotto,
+invalidate_cache_by_curve e invalidate_all_cache.
+
+Con la cache calda un riepilogo settimanale non interroga production_cache.
+Ogni scarto incrementa anche il contatore production_blocks di
+services.generations: i riepiloghi memorizzati con un blocco scartato non
+vengono più serviti.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services import generations
+
+
+class LottoBlock:
+    """Immutable production of a single lotto, one row per week."""
+
+    __slots__ = ("prodotto", "anno", "settimana", "uova", "eta")
+
+    def __init__(self, prodotto: Optional[str], anno: np.ndarray, settimana: np.ndarray,
+                 uova: np.ndarray, eta: np.ndarray):
+        self.prodotto = prodotto
+        self.anno = anno
+        self.settimana = settimana
+        self.uova = uova
+        self.eta = eta
+        for arr in (anno, settimana, uova, eta):
+            arr.flags.writeable = False
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict]) -> "LottoBlock":
+        """Packs production entries ({anno, settimana, prodotto, uova, eta}) of one lotto."""
+        return cls(
+            entries[0]['prodotto'] if entries else None,
+            np.array([e['anno'] for e in entries], dtype=np.int32),
+            np.array([e['settimana'] for e in entries], dtype=np.int32),
+            np.array([e['uova'] for e in entries], dtype=np.int64),
+            np.array([e.get('eta', 0) for e in entries], dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.anno)
+
+    def entries(self, lotto_id: int, allevamento: str, from_week: Optional[Tuple[int, int]] = None,
+                to_week: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """Expands the block back into production entries, optionally only
+        the weeks between from_week and to_week ((anno, settimana), inclusive)."""
+        anno, settimana, uova, eta = self.anno, self.settimana, self.uova, self.eta
+        if from_week or to_week:
+            key = anno.astype(np.int64) * 100 + settimana
+            mask = np.ones(len(key), dtype=bool)
+            if from_week:
+                mask &= key >= from_week[0] * 100 + from_week[1]
+            if to_week:
+                mask &= key <= to_week[0] * 100 + to_week[1]
+            anno, settimana, uova, eta = anno[mask], settimana[mask], uova[mask], eta[mask]
+        return [
+            {
+                "anno": anno,
+                "settimana": settimana,
+                "lotto_id": lotto_id,
+                "prodotto": self.prodotto,
+                "uova": uova,
+                "allevamento": allevamento,
+                "eta": eta,
+            }
+            for anno, settimana, uova, eta in zip(
+                anno.tolist(), settimana.tolist(), uova.tolist(), eta.tolist()
+            )
+        ]
+
+
+_lock = threading.Lock()
+_blocks: Dict[int, LottoBlock] = {}
+# Incrementato a ogni drop: un calcolo iniziato prima di un'invalidazione
+# non deve ripopolare la cache con dati ormai vecchi.
+_epoch = 0
+
+
+def get_blocks(lotto_ids: Iterable[int]) -> Tuple[Dict[int, LottoBlock], int]:
+    """Returns the cached blocks for `lotto_ids` plus the epoch to pass to store_blocks."""
+    with _lock:
+        found = {lid: _blocks[lid] for lid in lotto_ids if lid in _blocks}
+        return found, _epoch
+
+
+def store_blocks(blocks: Dict[int, LottoBlock], epoch: int) -> bool:
+    """Stores blocks read at `epoch`; discarded if an invalidation happened since."""
+    with _lock:
+        if epoch != _epoch:
+            return False
+        _blocks.update(blocks)
+        return True
+
+
+def drop_lotti(lotto_ids: Iterable[int]):
+    """Drops the blocks of the given lotti."""
+    global _epoch
+    lotto_ids = list(lotto_ids)
+    with _lock:
+        _epoch += 1
+        for lid in lotto_ids:
+            _blocks.pop(lid, None)
+    if lotto_ids:
+        generations.bump("production_blocks")
+
+
+def drop_all():
+    """Drops every cached block."""
+    global _epoch
+    with _lock:
+        _epoch += 1
+        _blocks.clear()
+    generations.bump("production_blocks")
+
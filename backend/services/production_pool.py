@@ -0,0 +1,124 @@
+"""
+Production Pool - Calcolo della produzione per lotto su più processi
+
+A curve e galline effettive fissate, la produzione di un lotto non dipende
+dagli altri: un ricalcolo a freddo (dopo invalidate_all_cache o con molti
+scenari) può quindi dividere i lotti in blocchi e calcolarli in parallelo
+su un ProcessPoolExecutor.
+
+- Le curve T003 viaggiano una sola volta per worker (initializer); il pool
+  viene ricreato solo quando cambia la versione dello snapshot.
+- Le galline effettive e eta_fine_ciclo sono lette dal processo chiamante:
+  i worker non toccano il database.
+- Sotto la soglia (meno di due blocchi da MIN_BATCH lotti) o con meno di
+  due worker il calcolo resta nel processo, senza costi di serializzazione.
+
+Configurazione: variabili d'ambiente PRODUCTION_WORKERS (default 0,
+disattivato) e PRODUCTION_MIN_BATCH, oppure configure() a runtime.
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from services.curve_store import CurveSnapshot
+
+WORKERS = int(os.environ.get("PRODUCTION_WORKERS", "0") or 0)
+MIN_BATCH = int(os.environ.get("PRODUCTION_MIN_BATCH", "200") or 200)
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key = None  # (workers, curve version) the pool was started with
+
+# Worker-side snapshot, set once by _init_worker
+_worker_curves: Optional[CurveSnapshot] = None
+
+
+def configure(workers: Optional[int] = None, min_batch: Optional[int] = None):
+    """Changes worker count and/or minimum batch size; a running pool is restarted lazily."""
+    global WORKERS, MIN_BATCH
+    with _lock:
+        if workers is not None:
+            WORKERS = max(0, int(workers))
+        if min_batch is not None:
+            MIN_BATCH = max(1, int(min_batch))
+    if workers is not None:
+        shutdown()
+
+
+def settings() -> Dict:
+    """Current configuration and whether a pool is running."""
+    return {"workers": WORKERS, "min_batch": MIN_BATCH, "running": _pool is not None}
+
+
+def shutdown():
+    """Stops the worker processes, if any."""
+    global _pool, _pool_key
+    with _lock:
+        pool, _pool, _pool_key = _pool, None, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def should_parallelize(n_lotti: int) -> bool:
+    """True when `n_lotti` is worth shipping to the pool."""
+    return WORKERS > 1 and n_lotti >= 2 * MIN_BATCH
+
+
+def calculate_for_lotti(lotti: List[dict], curves: CurveSnapshot, lifecycle_max: int,
+                        hens_timelines: List[list]) -> Optional[List[List[Dict]]]:
+    """
+    ProductionService.calculate_for_lotti spread over the pool, one result
+    list per lotto in input order. Returns None when the pool is disabled,
+    the batch is below the threshold or the pool broke: the caller then
+    computes in-process.
+    """
+    if not should_parallelize(len(lotti)):
+        return None
+    size = max(MIN_BATCH, math.ceil(len(lotti) / WORKERS))
+    chunks = [(lotti[i:i + size], lifecycle_max, hens_timelines[i:i + size])
+              for i in range(0, len(lotti), size)]
+    try:
+        pool = _get_pool(curves)
+        results = []
+        for computed in pool.map(_compute_chunk, chunks):
+            results.extend(computed)
+        return results
+    except BrokenProcessPool as e:
+        print(f"⚠️ Pool produzione non disponibile, calcolo in processo: {e}")
+        shutdown()
+        return None
+
+
+def _get_pool(curves: CurveSnapshot) -> ProcessPoolExecutor:
+    """The pool for the current configuration and curve version, (re)started if needed."""
+    global _pool, _pool_key
+    key = (WORKERS, curves.version)
+    with _lock:
+        if _pool is not None and _pool_key == key:
+            return _pool
+        old, _pool = _pool, ProcessPoolExecutor(
+            max_workers=WORKERS,
+            # spawn: the API process is multi-threaded, forking it is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(curves,),
+        )
+        _pool_key = key
+    if old is not None:
+        old.shutdown(wait=False)
+    return _pool
+
+
+def _init_worker(curves: CurveSnapshot):
+    global _worker_curves
+    _worker_curves = curves
+
+
+def _compute_chunk(args) -> List[List[Dict]]:
+    lotti, lifecycle_max, hens_timelines = args
+    from services.production_service import ProductionService
+    return ProductionService.calculate_for_lotti(lotti, _worker_curves, lifecycle_max, hens_timelines)
@@ -6,19 +6,24 @@ Formula base: Uova Prodotte = [NumGalline] × [Produzione] × 7
 Formula completa: [TotaleUovaProdotto] = [UovaProdotte] + [UovaAcquisto] - [UovaVendita]
 """
 import datetime
-import bisect
-from typing import List, Dict, Optional
-from utils.helpers import carica_dati_v20, pulisci_percentuale
+import numpy as np
+from sqlalchemy import func
+from typing import Iterator, List, Dict, Optional
+from services import generations, production_cache, production_pool, week_calendar
+from services.curve_store import CurveSnapshot, get_curve_snapshot
+from services.sales_allocation import allocate_sales
+from services.summary_cache import SummaryCache, SummaryState
 from database import (
     get_lotti,
     get_trading_data,
+    get_trading_for_weeks,
+    get_vendita_assegnazioni,
     get_valid_cache,
     save_production_cache_bulk,
     get_cycle_settings,
     get_manual_adjustments,
     SessionLocal,
     Lotto,
-    VenditaAssegnazione,
     SchedaSettimanaleRecord,
     CycleWeeklyData,
 )
@@ -29,6 +34,15 @@ class ProductionService:
     # Constants from RULES.md
     LIFECYCLE_MIN = 25  # W 24+ starts production (we use 25 as first productive week)
     LIFECYCLE_MAX = 75  # W 76+ ends production
+
+    # Memoized summaries keyed by (product, auto_assign, window, generation vector)
+    SUMMARY_CACHE_SIZE = 32
+    _summary_cache = SummaryCache(SUMMARY_CACHE_SIZE)
+    # Last SummaryState per (product, auto_assign, window), refreshed week by week
+    _summary_states = SummaryCache(SUMMARY_CACHE_SIZE)
+    _cycle_settings_memo = (None, None)  # (cycle_settings generation, settings dict)
+    # Lists left out of summary_row_view listings (served by get_summary_week)
+    SUMMARY_DETAIL_KEYS = ("dettagli_produzione", "dettagli_acquisti", "dettagli_vendite", "dettagli_manuali")
     
     @staticmethod
     def get_start_date_from_year_week(year: int, week: int) -> datetime.date:
@@ -41,18 +55,14 @@ class ProductionService:
         Normalizes year/week when week overflows 52.
         Handles the week rollover correctly.
         """
-        week = settimana
-        year = anno
-        while week > 52:
-            week -= 52
-            year += 1
-        return (int(year), int(week))
+        year, week = week_calendar.normalize(int(anno), int(settimana))
+        return (year, week)
     
     @staticmethod
     def _effective_hens_timeline(lotto: dict):
         """
         Galline effettive per settimana solare, come lista ordinata di
-        (settimana_seriale, galline) dove settimana_seriale = anno*52 + (settimana-1).
+        (settimana_seriale, galline), settimana_seriale di services.week_calendar.
 
         Fonti, in ordine di priorità:
         1. schede_settimanali.galline_presenti — conteggio diretto dell'allevatore.
@@ -63,178 +73,360 @@ class ProductionService:
         Se non c'è nessun dato compilato la lista è vuota e il calcolo
         ricade sui capi accasati (numero base).
         """
-        lotto_id = lotto.get('id')
-        capi = lotto.get('Capi') or 0
-        allevamento = lotto.get('Allevamento')
-        capannone = str(lotto.get('Capannone', ''))
+        return ProductionService._effective_hens_timelines([lotto])[0]
+
+    @staticmethod
+    def _effective_hens_timelines(lotti: List[dict]) -> List[list]:
+        """
+        Versione batch di _effective_hens_timeline: una timeline per lotto,
+        nello stesso ordine di `lotti`.
+
+        Tre query in tutto, indipendentemente dal numero di lotti:
+        schede dei capannoni coinvolti, conteggio dei lotti attivi per
+        capannone (GROUP BY) e morti di cycle_weekly_data per i soli lotti
+        senza schede. L'attribuzione delle schede senza lotto_id al lotto
+        unico attivo sul capannone avviene in memoria.
+        """
+        if not lotti:
+            return []
+
+        sheds = [(l.get('Allevamento'), str(l.get('Capannone', ''))) for l in lotti]
+        allevamenti = {a for a, _ in sheds}
+        capannoni = {c for _, c in sheds}
         db = SessionLocal()
         try:
-            entries = {}
+            # (allevamento, capannone) -> righe scheda in ordine di inserimento
+            schede_by_shed = {}
+            rows = db.query(
+                SchedaSettimanaleRecord.allevamento,
+                SchedaSettimanaleRecord.capannone,
+                SchedaSettimanaleRecord.lotto_id,
+                SchedaSettimanaleRecord.anno,
+                SchedaSettimanaleRecord.settimana,
+                SchedaSettimanaleRecord.galline_presenti,
+            ).filter(
+                SchedaSettimanaleRecord.allevamento.in_(allevamenti),
+                SchedaSettimanaleRecord.capannone.in_(capannoni),
+                SchedaSettimanaleRecord.anno != None,
+                SchedaSettimanaleRecord.settimana != None,
+                SchedaSettimanaleRecord.galline_presenti > 0,
+            ).order_by(SchedaSettimanaleRecord.id).all()
+            for r in rows:
+                schede_by_shed.setdefault((r.allevamento, r.capannone), []).append(r)
 
-            rows = db.query(SchedaSettimanaleRecord).filter(
-                SchedaSettimanaleRecord.allevamento == allevamento,
-                SchedaSettimanaleRecord.capannone == capannone,
-            ).all()
             # Le schede senza lotto_id sono attribuibili solo se il capannone
             # ospita un unico lotto attivo.
-            unico_sul_capannone = db.query(Lotto).filter(
-                Lotto.allevamento == allevamento,
-                Lotto.capannone == capannone,
-                Lotto.attivo == True,
-            ).count() == 1
-            for r in rows:
-                if not (r.anno and r.settimana):
-                    continue
-                if not (r.galline_presenti and r.galline_presenti > 0):
-                    continue
-                if r.lotto_id:
-                    if r.lotto_id != lotto_id:
+            attivi_per_capannone = {
+                (a, c): n for a, c, n in db.query(
+                    Lotto.allevamento, Lotto.capannone, func.count(Lotto.id)
+                ).filter(
+                    Lotto.allevamento.in_(allevamenti),
+                    Lotto.capannone.in_(capannoni),
+                    Lotto.attivo == True,
+                ).group_by(Lotto.allevamento, Lotto.capannone).all()
+            }
+
+            timelines = []
+            da_morti = []  # indici dei lotti che ricadono su cycle_weekly_data
+            for i, lotto in enumerate(lotti):
+                lotto_id = lotto.get('id')
+                unico_sul_capannone = attivi_per_capannone.get(sheds[i], 0) == 1
+                entries = {}
+                for r in schede_by_shed.get(sheds[i], ()):
+                    if not (r.anno and r.settimana):
                         continue
-                elif not unico_sul_capannone:
-                    continue
-                entries[r.anno * 52 + (r.settimana - 1)] = int(r.galline_presenti)
-
-            if not entries and capi:
-                morti = [m for m in db.query(CycleWeeklyData).filter(
-                    CycleWeeklyData.lotto_id == lotto_id
-                ).all() if m.anno and m.settimana]
-                cum = 0
-                for m in sorted(morti, key=lambda x: (x.anno, x.settimana)):
-                    cum += (m.galline_morte or 0)
-                    if cum > 0:
-                        entries[m.anno * 52 + (m.settimana - 1)] = max(0, capi - cum)
-
-            return sorted(entries.items())
+                    if r.lotto_id:
+                        if r.lotto_id != lotto_id:
+                            continue
+                    elif not unico_sul_capannone:
+                        continue
+                    entries[week_calendar.to_serial(r.anno, r.settimana)] = int(r.galline_presenti)
+                if not entries and lotto.get('Capi'):
+                    da_morti.append(i)
+                timelines.append(entries)
+
+            if da_morti:
+                morti_by_lotto = {}
+                for m in db.query(
+                    CycleWeeklyData.lotto_id,
+                    CycleWeeklyData.anno,
+                    CycleWeeklyData.settimana,
+                    CycleWeeklyData.galline_morte,
+                ).filter(
+                    CycleWeeklyData.lotto_id.in_({lotti[i].get('id') for i in da_morti}),
+                ).order_by(CycleWeeklyData.id).all():
+                    if m.anno and m.settimana:
+                        morti_by_lotto.setdefault(m.lotto_id, []).append(m)
+
+                for i in da_morti:
+                    capi = lotti[i].get('Capi')
+                    entries = timelines[i]
+                    cum = 0
+                    morti = morti_by_lotto.get(lotti[i].get('id'), [])
+                    for m in sorted(morti, key=lambda x: (x.anno, x.settimana)):
+                        cum += (m.galline_morte or 0)
+                        if cum > 0:
+                            entries[week_calendar.to_serial(m.anno, m.settimana)] = max(0, capi - cum)
+
+            return [sorted(entries.items()) for entries in timelines]
         except Exception as e:
-            print(f"⚠️ Errore lettura galline effettive lotto {lotto_id}: {e}")
-            return []
+            print(f"⚠️ Errore lettura galline effettive ({len(lotti)} lotti): {e}")
+            return [[] for _ in lotti]
         finally:
             db.close()
 
     @staticmethod
-    def _calculate_production_for_lotto(lotto: dict, df_curve, lifecycle_max: int = None) -> List[Dict]:
+    def _compile_curve(curves: CurveSnapshot, curve: str):
         """
-        Calculates production for a single lotto across all weeks.
-        Returns list of {anno, settimana, lotto_id, prodotto, uova, allevamento, eta}
+        Selects the productive rows of a T003 curve as two aligned float64
+        arrays (eta, produzione): W numerico, eta >= LIFECYCLE_MIN,
+        produzione > 0. Row order follows T003.
 
-        Follows RULES.md formula:
-        - [EtaGalline] = W value from curve
-        - [NumGalline] = galline effettive (scheda settimanale / mortalità) se
-          compilate, altrimenti lotto['Capi'] (capi accasati, numero base).
-          Il dato effettivo più recente vale anche per le settimane successive.
-        - [Produzione] = percentage from T003 curve at row W
-        - Uova = [NumGalline] × [Produzione] × 7 (rounded to nearest 100)
-
-        Fine ciclo (Data_Fine_Prevista from T001) is the authoritative end date when set.
-        When not set, lifecycle_max (eta_fine_ciclo from cycle settings) is used as default.
+        Returns None when the curve is missing (no production).
         """
-        results = []
-
-        # Resolve lifecycle_max if not provided (load from cycle settings)
-        if lifecycle_max is None:
-            try:
-                cycle_settings = get_cycle_settings()
-                lifecycle_max = cycle_settings.get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
-            except Exception:
-                lifecycle_max = ProductionService.LIFECYCLE_MAX
+        produzione = curves.get(curve)
+        if produzione is None:
+            return None
+        with np.errstate(invalid='ignore'):
+            keep = (curves.w >= ProductionService.LIFECYCLE_MIN) & (produzione > 0) & np.isfinite(produzione)
+        return curves.w[keep], produzione[keep]
 
-        # --- Variables from RULES.md ---
-        num_galline = lotto['Capi']  # [NumGalline] base: capi accasati
-        curva_da_usare = lotto.get('Curva_Produzione')  # [GeneticaGalline] / Curve to use
-        prodotto = lotto.get('Prodotto')  # Destination product
-        lotto_id = lotto.get('id')
-
-        # Galline effettive compilate dall'allevatore (scheda settimanale / mortalità).
-        # Lista ordinata di (settimana_seriale, galline); vuota => si usano i capi accasati.
-        hens_timeline = ProductionService._effective_hens_timeline(lotto)
-        hens_serials = [s for s, _ in hens_timeline]
-
-        # Parse Data_Fine_Prevista from T001 once per lotto
-        fine_prod = lotto.get('Data_Fine_Prevista')
-        fine_year = None
-        fine_week = None
-        has_fine_ciclo = False
+    @staticmethod
+    def _parse_fine_ciclo(fine_prod):
+        """Parses Data_Fine_Prevista ("YYYY/WW") into (anno, settimana) or None."""
         if fine_prod and '/' in str(fine_prod):
             try:
                 fine_year, fine_week = map(int, str(fine_prod).strip().split('/'))
-                has_fine_ciclo = True
+                return fine_year, fine_week
             except:
                 pass
+        return None
 
-        # Skip if no curve assigned
-        if not curva_da_usare or curva_da_usare not in df_curve.columns:
-            return results
+    @staticmethod
+    def calculate_for_lotti(lotti: List[dict], curves: CurveSnapshot, lifecycle_max: int = None,
+                            hens_timelines: Optional[List[list]] = None,
+                            from_week: Optional[tuple] = None, to_week: Optional[tuple] = None) -> List[List[Dict]]:
+        """
+        Batch version of _calculate_production_for_lotto: computes the
+        lotto × week egg matrix for all `lotti` at once with NumPy.
 
-        # Get curve data (W column + curve column)
-        subset = df_curve[['W', curva_da_usare]].dropna()
+        Lotti sharing a curve are evaluated together on a (lotti × W) grid:
+        calendar week from Sett_Start + eta, fine ciclo / lifecycle_max masks,
+        carry-forward of galline effettive and round-to-100.
+
+        from_week / to_week ((anno, settimana), inclusive) mask out the ages
+        whose calendar week falls outside the window; lotti that cannot reach
+        the window are not evaluated at all.
+
+        Returns one list of entries per input lotto (same order), each entry
+        identical to what _calculate_production_for_lotto produces.
+        """
+        results = [[] for _ in lotti]
+        if not lotti:
+            return results
+        if from_week or to_week:
+            reachable = ProductionService._lotti_in_window(lotti, curves, from_week, to_week)
+            if len(reachable) < len(lotti):
+                subset = [lotti[i] for i in reachable]
+                timelines = [hens_timelines[i] for i in reachable] if hens_timelines is not None else None
+                computed = ProductionService.calculate_for_lotti(
+                    subset, curves, lifecycle_max, timelines, from_week, to_week)
+                for i, entries in zip(reachable, computed):
+                    results[i] = entries
+                return results
 
-        for _, row in subset.iterrows():
+        if lifecycle_max is None:
             try:
-                # Parse W value (age of hens in weeks)
-                val_w = str(row['W']).replace(',', '.').strip()
-                if not val_w.replace('.', '', 1).isdigit():
-                    continue
+                cycle_settings = get_cycle_settings()
+                lifecycle_max = cycle_settings.get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
+            except Exception:
+                lifecycle_max = ProductionService.LIFECYCLE_MAX
 
-                eta_gallina = float(val_w)  # [EtaGalline]
+        if hens_timelines is None:
+            hens_timelines = ProductionService._effective_hens_timelines(lotti)
 
-                # Skip pre-productive weeks (RULES.md: W 24+ starts production)
-                if eta_gallina < ProductionService.LIFECYCLE_MIN:
-                    continue
+        # Group lotti by curve; lotti without a usable start are skipped
+        # (the per-row loop raised on them and produced nothing).
+        compiled = {}
+        groups: Dict[str, List[int]] = {}
+        for i, lotto in enumerate(lotti):
+            curve = lotto.get('Curva_Produzione')
+            if curve not in compiled:
+                compiled[curve] = ProductionService._compile_curve(curves, curve)
+            if compiled[curve] is None or len(compiled[curve][0]) == 0:
+                continue
+            if not isinstance(lotto.get('Sett_Start'), (int, float)) or not isinstance(lotto.get('Anno_Start'), (int, float)):
+                continue
+            groups.setdefault(curve, []).append(i)
 
-                # When no fine ciclo is set in T001, apply the default lifecycle max
-                # (eta_fine_ciclo from cycle settings). When fine ciclo IS set, it is
-                # the authoritative cutoff — do not limit by lifecycle_max so the full
-                # curve range is evaluated and filtered by Data_Fine_Prevista below.
-                if not has_fine_ciclo and eta_gallina > lifecycle_max:
-                    continue
+        for curve, idxs in groups.items():
+            eta_row, prod_row = compiled[curve]
+            n = len(idxs)
+            group = [lotti[i] for i in idxs]
 
-                # Get production percentage from curve [Produzione]
-                produzione = pulisci_percentuale(row[curva_da_usare])
+            sett_start = np.array([l['Sett_Start'] for l in group], dtype=np.float64)[:, None]
+            anno_start = np.array([l['Anno_Start'] for l in group], dtype=np.int64)[:, None]
+            capi = np.array([np.nan if l['Capi'] is None else l['Capi'] for l in group], dtype=np.float64)[:, None]
 
-                if produzione <= 0:
-                    continue
+            fine = [ProductionService._parse_fine_ciclo(l.get('Data_Fine_Prevista')) for l in group]
+            has_fine = np.array([f is not None for f in fine])[:, None]
+            fine_year = np.array([f[0] if f else 0 for f in fine], dtype=np.int64)[:, None]
+            fine_week = np.array([f[1] if f else 0 for f in fine], dtype=np.int64)[:, None]
 
-                # Calculate real calendar week from lotto start + hen age
-                sett_offset = lotto['Sett_Start'] + eta_gallina
-                anno_curr = lotto['Anno_Start']
+            # Age -> calendar week through the week serial (52 weeks per year)
+            sett_offset = np.trunc(sett_start + eta_row[None, :]).astype(np.int64)
+            week_serial = week_calendar.to_serials(anno_start, sett_offset)
+            year, week = week_calendar.from_serials(week_serial)
 
-                # Normalize year/week overflow
-                year, week = ProductionService._normalize_year_week(anno_curr, sett_offset)
+            # Fine ciclo from T001 is authoritative; otherwise eta_fine_ciclo.
+            mask = np.where(
+                has_fine,
+                ~((year > fine_year) | ((year == fine_year) & (week > fine_week))),
+                eta_row[None, :] <= lifecycle_max,
+            )
 
-                # Check "Data Fine Prevista" (fine ciclo from T001) — authoritative cutoff
-                if has_fine_ciclo:
-                    if year > fine_year or (year == fine_year and week > fine_week):
-                        continue
-                
-                # [NumGalline] della settimana: ultimo dato effettivo compilato
-                # a quella data (carry-forward), altrimenti capi accasati.
-                galline_settimana = num_galline
-                if hens_serials:
-                    week_serial = year * 52 + (week - 1)
-                    idx = bisect.bisect_right(hens_serials, week_serial) - 1
-                    if idx >= 0:
-                        galline_settimana = hens_timeline[idx][1]
-
-                # --- RULES.md Formula ---
-                # Uova Prodotte = [NumGalline] × [Produzione] × 7
-                # Rounded to nearest 100
-                uova_esatte = round((galline_settimana * produzione * 7) / 100) * 100
-                
-                results.append({
-                    "anno": year,
-                    "settimana": week,
-                    "lotto_id": lotto_id,
-                    "prodotto": prodotto,
-                    "uova": int(uova_esatte),
+            # [NumGalline]: latest effective count at that week (carry-forward),
+            # otherwise capi accasati. All timelines are searched in one pass by
+            # offsetting each lotto's serials into its own key range.
+            hens = np.broadcast_to(capi, mask.shape).copy()
+            owners, serials, values = [], [], []
+            for g, i in enumerate(idxs):
+                for serial, galline in hens_timelines[i]:
+                    owners.append(g)
+                    serials.append(serial)
+                    values.append(galline)
+            if owners:
+                owners = np.array(owners, dtype=np.int64)
+                serials = np.array(serials, dtype=np.int64)
+                values = np.array(values, dtype=np.float64)
+                base = min(serials.min(), week_serial.min())
+                span = max(serials.max(), week_serial.max()) - base + 1
+                keys = owners * span + (serials - base)
+                query = np.arange(n, dtype=np.int64)[:, None] * span + (week_serial - base)
+                pos = np.searchsorted(keys, query, side='right') - 1
+                found = (pos >= 0) & (owners[np.maximum(pos, 0)] == np.arange(n)[:, None])
+                hens = np.where(found, values[np.maximum(pos, 0)], hens)
+
+            # Uova = [NumGalline] × [Produzione] × 7, rounded to nearest 100
+            uova = np.rint((hens * prod_row[None, :] * 7) / 100) * 100
+            mask &= ~np.isnan(uova)
+            if from_week:
+                mask &= (year > from_week[0]) | ((year == from_week[0]) & (week >= from_week[1]))
+            if to_week:
+                mask &= (year < to_week[0]) | ((year == to_week[0]) & (week <= to_week[1]))
+
+            eta_int = np.trunc(eta_row).astype(np.int64).tolist()
+            rows_g, rows_r = np.nonzero(mask)
+            year_l = year[rows_g, rows_r].tolist()
+            week_l = week[rows_g, rows_r].tolist()
+            uova_l = uova[rows_g, rows_r].astype(np.int64).tolist()
+            for g, r, y, w, u in zip(rows_g.tolist(), rows_r.tolist(), year_l, week_l, uova_l):
+                lotto = group[g]
+                results[idxs[g]].append({
+                    "anno": y,
+                    "settimana": w,
+                    "lotto_id": lotto.get('id'),
+                    "prodotto": lotto.get('Prodotto'),
+                    "uova": u,
                     "allevamento": f"{lotto['Allevamento']} {lotto['Capannone']}",
-                    "eta": int(eta_gallina)
+                    "eta": eta_int[r]
                 })
-                
-            except Exception as e:
+
+        return results
+
+    @staticmethod
+    def _calculate_lotti(lotti: List[dict], curves: CurveSnapshot, lifecycle_max: int,
+                         hens_timelines: Optional[List[list]] = None) -> List[List[Dict]]:
+        """
+        calculate_for_lotti for a cold batch: galline effettive are read here
+        (unless given), then large batches go to services.production_pool and
+        the rest is computed in-process.
+        """
+        if hens_timelines is None:
+            hens_timelines = ProductionService._effective_hens_timelines(lotti)
+        computed = production_pool.calculate_for_lotti(lotti, curves, lifecycle_max, hens_timelines)
+        if computed is None:
+            computed = ProductionService.calculate_for_lotti(lotti, curves, lifecycle_max, hens_timelines)
+        return computed
+
+    @staticmethod
+    def _lotti_in_window(lotti: List[dict], curves: CurveSnapshot,
+                         from_week: Optional[tuple], to_week: Optional[tuple]) -> List[int]:
+        """
+        Indexes of the lotti whose productive life (Sett_Start + 0 .. max W of
+        the curves, with a one-week margin) can overlap the window. Lotti
+        without a usable start are kept: the engine skips them itself.
+        """
+        max_eta = float(np.nanmax(curves.w)) if np.isfinite(curves.w).any() else 0.0
+        first_serial = week_calendar.to_serial(*from_week) if from_week else None
+        last_serial = week_calendar.to_serial(*to_week) if to_week else None
+        reachable = []
+        for i, lotto in enumerate(lotti):
+            anno, sett = lotto.get('Anno_Start'), lotto.get('Sett_Start')
+            if not isinstance(anno, (int, float)) or not isinstance(sett, (int, float)):
+                reachable.append(i)
                 continue
-        
+            start = week_calendar.to_serial(anno, sett)
+            if last_serial is not None and start - 1 > last_serial:
+                continue
+            if first_serial is not None and start + max_eta + 1 < first_serial:
+                continue
+            reachable.append(i)
+        return reachable
+
+    @staticmethod
+    def _calculate_production_for_lotto(lotto: dict, curves: CurveSnapshot, lifecycle_max: int = None) -> List[Dict]:
+        """
+        Calculates production for a single lotto across all weeks.
+        Returns list of {anno, settimana, lotto_id, prodotto, uova, allevamento, eta}
+
+        Follows RULES.md formula:
+        - [EtaGalline] = W value from curve
+        - [NumGalline] = galline effettive (scheda settimanale / mortalità) se
+          compilate, altrimenti lotto['Capi'] (capi accasati, numero base).
+          Il dato effettivo più recente vale anche per le settimane successive.
+        - [Produzione] = percentage from T003 curve at row W
+        - Uova = [NumGalline] × [Produzione] × 7 (rounded to nearest 100)
+
+        Fine ciclo (Data_Fine_Prevista from T001) is the authoritative end date when set.
+        When not set, lifecycle_max (eta_fine_ciclo from cycle settings) is used as default.
+        """
+        return ProductionService.calculate_for_lotti([lotto], curves, lifecycle_max)[0]
+
+    @staticmethod
+    def production_entries_for_lotti(lotti: List[dict], from_week: Optional[tuple] = None,
+                                     to_week: Optional[tuple] = None) -> List[List[Dict]]:
+        """
+        The per-lotto production entries the weekly summary works from, one
+        list per lotto in input order: in-memory production_cache blocks
+        first, production_cache rows for the misses, a batch computation
+        (stored) for the rest. from_week / to_week ((anno, settimana),
+        inclusive) limit the weeks; lotti that cannot reach them get [].
+        """
+        results = [[] for _ in lotti]
+        curves = get_curve_snapshot()
+        if curves.empty or not lotti:
+            return results
+        lifecycle_max = ProductionService._get_cycle_settings().get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
+        reachable = (
+            ProductionService._lotti_in_window(lotti, curves, from_week, to_week)
+            if from_week or to_week else range(len(lotti))
+        )
+        lotto_start_map = {
+            l.get('id'): (l.get('Anno_Start', 0), l.get('Sett_Start', 0)) for l in lotti
+        }
+        blocks = ProductionService._load_production_blocks(
+            [lotti[i] for i in reachable], curves, lifecycle_max, lotto_start_map, filter_by_product=True,
+        )
+        for i in reachable:
+            lotto = lotti[i]
+            block = blocks.get(lotto.get('id'))
+            if block is not None:
+                results[i] = block.entries(
+                    lotto.get('id'), f"{lotto['Allevamento']} {lotto['Capannone']}", from_week, to_week
+                )
         return results
-    
+
     @staticmethod
     def _aggregate_trading_by_product(trading_data, product_filter: Optional[str] = None) -> Dict:
         """
@@ -260,36 +452,287 @@ class ProductionService:
         return result
     
     @staticmethod
-    def calculate_weekly_summary(product_filter: Optional[str] = None) -> List[Dict]:
+    def calculate_weekly_summary(product_filter: Optional[str] = None,
+                                 from_week: Optional[tuple] = None, to_week: Optional[tuple] = None) -> List[Dict]:
         """
         Calculates the weekly summary for a specific product (or all if None).
         
         Implements RULES.md formula:
         [TotaleUovaProdotto] = [UovaProdotte] + [UovaAcquisto] - [UovaVendita]
         
+        from_week / to_week ((anno, settimana), inclusive) restrict the
+        summary to a window of weeks; None leaves that side open.
+
         Returns a list of dictionaries with production, purchases, sales, and details.
         """
-        
-        # 1. LOAD CURVE DATA (T003)
-        df_curve = carica_dati_v20()
-        if df_curve.empty:
-            return []
+        return ProductionService.calculate_weekly_summaries([product_filter], from_week, to_week)[product_filter]
+
+    @staticmethod
+    def calculate_weekly_summaries(products: List[Optional[str]], from_week: Optional[tuple] = None,
+                                   to_week: Optional[tuple] = None) -> Dict[Optional[str], List[Dict]]:
+        """
+        Weekly summaries for several products in a single pass.
+
+        Curves, lotti, production cache, trading rows, assegnazioni and manual
+        adjustments are loaded once and partitioned by product in memory.
+        Returns {product: summary}, each summary identical to
+        calculate_weekly_summary(product). None stands for "all products".
+
+        Results are memoized on (product, auto_assign_sales, window,
+        generation vector of the input tables): until one of those tables is written,
+        a repeated call is a dictionary lookup. Treat them as read-only.
+
+        When only trading_data / vendita_assegnazione moved since the last
+        summary of a product, only the weeks they touched are recomputed.
+
+        With from_week / to_week ((anno, settimana), inclusive) only that
+        window is computed: trading, assegnazioni and adjustments are
+        filtered in SQL and lotti that cannot reach the window are skipped.
+        """
+        products = list(dict.fromkeys(products))
+        window = (tuple(from_week) if from_week else None, tuple(to_week) if to_week else None)
+
+        vector = generations.generation_vector()
+        cycle_settings = ProductionService._get_cycle_settings()
+        auto_assign = bool(cycle_settings.get('auto_assign_sales'))
+
+        summaries = {}
+        for product in products:
+            cached = ProductionService._summary_cache.get((product, auto_assign, window, vector))
+            if cached is not None:
+                summaries[product] = cached
+        missing = [product for product in products if product not in summaries]
+        if missing:
+            states = ProductionService._refresh_summary_states(missing, cycle_settings, auto_assign, window, vector)
+            rest = [product for product in missing if product not in states]
+            if rest:
+                states.update(ProductionService._compute_weekly_summaries(rest, cycle_settings, vector, window))
+            for product, state in states.items():
+                ProductionService._remember_summary(product, auto_assign, window, vector, state)
+                summaries[product] = state.summary
+        return {product: summaries[product] for product in products}
+
+    @staticmethod
+    def iter_weekly_summary(product_filter: Optional[str] = None, from_week: Optional[tuple] = None,
+                            to_week: Optional[tuple] = None) -> Iterator[Dict]:
+        """
+        Rows of calculate_weekly_summary, yielded one week at a time.
+
+        A memoized or incrementally refreshable summary is replayed as is.
+        Otherwise the inputs of the window (production details, trading,
+        assegnazioni, adjustments) are loaded up front as for the list, but
+        sales are allocated and each week aggregated only when it is
+        yielded, and the rows are not kept: a cold stream holds one row at
+        a time and is not memoized.
+        """
+        window = (tuple(from_week) if from_week else None, tuple(to_week) if to_week else None)
+        vector = generations.generation_vector()
+        cycle_settings = ProductionService._get_cycle_settings()
+        auto_assign = bool(cycle_settings.get('auto_assign_sales'))
+
+        cached = ProductionService._summary_cache.get((product_filter, auto_assign, window, vector))
+        if cached is not None:
+            yield from cached
+            return
 
-        # Load eta_fine_ciclo from cycle settings (default: LIFECYCLE_MAX constant)
+        state = ProductionService._refresh_summary_states(
+            [product_filter], cycle_settings, auto_assign, window, vector,
+        ).get(product_filter)
+        if state is None:
+            inputs = ProductionService._load_summary_inputs([product_filter], cycle_settings, window)
+            if inputs is None:
+                state = SummaryState(None, {}, {}, {})
+            else:
+                prepared, trading_acq, trading_ven, assegnazioni = inputs
+                production_data, adjustments_map = prepared[product_filter]
+                for _, row in ProductionService._iter_summary_weeks(
+                    product_filter, production_data, adjustments_map, cycle_settings,
+                    trading_acq, trading_ven, assegnazioni, per_week=True,
+                ):
+                    yield row
+                return
+        ProductionService._remember_summary(product_filter, auto_assign, window, vector, state)
+        yield from state.summary
+
+    @staticmethod
+    def _remember_summary(product: Optional[str], auto_assign: bool, window: tuple, vector: tuple,
+                          state: SummaryState):
+        """Stores a fresh SummaryState for week-level refresh and memoizes its summary."""
+        ProductionService._summary_states.put((product, auto_assign, window), state)
+        ProductionService._summary_cache.put((product, auto_assign, window, vector), state.summary)
+
+    @staticmethod
+    def get_summary_week(product_filter: Optional[str], anno: int, settimana: int) -> Optional[Dict]:
+        """
+        One week of the summary with all its detail lists, or None when the
+        week is empty. Served from a SummaryState already computed at the
+        current generation vector that covers the week; otherwise only that
+        week is computed (and memoized as a one-week window).
+        """
+        cycle_settings = ProductionService._get_cycle_settings()
+        auto_assign = bool(cycle_settings.get('auto_assign_sales'))
+        vector = generations.generation_vector()
+        week = (anno, settimana)
+        for (product, auto, window), state in ProductionService._summary_states.items():
+            if (product == product_filter and auto == auto_assign and state.vector == vector
+                    and ProductionService._weeks_in_window({week}, *window)):
+                return state.rows_by_week.get(week_calendar.week_key(anno, settimana))
+        summary = ProductionService.calculate_weekly_summary(product_filter, week, week)
+        return summary[0] if summary else None
+
+    @staticmethod
+    def summary_row_view(row: Dict, detail: str = "full") -> Dict:
+        """
+        A summary row for listings: "full" is the row itself, "none" drops
+        the dettagli_* lists, "totals" replaces them with the per-week
+        breakdown (produzione lorda/netta, manuali, vendite non assegnate)
+        and the net production per prodotto.
+        """
+        if detail == "full":
+            return row
+        view = {k: v for k, v in row.items() if k not in ProductionService.SUMMARY_DETAIL_KEYS}
+        if detail == "totals":
+            totals = ProductionService.summary_row_totals(row)
+            for k in ("produzione_lorda", "produzione_netta", "manuali", "vendite_non_assegnate"):
+                view[k] = totals[k]
+            per_prodotto = {}
+            for d in row['dettagli_produzione']:
+                prodotto = d.get('prodotto') or ""
+                per_prodotto[prodotto] = per_prodotto.get(prodotto, 0) + d['quantita']
+            view["produzione_per_prodotto"] = per_prodotto
+        return view
+
+    @staticmethod
+    def summary_row_totals(row: Dict) -> Dict[str, int]:
+        """Totals of one summary row, computed from its detail lists."""
+        lorda = sum(d.get('quantita_lorda', d['quantita']) for d in row['dettagli_produzione'])
+        netta = sum(d['quantita'] for d in row['dettagli_produzione'])
+        return {
+            "produzione_lorda": lorda,
+            "produzione_netta": netta,
+            "manuali": sum(d['quantita'] for d in row['dettagli_manuali']),
+            "acquisti": row['acquisti_totale'],
+            "vendite": row['vendite_totale'],
+            "vendite_non_assegnate": max(0, row['vendite_totale'] - (lorda - netta)),
+            "totale_netto": row['totale_netto'],
+        }
+
+    @staticmethod
+    def summary_cache_stats() -> Dict:
+        """LRU size and hit/miss counters of the summary memoization."""
+        return ProductionService._summary_cache.stats()
+
+    @staticmethod
+    def _get_cycle_settings() -> Dict:
+        """cycle_settings, re-read only when its generation moved ({} on error)."""
+        generation = generations.get_generation("cycle_settings")
+        memo_generation, settings = ProductionService._cycle_settings_memo
+        if memo_generation == generation:
+            return settings
         try:
-            cycle_settings = get_cycle_settings()
-            lifecycle_max = cycle_settings.get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
+            settings = get_cycle_settings()
         except Exception:
-            lifecycle_max = ProductionService.LIFECYCLE_MAX
+            return {}
+        ProductionService._cycle_settings_memo = (generation, settings)
+        return settings
+
+    @staticmethod
+    def _refresh_summary_states(products: List[Optional[str]], cycle_settings: Dict,
+                                auto_assign: bool, window: tuple, vector: tuple) -> Dict[Optional[str], SummaryState]:
+        """
+        Brings the last SummaryState of each product up to `vector` by
+        recomputing only the weeks written since, when generations knows
+        them. Trading rows of those weeks are loaded once for all products.
+        Products that need a full rebuild are left out of the result.
+        """
+        stale = {}
+        for product in products:
+            state = ProductionService._summary_states.get((product, auto_assign, window))
+            if state is None or state.vector is None:
+                continue
+            weeks = generations.changed_weeks(state.vector, vector)
+            if weeks is not None:
+                stale[product] = (state, ProductionService._weeks_in_window(weeks, *window))
+        if not stale:
+            return {}
+
+        all_weeks = set().union(*(weeks for _, weeks in stale.values()))
+        trading_acq, trading_ven, assegnazioni = get_trading_for_weeks(all_weeks)
+
+        states = {}
+        for product, (state, weeks) in stale.items():
+            weeks = {week_calendar.week_key(anno, settimana) for anno, settimana in weeks}
+            rows_by_week = dict(state.rows_by_week)
+            for week in weeks:
+                rows_by_week.pop(week, None)
+            rows_by_week.update(ProductionService._summarize_weeks(
+                product, state.production_by_week, state.adjustments_by_week, cycle_settings,
+                trading_acq, trading_ven, assegnazioni, weeks=weeks,
+            ))
+            states[product] = SummaryState(vector, state.production_by_week, state.adjustments_by_week, rows_by_week)
+        return states
+
+    @staticmethod
+    def _weeks_in_window(weeks, from_week: Optional[tuple], to_week: Optional[tuple]) -> set:
+        """The (anno, settimana) pairs of `weeks` inside the inclusive window."""
+        return {
+            w for w in weeks
+            if (not from_week or w >= tuple(from_week)) and (not to_week or w <= tuple(to_week))
+        }
+
+    @staticmethod
+    def _compute_weekly_summaries(products: List[Optional[str]], cycle_settings: Dict,
+                                  vector: Optional[tuple] = None,
+                                  window: tuple = (None, None)) -> Dict[Optional[str], SummaryState]:
+        """Single-pass computation behind calculate_weekly_summaries (no memoization)."""
+        inputs = ProductionService._load_summary_inputs(products, cycle_settings, window)
+        if inputs is None:
+            # Not refreshable: trading edits alone must not make weeks appear
+            return {product: SummaryState(None, {}, {}, {}) for product in products}
+        prepared, trading_acq, trading_ven, assegnazioni = inputs
+        states = {}
+        for product, (production_data, adjustments_map) in prepared.items():
+            rows_by_week = ProductionService._summarize_weeks(
+                product, production_data, adjustments_map, cycle_settings,
+                trading_acq, trading_ven, assegnazioni,
+            )
+            states[product] = SummaryState(vector, production_data, adjustments_map, rows_by_week)
+        return states
+
+    @staticmethod
+    def _load_summary_inputs(products: List[Optional[str]], cycle_settings: Dict, window: tuple):
+        """
+        Loads everything the summaries of `products` need, once.
+        Returns ({product: (production_data, adjustments_map)}, trading_acq,
+        trading_ven, assegnazioni), or None when there are no curves.
+        """
+        from_week, to_week = window
+        # 1. LOAD CURVE DATA (T003) - compiled snapshot, no SQL when unchanged
+        curves = get_curve_snapshot()
+        if curves.empty:
+            return None
+
+        # eta_fine_ciclo from cycle settings (default: LIFECYCLE_MAX constant)
+        lifecycle_max = cycle_settings.get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
 
         # 2. GET LOTTI
         lotti_db = get_lotti()
         lotti_attivi = [l for l in lotti_db if l.get('Attivo', True)]
-        
-        # Filter by product if specified
-        if product_filter:
-            lotti_attivi = [l for l in lotti_attivi if l.get('Prodotto') == product_filter]
-        
+
+        # Filter by product (None = all products)
+        lotti_by_product = {
+            product: [l for l in lotti_attivi if not product or l.get('Prodotto') == product]
+            for product in products
+        }
+        richiesti = {l.get('id') for lotti in lotti_by_product.values() for l in lotti}
+        lotti_richiesti = [l for l in lotti_attivi if l.get('id') in richiesti]
+        if from_week or to_week:
+            # Lotti whose productive life cannot reach the window are neither loaded nor computed
+            lotti_richiesti = [
+                lotti_richiesti[i]
+                for i in ProductionService._lotti_in_window(lotti_richiesti, curves, from_week, to_week)
+            ]
+
         # Build lotto_id -> allevamento/genetics/start map for cache reconstruction
         lotto_allevamento_map = {}
         lotto_razza_map = {}
@@ -306,59 +749,103 @@ class ProductionService:
                 lotto.get('Sett_Start', 0)
             )
 
-        # 3. CHECK CACHE
-        cached = get_valid_cache(product_filter)
-        cache_by_key = {}
-        cached_lotto_ids = set()
+        # 3-5. PRODUCTION PER LOTTO (cache or batch computation)
+        blocks = ProductionService._load_production_blocks(
+            lotti_richiesti, curves, lifecycle_max, lotto_start_map,
+            filter_by_product=None not in products,
+        )
+
+        # 7. GET TRADING DATA (T004 Purchases, T005 Sales) and assegnazioni, once for all products
+        trading_acq = get_trading_data("acquisto", from_week, to_week)
+        trading_ven = get_trading_data("vendita", from_week, to_week)
+        assegnazioni = get_vendita_assegnazioni(from_week, to_week)
+        adjustments = get_manual_adjustments(from_week=from_week, to_week=to_week)
+
+        prepared = {}
+        for product in products:
+            production_entries = []
+            for lotto in lotti_by_product[product]:
+                lotto_id = lotto.get('id')
+                if lotto_id not in blocks:
+                    continue
+                production_entries.extend(blocks[lotto_id].entries(
+                    lotto_id, lotto_allevamento_map.get(lotto_id, f"Lotto {lotto_id}"), from_week, to_week
+                ))
+            prepared[product] = ProductionService._prepare_weekly_summary(
+                product, production_entries, lotto_razza_map, adjustments,
+            )
+        return prepared, trading_acq, trading_ven, assegnazioni
+
+    @staticmethod
+    def _load_production_blocks(lotti: List[dict], curves: CurveSnapshot, lifecycle_max: int,
+                                lotto_start_map: Dict, filter_by_product: bool = False) -> Dict:
+        """
+        Returns {lotto_id: LottoBlock} for `lotti`: in-memory blocks first,
+        production_cache only for the misses, batch computation for the rest.
+        With filter_by_product, cache rows count only when their prodotto
+        matches the lotto's Prodotto (as get_valid_cache(product) did).
+        """
+        # 3. CHECK CACHE - in-memory blocks first, production_cache only for the misses
+        lotto_ids = [l.get('id') for l in lotti]
+        blocks, cache_epoch = production_cache.get_blocks(lotto_ids)
+        loaded_blocks = {}
 
-        if cached:
-            for c in cached:
-                key = (c.anno, c.settimana, c.lotto_id)
+        missing_ids = [lid for lid in lotto_ids if lid not in blocks]
+        if missing_ids:
+            prodotto_by_lotto = {l.get('id'): l.get('Prodotto') for l in lotti}
+            cached_by_lotto = {}
+            for c in get_valid_cache(lotto_ids=missing_ids):
+                if filter_by_product and c.prodotto != prodotto_by_lotto.get(c.lotto_id):
+                    continue
                 # Fix #17: recalculate eta from lotto start when cache entry has eta=0
                 # (happens for entries written before the eta column was added)
                 cached_eta = c.eta if c.eta else 0
                 if cached_eta == 0 and c.lotto_id in lotto_start_map:
                     anno_start, sett_start = lotto_start_map[c.lotto_id]
                     if anno_start and sett_start:
-                        cached_eta = max(0, (c.anno * 52 + c.settimana) - (anno_start * 52 + sett_start))
-                cache_by_key[key] = {
+                        cached_eta = max(0, week_calendar.to_serial(c.anno, c.settimana) - week_calendar.to_serial(anno_start, sett_start))
+                cached_by_lotto.setdefault(c.lotto_id, {})[(c.anno, c.settimana)] = {
                     "anno": c.anno,
                     "settimana": c.settimana,
-                    "lotto_id": c.lotto_id,
                     "prodotto": c.prodotto,
                     "uova": c.uova,
                     "eta": cached_eta,
-                    "allevamento": lotto_allevamento_map.get(c.lotto_id, f"Lotto {c.lotto_id}")
                 }
-                cached_lotto_ids.add(c.lotto_id)
-        
-        # 4. CALCULATE PRODUCTION (only for lotti not in valid cache)
-        production_entries = []
+            for lotto_id, entries in cached_by_lotto.items():
+                loaded_blocks[lotto_id] = production_cache.LottoBlock.from_entries(list(entries.values()))
+
+        # 4. CALCULATE PRODUCTION (only for lotti in neither cache)
+        # All uncached lotti are computed in a single batch pass
         new_cache_entries = []
-        
-        for lotto in lotti_attivi:
-            lotto_id = lotto.get('id')
-            
-            # Check if this lotto has valid cache
-            if lotto_id in cached_lotto_ids:
-                # Use cached data
-                for key, entry in cache_by_key.items():
-                    if key[2] == lotto_id:
-                        production_entries.append(entry)
-            else:
-                # Calculate and cache
-                lotto_production = ProductionService._calculate_production_for_lotto(lotto, df_curve, lifecycle_max)
-                production_entries.extend(lotto_production)
-                new_cache_entries.extend(lotto_production)
-        
+        lotti_da_calcolare = [
+            l for l in lotti
+            if l.get('id') not in blocks and l.get('id') not in loaded_blocks
+        ]
+        calcolati = ProductionService._calculate_lotti(lotti_da_calcolare, curves, lifecycle_max)
+        for lotto, lotto_production in zip(lotti_da_calcolare, calcolati):
+            new_cache_entries.extend(lotto_production)
+            loaded_blocks[lotto.get('id')] = production_cache.LottoBlock.from_entries(lotto_production)
+
         # 5. SAVE NEW CACHE ENTRIES
-        if new_cache_entries:
-            save_production_cache_bulk(new_cache_entries)
-        
-        # 6. AGGREGATE PRODUCTION BY (year, week)
-        production_data = {}  # (anno, settimana) -> list of details
+        if lotti_da_calcolare:
+            save_production_cache_bulk(new_cache_entries, [l.get('id') for l in lotti_da_calcolare])
+        if loaded_blocks:
+            production_cache.store_blocks(loaded_blocks, cache_epoch)
+
+        blocks.update(loaded_blocks)
+        return blocks
+
+    @staticmethod
+    def _prepare_weekly_summary(product_filter: Optional[str], production_entries: List[Dict],
+                                lotto_razza_map: Dict, adjustments) -> tuple:
+        """
+        Steps 6 and 7.5 of the weekly summary for one product: gross shed
+        details and manual rows indexed by week_calendar.week_key.
+        """
+        # 6. AGGREGATE PRODUCTION BY WEEK KEY
+        production_data = {}  # week_key(anno, settimana) -> list of details
         for entry in production_entries:
-            key = (entry['anno'], entry['settimana'])
+            key = week_calendar.week_key(entry['anno'], entry['settimana'])
             if key not in production_data:
                 production_data[key] = []
             lotto_id = entry.get('lotto_id')
@@ -372,21 +859,57 @@ class ProductionService:
                 "razza": razza_info.get('razza', ''),
                 "razza_gallo": razza_info.get('razza_gallo', '')
             })
-        
-        # 7. GET TRADING DATA (T004 Purchases, T005 Sales)
-        trading_acq = get_trading_data("acquisto")
-        trading_ven = get_trading_data("vendita")
-        
-        # Aggregate by (year, week) and product
-        purchases_by_week_product = ProductionService._aggregate_trading_by_product(trading_acq, product_filter)
-        sales_by_week_product = ProductionService._aggregate_trading_by_product(trading_ven, product_filter)
-        
-        purchases_map = {}  # (anno, settimana) -> list of details
-        sales_map = {}     # (anno, settimana) -> list of details
+
+        # 7.5. MANUAL PRODUCTION ADJUSTMENTS
+        # Righe manuali inserite via "Dettaglio Vendite" T002. Si sommano alla
+        # produzione (e quindi al totale netto) della settimana corrispondente.
+        adjustments_map: Dict[int, List[Dict]] = {}
+        for adj in adjustments:
+            # Empty prodotto means the row applies to all products
+            if product_filter and adj.prodotto and adj.prodotto != product_filter:
+                continue
+            k = week_calendar.week_key(adj.anno, adj.settimana)
+            adjustments_map.setdefault(k, []).append({
+                "id": adj.id,
+                "anno": adj.anno,
+                "settimana": adj.settimana,
+                "prodotto": adj.prodotto or "",
+                "descrizione": adj.descrizione or "",
+                "quantita": adj.quantita or 0,
+            })
+
+        return production_data, adjustments_map
+
+    @staticmethod
+    def _summarize_weeks(product_filter: Optional[str], production_data: Dict, adjustments_map: Dict,
+                         cycle_settings: Dict, trading_acq, trading_ven, assegnazioni,
+                         weeks: Optional[set] = None) -> Dict[int, Dict]:
+        """Collects _iter_summary_weeks into {week_key: summary row}."""
+        return dict(ProductionService._iter_summary_weeks(
+            product_filter, production_data, adjustments_map, cycle_settings,
+            trading_acq, trading_ven, assegnazioni, weeks,
+        ))
+
+    @staticmethod
+    def _iter_summary_weeks(product_filter: Optional[str], production_data: Dict, adjustments_map: Dict,
+                            cycle_settings: Dict, trading_acq, trading_ven, assegnazioni,
+                            weeks: Optional[set] = None, per_week: bool = False) -> Iterator[tuple]:
+        """
+        Steps 7-8 (sales allocation and totals) week by week. production_data
+        holds the gross shed details and is not modified. With `weeks`, only
+        those week keys are summarized (trading rows of other weeks are ignored).
+        (week_key, summary row) is yielded in week order; weeks left empty
+        are skipped. Sales are allocated (services.sales_allocation) for all
+        weeks in one sweep before the first row, or with per_week week by
+        week as the rows are yielded (streaming).
+        """
+        # 7. TRADING DATA (T004 Purchases, T005 Sales)
+        purchases_map = {}  # week_key(anno, settimana) -> list of details
+        sales_map = {}     # week_key(anno, settimana) -> list of details
 
         for row in trading_acq:
             if row.quantita > 0 and (not product_filter or row.prodotto == product_filter):
-                k = (row.anno, row.settimana)
+                k = week_calendar.week_key(row.anno, row.settimana)
                 if k not in purchases_map:
                     purchases_map[k] = []
                 purchases_map[k].append({
@@ -397,36 +920,31 @@ class ProductionService:
 
         # Map vendita_id -> trading row (needed to enrich assegnazioni with azienda/prodotto)
         vendita_rows_by_id = {row.id: row for row in trading_ven}
-        # Pre-load all assegnazioni in one query (avoid N+1).
-        # assegnazioni_by_week[(anno, settimana)] = list of dicts
-        # assegnazioni_by_week_allev[(anno, settimana, allevamento)] = total qty (used to decurt sheds)
+        # Index the pre-loaded assegnazioni (one query for all products, avoid N+1).
+        # explicit_by_week[week_key][allevamento] = total qty (used to decurt sheds)
         assegnazioni_by_vendita: Dict[int, List[Dict]] = {}
-        assegnazioni_by_week_allev: Dict[tuple, int] = {}
-        db = SessionLocal()
-        try:
-            for a in db.query(VenditaAssegnazione).all():
-                vrow = vendita_rows_by_id.get(a.vendita_id)
-                if vrow is None:
-                    continue
-                # Skip orphan assignments attached to ghost vendita rows
-                # (quantita<=0). Without this, the shed decurtation runs
-                # against assegnazioni the user can no longer see in T002.
-                if vrow.quantita <= 0:
-                    continue
-                if product_filter and vrow.prodotto != product_filter:
-                    continue
-                assegnazioni_by_vendita.setdefault(a.vendita_id, []).append({
-                    "allevamento": a.allevamento,
-                    "quantita": a.quantita,
-                })
-                k = (vrow.anno, vrow.settimana, a.allevamento)
-                assegnazioni_by_week_allev[k] = assegnazioni_by_week_allev.get(k, 0) + a.quantita
-        finally:
-            db.close()
+        explicit_by_week: Dict[int, Dict[str, int]] = {}
+        for a in assegnazioni:
+            vrow = vendita_rows_by_id.get(a.vendita_id)
+            if vrow is None:
+                continue
+            # Skip orphan assignments attached to ghost vendita rows
+            # (quantita<=0). Without this, the shed decurtation runs
+            # against assegnazioni the user can no longer see in T002.
+            if vrow.quantita <= 0:
+                continue
+            if product_filter and vrow.prodotto != product_filter:
+                continue
+            assegnazioni_by_vendita.setdefault(a.vendita_id, []).append({
+                "allevamento": a.allevamento,
+                "quantita": a.quantita,
+            })
+            per_allev = explicit_by_week.setdefault(week_calendar.week_key(vrow.anno, vrow.settimana), {})
+            per_allev[a.allevamento] = per_allev.get(a.allevamento, 0) + a.quantita
 
         for row in trading_ven:
             if row.quantita > 0 and (not product_filter or row.prodotto == product_filter):
-                k = (row.anno, row.settimana)
+                k = week_calendar.week_key(row.anno, row.settimana)
                 if k not in sales_map:
                     sales_map[k] = []
                 sales_map[k].append({
@@ -437,82 +955,61 @@ class ProductionService:
                     "assegnazioni": assegnazioni_by_vendita.get(row.id, []),
                 })
 
-        # Subtract sales from each shed's production (per week).
-        # Pass 1 — explicit user assignments always win.
-        for (anno, sett, allev), tot_assigned in assegnazioni_by_week_allev.items():
-            details = production_data.get((anno, sett))
-            if not details:
-                continue
-            remaining = tot_assigned
-            for det in details:
-                if remaining <= 0:
-                    break
-                if det.get("allevamento") != allev:
-                    continue
-                take = min(det["quantita"], remaining)
-                det["quantita"] -= take
-                remaining -= take
-
-        # Pass 2 — optional auto-assignment of the un-assigned residue.
-        # Controlled by the `auto_assign_sales` flag in cycle_settings.
-        # Heuristic: take from sheds with eta ∈ [30, 45] first (youngest first),
-        # then fall back to the remaining sheds (still youngest first).
-        if cycle_settings.get('auto_assign_sales'):
-            all_week_keys = set(production_data.keys()) | set(sales_map.keys())
-            for (year, week) in all_week_keys:
-                details = production_data.get((year, week)) or []
-                ven_for_week = sum(d['quantita'] for d in sales_map.get((year, week), []))
-                explicit_for_week = sum(
-                    qty for (a, s, _), qty in assegnazioni_by_week_allev.items()
-                    if (a, s) == (year, week)
-                )
-                remaining = max(0, ven_for_week - explicit_for_week)
-                if remaining <= 0 or not details:
-                    continue
-                # Bucket the indexes: in-window (30..45) first, others second;
-                # inside each bucket sort by eta ascending (youngest first).
-                in_window = [i for i, d in enumerate(details) if 30 <= d.get('eta', 0) <= 45]
-                others = [i for i, d in enumerate(details) if not (30 <= d.get('eta', 0) <= 45)]
-                in_window.sort(key=lambda i: details[i].get('eta', 0))
-                others.sort(key=lambda i: details[i].get('eta', 0))
-                for idx in in_window + others:
-                    if remaining <= 0:
-                        break
-                    take = min(details[idx]['quantita'], remaining)
-                    details[idx]['quantita'] -= take
-                    remaining -= take
+        if weeks is None:
+            weeks = set(production_data.keys()) | set(purchases_map.keys()) | set(sales_map.keys()) | set(adjustments_map.keys())
 
-        # 7.5. MANUAL PRODUCTION ADJUSTMENTS
-        # Righe manuali inserite via "Dettaglio Vendite" T002. Si sommano alla
-        # produzione (e quindi al totale netto) della settimana corrispondente.
-        adjustments_map: Dict[tuple, List[Dict]] = {}
-        for adj in get_manual_adjustments(product_filter):
-            k = (adj.anno, adj.settimana)
-            adjustments_map.setdefault(k, []).append({
-                "id": adj.id,
-                "anno": adj.anno,
-                "settimana": adj.settimana,
-                "prodotto": adj.prodotto or "",
-                "descrizione": adj.descrizione or "",
-                "quantita": adj.quantita or 0,
-            })
+        auto_assign = bool(cycle_settings.get('auto_assign_sales'))
 
-        # 8. AGGREGATE SUMMARY
-        all_keys = set(production_data.keys()) | set(purchases_map.keys()) | set(sales_map.keys()) | set(adjustments_map.keys())
-        sorted_keys = sorted(list(all_keys))
+        def allocate(details_by_week: Dict[int, List[Dict]]):
+            # Subtract sales from each shed's production: explicit user
+            # assignments first, then (auto_assign_sales) the un-assigned
+            # residue on sheds aged 30-45, youngest first.
+            flat = [(key, det) for key, prod_details in details_by_week.items() for det in prod_details]
+            if not flat:
+                return
+            net = allocate_sales(
+                [key for key, _ in flat],
+                [det.get('allevamento') for _, det in flat],
+                [det.get('eta', 0) for _, det in flat],
+                [det['quantita'] for _, det in flat],
+                explicit_by_week,
+                {key: sum(d['quantita'] for d in sales_map.get(key, [])) for key in details_by_week},
+                auto_assign,
+            )
+            for (_, det), quantita in zip(flat, net.tolist()):
+                det['quantita'] = quantita
 
-        summary = []
-        for year, week in sorted_keys:
-            prod_details = production_data.get((year, week), [])
-            prod_total = sum(d['quantita'] for d in prod_details)
+        def week_details():
+            # Fresh copies: the gross details are shared with later refreshes
+            for key in sorted(weeks):
+                prod_details = [dict(d) for d in production_data.get(key, [])]
+                if prod_details or key in purchases_map or key in sales_map or key in adjustments_map:
+                    yield key, prod_details
 
-            acq_details = purchases_map.get((year, week), [])
-            acq_total = sum(d['quantita'] for d in acq_details)
+        if per_week:
+            # Allocation only depends on the week itself: do it as each
+            # week is reached, so the first row needs no work on the others
+            def allocated_weeks():
+                for key, prod_details in week_details():
+                    allocate({key: prod_details})
+                    yield key, prod_details
+            details = allocated_weeks()
+        else:
+            # All weeks in one NumPy sweep
+            details_by_week = dict(week_details())
+            allocate(details_by_week)
+            details = details_by_week.items()
 
-            ven_details = sales_map.get((year, week), [])
+        # 8. AGGREGATE SUMMARY
+        for key, prod_details in details:
+            year, week = week_calendar.key_to_week(key)
+            acq_details = purchases_map.get(key, [])
+            ven_details = sales_map.get(key, [])
+            manual_details = adjustments_map.get(key, [])
             ven_total = sum(d['quantita'] for d in ven_details)
 
-            manual_details = adjustments_map.get((year, week), [])
+            prod_total = sum(d['quantita'] for d in prod_details)
+            acq_total = sum(d['quantita'] for d in acq_details)
             manual_total = sum(d['quantita'] for d in manual_details)
 
             # produzione_totale already reflects the vendite subtracted from
@@ -523,7 +1020,7 @@ class ProductionService:
             # Le righe manuali si sommano direttamente a produzione e totale netto.
             net_total = prod_total + manual_total + acq_total - non_assegnato
 
-            summary.append({
+            yield key, {
                 "periodo": f"{year} - {week:02d}",
                 "anno": year,
                 "settimana": week,
@@ -535,6 +1032,4 @@ class ProductionService:
                 "dettagli_acquisti": acq_details,
                 "dettagli_vendite": ven_details,
                 "dettagli_manuali": manual_details,
-            })
-
-        return summary
+            }
@@ -0,0 +1,86 @@
+"""
+Sales Allocation - Decurtazione delle vendite dalla produzione dei capannoni
+
+Unica implementazione della regola usata da riepilogo produzione (G001) e
+pianificazione pulcini (T010-T013); scripts/agente_vendite.py ne tiene una
+copia in Python puro per non dipendere da NumPy né dal backend:
+
+1. Le assegnazioni esplicite vendita → allevamento vincono sempre; se più
+   lotti condividono l'allevamento si consumano nell'ordine dei dettagli.
+2. Solo con auto_assign, il residuo non assegnato della settimana
+   (vendite - assegnazioni esplicite) si toglie prima dai capannoni con
+   eta 30-45, poi dagli altri, sempre dal più giovane.
+
+Tutte le settimane vengono elaborate in un'unica passata NumPy: i dettagli
+sono raggruppati per (settimana, allevamento) o per settimana e ogni
+gruppo consuma il proprio budget con una somma cumulativa.
+
+Il modulo dipende solo da NumPy e non importa il database.
+"""
+from typing import Dict, Hashable, Sequence
+
+import numpy as np
+
+AUTO_ASSIGN_ETA_MIN = 30
+AUTO_ASSIGN_ETA_MAX = 45
+
+
+def allocate_sales(weeks: Sequence[Hashable], allevamenti: Sequence[str], eta: Sequence[int],
+                   quantita: Sequence[int], explicit: Dict[Hashable, Dict[str, int]],
+                   sales: Dict[Hashable, int], auto_assign: bool = False) -> np.ndarray:
+    """
+    Net quantity of each production detail after subtracting the sales.
+
+    The i-th detail produced quantita[i] eggs in week weeks[i] from shed
+    allevamenti[i] at age eta[i]. explicit[week][allevamento] is the total
+    explicitly assigned to that shed that week, sales[week] the total sold.
+    Returns an int64 array aligned with the inputs.
+    """
+    q = np.asarray(quantita, dtype=np.int64)
+    n = len(q)
+    if n == 0:
+        return q.copy()
+
+    # Pass 1 — explicit assignments, one budget per (week, allevamento)
+    group_of: Dict[tuple, int] = {}
+    shed_groups = np.fromiter(
+        (group_of.setdefault((w, a), len(group_of)) for w, a in zip(weeks, allevamenti)),
+        dtype=np.int64, count=n,
+    )
+    budgets = np.array(
+        [(explicit.get(w) or {}).get(a, 0) if a else 0 for w, a in group_of],
+        dtype=np.int64,
+    )
+    net = q - _consume(q, shed_groups, np.argsort(shed_groups, kind="stable"), budgets)
+    if not auto_assign:
+        return net
+
+    # Pass 2 — residue per week: 30-45 first, youngest first, then detail order
+    week_of: Dict[Hashable, int] = {}
+    week_groups = np.fromiter((week_of.setdefault(w, len(week_of)) for w in weeks), dtype=np.int64, count=n)
+    residue = np.array(
+        [max(0, sales.get(w, 0) - sum((explicit.get(w) or {}).values())) for w in week_of],
+        dtype=np.int64,
+    )
+    ages = np.asarray(eta, dtype=np.float64)
+    outside = ~((ages >= AUTO_ASSIGN_ETA_MIN) & (ages <= AUTO_ASSIGN_ETA_MAX))
+    order = np.lexsort((np.arange(n), ages, outside, week_groups))
+    return net - _consume(net, week_groups, order, residue)
+
+
+def _consume(q: np.ndarray, groups: np.ndarray, order: np.ndarray, budgets: np.ndarray) -> np.ndarray:
+    """
+    Amount taken from each element when every group's budget is consumed
+    element by element in `order` (which must keep each group contiguous):
+    take = min(q, budget - taken before it in the group), never negative.
+    """
+    qs = q[order]
+    gs = groups[order]
+    csum = np.cumsum(qs)
+    starts = np.flatnonzero(np.r_[True, gs[1:] != gs[:-1]])
+    run = np.cumsum(np.r_[True, gs[1:] != gs[:-1]]) - 1
+    before = csum - qs - (csum - qs)[starts][run]
+    take_sorted = np.minimum(qs, np.maximum(budgets[gs] - before, 0))
+    take = np.empty_like(q)
+    take[order] = take_sorted
+    return take
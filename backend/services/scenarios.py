@@ -0,0 +1,332 @@
+"""
+Scenarios - Piani lotti what-if valutati senza scrivere sul database
+
+Uno scenario descrive modifiche ipotetiche a T001 (override di campi dei
+lotti, lotti aggiunti, lotti rimossi) ed eventualmente ai totali di
+acquisti/vendite. Tutti gli scenari di una richiesta sono valutati sullo
+stesso snapshot di input:
+
+- i lotti non toccati riusano i blocchi di production_cache in memoria;
+- le varianti (uguali tra scenari diversi calcolate una volta sola) e i
+  lotti base non ancora in cache sono calcolati in un'unica passata
+  calculate_for_lotti (eventualmente su services.production_pool);
+- la decurtazione delle vendite è un solo allocate_sales su tutte le
+  settimane di tutti gli scenari, con le stesse regole del riepilogo.
+
+Nulla viene salvato: né il database né production_cache vengono toccati.
+I prodotti di lotti e trading si confrontano senza badare alle maiuscole,
+come fa PlanningInputs, e confluiscono nel nome di EXTENDED_PLANS
+("granpollo" in T001 conta come Granpollo); le assegnazioni esplicite
+valgono solo per le vendite con il nome esatto, come nelle tabelle.
+Le stime pulcini usano le stesse funzioni delle tabelle T010-T013 estese
+(chick_planning_service: plan_for, rate_percents, shed_chicks,
+purchase_chicks): nascita = produzione + 3 settimane, tasso T008 per età
+del capannone con il ripiego del prodotto (82% o 84%), tasso T009 sulle
+uova acquistate, arrotondamento o troncamento come nella tabella.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from database import (
+    get_cycle_settings,
+    get_lotti,
+    get_trading_data,
+    get_vendita_assegnazioni,
+)
+from services import production_cache, week_calendar
+from services.birth_rate_store import get_birth_rate_table
+from services.chick_planning_service import EXTENDED_PLANS, plan_for, purchase_chicks, rate_percents, shed_chicks
+from services.curve_store import get_curve_snapshot
+from services.production_service import ProductionService
+from services.sales_allocation import allocate_sales
+
+INCUBATION_WEEKS = 3  # birth week = production week + 3
+
+# Overriding any of these makes the lotto's galline effettive meaningless:
+# the planned Capi are used instead.
+HENS_FIELDS = ("Capi", "Allevamento", "Capannone")
+
+# Group ids pack (scenario, product, week_key) into one integer
+_KEY_SPAN = 1_000_000
+
+
+class Scenario:
+    """One what-if plan: lotto overrides, additions, removals and trading totals."""
+
+    __slots__ = ("name", "overrides", "additions", "removals", "trading")
+
+    def __init__(self, name: str, overrides: Optional[Dict[int, Dict]] = None,
+                 additions: Optional[List[Dict]] = None, removals=None,
+                 trading: Optional[List[Dict]] = None):
+        self.name = name
+        self.overrides = overrides or {}  # lotto_id -> {T001 field: value}
+        self.additions = additions or []  # full lotto dicts (T001 field names)
+        self.removals = set(removals or ())  # lotto ids
+        # [{tipo, prodotto, anno, settimana, quantita}]: replaces that week's total
+        self.trading = trading or []
+
+
+def evaluate_scenarios(scenarios: List[Scenario], products: Optional[List[str]] = None,
+                       from_week: Optional[tuple] = None, to_week: Optional[tuple] = None) -> List[Dict]:
+    """
+    Weekly totals and chick estimates of each scenario, in input order:
+    [{"name", "weeks": [{prodotto, anno, settimana, settimana_nascita,
+    uova_prodotte, uova_acquistate, uova_vendute, uova_totali,
+    animali_possibili}, ...]}]. `products` limits the products evaluated;
+    from_week / to_week ((anno, settimana), inclusive) the production weeks.
+    Raises ValueError when a scenario overrides or removes an unknown lotto.
+    """
+    lotti_by_id = {l.get('id'): l for l in get_lotti()}
+    for sc in scenarios:
+        unknown = (set(sc.overrides) | sc.removals) - set(lotti_by_id)
+        if unknown:
+            raise ValueError(f"Scenario '{sc.name}': lotti non trovati {sorted(unknown)}")
+
+    plans, variant_lotti, variant_hens = _plan_scenarios(scenarios, lotti_by_id, products)
+    blocks = _production_blocks(plans, variant_lotti, variant_hens, lotti_by_id)
+
+    acquisti = _trading_totals("acquisto", from_week, to_week)
+    vendite = _trading_totals("vendita", from_week, to_week)
+    explicit = _explicit_assignments(from_week, to_week)
+
+    canon = _canonical_products(
+        {lotto.get('Prodotto') for plan in plans for _, lotto in plan}
+        | {p for p, _ in acquisti} | {p for p, _ in vendite} | {p for p, _ in explicit}
+        | {t.get('prodotto') for sc in scenarios for t in sc.trading}
+    )
+    acquisti = _merge_products(acquisti, canon)
+    vendite = _merge_products(vendite, canon)
+    # get_assegnazioni_by_week matches prodotto exactly in the tables
+    explicit = {k: v for k, v in explicit.items() if canon[k[0]] == k[0]}
+
+    product_names = sorted(set(canon.values()), key=str)
+    if products:
+        wanted = {str(p).lower() for p in products}
+        product_names = [p for p in product_names if str(p).lower() in wanted]
+    product_index = {p: i for i, p in enumerate(product_names)}
+    n_products = max(1, len(product_names))
+
+    # Flat production details of all scenarios
+    groups, allevamenti, eta, uova = [], [], [], []
+    for s, plan in enumerate(plans):
+        for source, lotto in plan:
+            pidx = product_index.get(canon[lotto.get('Prodotto')])
+            block = blocks.get(source)
+            if pidx is None or block is None or not len(block):
+                continue
+            keys = week_calendar.week_keys(block.anno, block.settimana)
+            mask = _window_mask(keys, from_week, to_week)
+            if not mask.any():
+                continue
+            groups.append((s * n_products + pidx) * _KEY_SPAN + keys[mask])
+            eta.append(block.eta[mask])
+            uova.append(block.uova[mask])
+            allevamenti.extend([f"{lotto['Allevamento']} {lotto['Capannone']}"] * int(mask.sum()))
+    groups = np.concatenate(groups) if groups else np.empty(0, dtype=np.int64)
+    eta = np.concatenate(eta).astype(np.int64) if eta else np.empty(0, dtype=np.int64)
+    uova = np.concatenate(uova).astype(np.int64) if uova else np.empty(0, dtype=np.int64)
+
+    # Trading totals and explicit assignments per group
+    sales_by_group: Dict[int, int] = {}
+    purchases_by_group: Dict[int, int] = {}
+    explicit_by_group: Dict[int, Dict[str, int]] = {}
+    for s, sc in enumerate(scenarios):
+        acq_s, ven_s, explicit_s = dict(acquisti), dict(vendite), dict(explicit)
+        for t in sc.trading:
+            k = (canon[t.get('prodotto')], week_calendar.week_key(int(t['anno']), int(t['settimana'])))
+            if t.get('tipo') == "acquisto":
+                acq_s[k] = max(0, int(t.get('quantita') or 0))
+            elif t.get('tipo') == "vendita":
+                ven_s[k] = max(0, int(t.get('quantita') or 0))
+                if not ven_s[k]:
+                    # No sale left that week: its assignments go with it
+                    explicit_s.pop(k, None)
+        for target, totals in ((purchases_by_group, acq_s), (sales_by_group, ven_s)):
+            for (prodotto, key), qty in totals.items():
+                pidx = product_index.get(prodotto)
+                if pidx is not None and qty > 0 and _in_window(key, from_week, to_week):
+                    target[(s * n_products + pidx) * _KEY_SPAN + key] = qty
+        for (prodotto, key), per_allev in explicit_s.items():
+            pidx = product_index.get(prodotto)
+            if pidx is not None:
+                explicit_by_group[(s * n_products + pidx) * _KEY_SPAN + key] = per_allev
+
+    # Sales decurtation for every scenario in one sweep
+    auto_assign = bool(get_cycle_settings().get('auto_assign_sales'))
+    remaining = allocate_sales(groups.tolist(), allevamenti, eta, uova,
+                               explicit_by_group, sales_by_group, auto_assign)
+
+    # Chicks from each shed, with the rate and rounding of the product's planning table
+    birth_rates = get_birth_rate_table()
+    plans_by_product = [plan_for(p) for p in product_names]
+    pidx_of = (groups // _KEY_SPAN) % n_products
+    animali_shed = np.zeros(len(groups), dtype=np.int64)
+    for pidx, product_plan in enumerate(plans_by_product):
+        of_product = pidx_of == pidx
+        rates = rate_percents(product_plan, birth_rates, eta[of_product])
+        animali_shed[of_product] = shed_chicks(product_plan, rates, remaining[of_product])
+
+    group_ids, inverse = np.unique(groups, return_inverse=True)
+    prodotte = np.bincount(inverse, weights=uova, minlength=len(group_ids)).astype(np.int64).tolist()
+    animali = np.bincount(inverse, weights=animali_shed, minlength=len(group_ids)).astype(np.int64).tolist()
+    by_group = {g: (p, a) for g, p, a in zip(group_ids.tolist(), prodotte, animali)}
+
+    results = [{"name": sc.name, "weeks": []} for sc in scenarios]
+    for g in sorted(set(by_group) | set(purchases_by_group) | set(sales_by_group)):
+        scenario_product, key = divmod(g, _KEY_SPAN)
+        s, pidx = divmod(scenario_product, n_products)
+        uova_prodotte, animali_g = by_group.get(g, (0, 0))
+        uova_acquistate = purchases_by_group.get(g, 0)
+        uova_vendute = sales_by_group.get(g, 0)
+        if uova_acquistate > 0:
+            animali_g += purchase_chicks(plans_by_product[pidx], birth_rates, uova_acquistate)
+        anno, settimana = week_calendar.key_to_week(key)
+        nascita_anno, nascita_sett = week_calendar.normalize(anno, settimana + INCUBATION_WEEKS)
+        results[s]["weeks"].append({
+            "prodotto": product_names[pidx],
+            "anno": anno,
+            "settimana": settimana,
+            "settimana_nascita": f"{nascita_anno}/{nascita_sett:02d}",
+            "uova_prodotte": uova_prodotte,
+            "uova_acquistate": uova_acquistate,
+            "uova_vendute": uova_vendute,
+            "uova_totali": uova_prodotte + uova_acquistate - uova_vendute,
+            "animali_possibili": round(animali_g / 100) * 100,
+        })
+    return results
+
+
+def _plan_scenarios(scenarios: List[Scenario], lotti_by_id: Dict[int, dict], products: Optional[List[str]]):
+    """
+    Lotti of each scenario as [(source, lotto)], source being ("base", id)
+    or ("variant", index into variant_lotti). Identical variants across
+    scenarios share one index. variant_hens[i] tells whether variant i
+    keeps the galline effettive of the real lotto.
+    """
+    wanted = {str(p).lower() for p in products or ()}
+    variant_index: Dict[tuple, int] = {}
+    variant_lotti: List[dict] = []
+    variant_hens: List[bool] = []
+
+    def variant(lotto: dict, keep_hens: bool) -> tuple:
+        frozen = (tuple(sorted(lotto.items(), key=lambda kv: kv[0])), keep_hens)
+        if frozen not in variant_index:
+            variant_index[frozen] = len(variant_lotti)
+            variant_lotti.append(lotto)
+            variant_hens.append(keep_hens)
+        return ("variant", variant_index[frozen])
+
+    plans = []
+    for sc in scenarios:
+        plan = []
+        for lotto_id, lotto in lotti_by_id.items():
+            if lotto_id in sc.removals:
+                continue
+            override = sc.overrides.get(lotto_id)
+            if not override:
+                if lotto.get('Attivo', True):
+                    plan.append((("base", lotto_id), lotto))
+                continue
+            merged = {**lotto, **override, 'id': lotto_id}
+            if merged.get('Attivo', True):
+                keep_hens = not any(field in override for field in HENS_FIELDS)
+                plan.append((variant(merged, keep_hens), merged))
+        for i, added in enumerate(sc.additions):
+            # Synthetic negative ids never collide with real lotti
+            merged = {'Attivo': True, 'Data_Fine_Prevista': None, **added, 'id': -(i + 1)}
+            plan.append((variant(merged, False), merged))
+        plans.append([(source, lotto) for source, lotto in plan
+                      if not products or str(lotto.get('Prodotto')).lower() in wanted])
+    return plans, variant_lotti, variant_hens
+
+
+def _production_blocks(plans, variant_lotti: List[dict], variant_hens: List[bool],
+                       lotti_by_id: Dict[int, dict]) -> Dict[tuple, production_cache.LottoBlock]:
+    """
+    {source: LottoBlock} for every lotto the plans use. Untouched lotti come
+    from the in-memory production cache; the rest is computed in one batch
+    and never stored.
+    """
+    used_variants = sorted({source[1] for plan in plans for source, _ in plan if source[0] == "variant"})
+    base_ids = sorted({source[1] for plan in plans for source, _ in plan if source[0] == "base"})
+    cached, _ = production_cache.get_blocks(base_ids)
+    blocks = {("base", lotto_id): block for lotto_id, block in cached.items()}
+
+    sources = [("base", lotto_id) for lotto_id in base_ids if lotto_id not in cached]
+    sources += [("variant", i) for i in used_variants]
+    if not sources:
+        return blocks
+    lotti = [lotti_by_id[ref] if kind == "base" else variant_lotti[ref] for kind, ref in sources]
+    real = [i for i, (kind, ref) in enumerate(sources) if kind == "base" or variant_hens[ref]]
+    hens_timelines = [[] for _ in sources]
+    for i, timeline in zip(real, ProductionService._effective_hens_timelines([lotti[i] for i in real])):
+        hens_timelines[i] = timeline
+
+    cycle_settings = get_cycle_settings()
+    lifecycle_max = cycle_settings.get('eta_fine_ciclo', ProductionService.LIFECYCLE_MAX)
+    computed = ProductionService._calculate_lotti(lotti, get_curve_snapshot(), lifecycle_max, hens_timelines)
+    for source, entries in zip(sources, computed):
+        blocks[source] = production_cache.LottoBlock.from_entries(entries)
+    return blocks
+
+
+def _canonical_products(names) -> Dict[Optional[str], Optional[str]]:
+    """
+    Raw prodotto -> the name it is evaluated under: names equal but for
+    case are one product (as PlanningInputs matches them), named as in
+    EXTENDED_PLANS or else by their first spelling in sorted order.
+    """
+    by_lower = {}
+    for name in sorted((n for n in names if n), key=str):
+        by_lower.setdefault(str(name).lower(), name)
+    for plan in EXTENDED_PLANS.values():
+        if plan.db_product.lower() in by_lower:
+            by_lower[plan.db_product.lower()] = plan.db_product
+    return {name: by_lower[str(name).lower()] if name else name for name in names}
+
+
+def _merge_products(totals: Dict[tuple, int], canon: Dict) -> Dict[tuple, int]:
+    """{(prodotto, week_key): qty} summed over the spellings of each product."""
+    merged: Dict[tuple, int] = {}
+    for (prodotto, key), qty in totals.items():
+        k = (canon[prodotto], key)
+        merged[k] = merged.get(k, 0) + qty
+    return merged
+
+
+def _trading_totals(tipo: str, from_week: Optional[tuple], to_week: Optional[tuple]) -> Dict[tuple, int]:
+    """{(prodotto, week_key): total quantita} of the positive trading rows."""
+    totals: Dict[tuple, int] = {}
+    for row in get_trading_data(tipo, from_week, to_week):
+        if row.quantita > 0:
+            k = (row.prodotto, week_calendar.week_key(row.anno, row.settimana))
+            totals[k] = totals.get(k, 0) + row.quantita
+    return totals
+
+
+def _explicit_assignments(from_week: Optional[tuple], to_week: Optional[tuple]) -> Dict[tuple, Dict[str, int]]:
+    """{(prodotto, week_key): {allevamento: qty}} of the assignments of visible vendite."""
+    vendite = {row.id: row for row in get_trading_data("vendita", from_week, to_week) if row.quantita > 0}
+    explicit: Dict[tuple, Dict[str, int]] = {}
+    for a in get_vendita_assegnazioni(from_week, to_week):
+        vrow = vendite.get(a.vendita_id)
+        if vrow is None:
+            continue
+        per_allev = explicit.setdefault((vrow.prodotto, week_calendar.week_key(vrow.anno, vrow.settimana)), {})
+        per_allev[a.allevamento] = per_allev.get(a.allevamento, 0) + a.quantita
+    return explicit
+
+
+def _window_mask(keys: np.ndarray, from_week: Optional[tuple], to_week: Optional[tuple]) -> np.ndarray:
+    mask = np.ones(len(keys), dtype=bool)
+    if from_week:
+        mask &= keys >= week_calendar.week_key(*from_week)
+    if to_week:
+        mask &= keys <= week_calendar.week_key(*to_week)
+    return mask
+
+
+def _in_window(key: int, from_week: Optional[tuple], to_week: Optional[tuple]) -> bool:
+    return ((not from_week or key >= week_calendar.week_key(*from_week))
+            and (not to_week or key <= week_calendar.week_key(*to_week)))
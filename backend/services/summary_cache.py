@@ -0,0 +1,86 @@
+"""
+Summary Cache - Memoizzazione LRU dei riepiloghi settimanali
+
+Le chiavi includono il vettore di generazioni (services.generations):
+una scrittura su una tabella di input cambia il vettore, quindi le voci
+vecchie non vengono più richieste e scivolano fuori dall'LRU.
+
+I valori restituiti sono condivisi tra le richieste: i chiamanti devono
+trattarli in sola lettura.
+
+SummaryState conserva l'ultimo riepilogo di un prodotto insieme alla
+produzione lorda per settimana: dopo una modifica a trading o
+assegnazioni si ricalcolano solo le settimane toccate.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class SummaryCache:
+    """Thread-safe LRU map with hit/miss counters."""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            value = self._data.get(key, self._MISSING)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the entries, oldest first; does not touch LRU order or counters."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+class SummaryState:
+    """
+    Last weekly summary of one product with the inputs that do not depend
+    on trading data, so single weeks can be recomputed after a trading or
+    assegnazione edit. Weeks are keyed by week_calendar.week_key; vector is
+    None when the state cannot be refreshed.
+    """
+
+    __slots__ = ("vector", "production_by_week", "adjustments_by_week", "rows_by_week", "summary")
+
+    def __init__(self, vector: Optional[Tuple[int, ...]], production_by_week: Dict[int, List[Dict]],
+                 adjustments_by_week: Dict[int, List[Dict]], rows_by_week: Dict[int, Dict]):
+        self.vector = vector
+        self.production_by_week = production_by_week  # gross shed details, never mutated
+        self.adjustments_by_week = adjustments_by_week
+        self.rows_by_week = rows_by_week
+        self.summary = [rows_by_week[k] for k in sorted(rows_by_week)]
@@ -0,0 +1,88 @@
+"""
+Week Calendar - Aritmetica su anno/settimana con interi
+
+Il gestionale conta 52 settimane per anno: l'età di un lotto si somma alla
+settimana di accasamento e l'eccedenza passa all'anno successivo. Qui tutta
+l'aritmetica passa per la settimana seriale
+
+    serial = anno * 52 + (settimana - 1)
+
+che rende la normalizzazione O(1) (divmod) e le conversioni vettoriali su
+array NumPy.
+
+Le chiavi dei dizionari usano invece week_key = anno * 100 + settimana:
+un intero che conserva l'ordine di (anno, settimana) ed è iniettivo anche
+per la settimana ISO 53, che compare nei dati inseriti dall'utente e non
+deve confondersi con la settimana 1 dell'anno dopo.
+"""
+import datetime
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+WEEKS_PER_YEAR = 52
+
+Week = Tuple[int, int]
+
+
+def to_serial(anno: int, settimana: int) -> int:
+    """Week serial of (anno, settimana); settimana may overflow or underflow the year."""
+    return anno * WEEKS_PER_YEAR + (settimana - 1)
+
+
+def from_serial(serial: int) -> Week:
+    """(anno, settimana) of a week serial, settimana in 1..52."""
+    anno, offset = divmod(serial, WEEKS_PER_YEAR)
+    return anno, offset + 1
+
+
+def normalize(anno: int, settimana: int) -> Week:
+    """Folds settimana into 1..52, moving the excess into anno."""
+    return from_serial(to_serial(anno, settimana))
+
+
+def to_serials(anni, settimane) -> np.ndarray:
+    """Vectorized to_serial (int64)."""
+    return np.asarray(anni, dtype=np.int64) * WEEKS_PER_YEAR + (np.asarray(settimane, dtype=np.int64) - 1)
+
+
+def from_serials(serials) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized from_serial: (anni, settimane) int64 arrays."""
+    anni, offsets = np.divmod(np.asarray(serials, dtype=np.int64), WEEKS_PER_YEAR)
+    return anni, offsets + 1
+
+
+def week_key(anno: int, settimana: int) -> int:
+    """Ordered integer dict key of (anno, settimana), distinct for ISO week 53."""
+    return anno * 100 + settimana
+
+
+def key_to_week(key: int) -> Week:
+    """(anno, settimana) of a week_key."""
+    return divmod(key, 100)
+
+
+def week_keys(anni, settimane) -> np.ndarray:
+    """Vectorized week_key (int64)."""
+    return np.asarray(anni, dtype=np.int64) * 100 + np.asarray(settimane, dtype=np.int64)
+
+
+def current_week() -> Week:
+    """ISO (anno, settimana) of today."""
+    anno, settimana, _ = datetime.date.today().isocalendar()
+    return anno, settimana
+
+
+@lru_cache(maxsize=64)
+def week_range(anno: int, settimana: int, count: int) -> Tuple[Week, ...]:
+    """
+    `count` consecutive weeks starting at (anno, settimana). The first week
+    is kept as given (an ISO week 53 stays 53) and is followed by week 1 of
+    the next year. Cached: the planning tables ask for the same windows.
+    """
+    if count <= 0:
+        return ()
+    start = to_serial(anno, min(settimana, WEEKS_PER_YEAR))
+    return ((anno, settimana),) + tuple(from_serial(start + i) for i in range(1, count))
+
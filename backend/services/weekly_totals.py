@@ -0,0 +1,135 @@
+"""
+Weekly Totals - Riepilogo G001 materializzato per prodotto e settimana
+
+La tabella weekly_product_totals tiene, per (prodotto, anno, settimana),
+solo i totali del riepilogo: produzione lorda e netta dei capannoni,
+righe manuali, acquisti, vendite, vendite non assegnate e totale netto.
+Chi legge soltanto totali fa una scansione su (prodotto, week_key)
+invece di costruire il riepilogo con tutte le liste di dettaglio.
+
+Aggiornamento: ogni commit che tocca lotti, trading, assegnazioni, righe
+manuali, curve o schede scrive nella stessa transazione le settimane da
+ricalcolare in weekly_totals_pending (database._mark_weekly_totals_pending,
+con le stesse settimane che services.generations registra per
+changed_weeks). Le scritture con settimane note (trading_data,
+vendita_assegnazione) segnano solo quelle; le altre, e quelle fatte fuori
+dalle sessioni ORM (mark_weekly_totals_stale), segnano "settimane ignote".
+Lo stesso fanno gli helper che scartano i blocchi di production_cache
+(invalidate_cache_by_lotto, delete_cache_by_lotto, ...): i router li
+chiamano dopo il commit, e un refresh avvenuto nel frattempo può aver
+scritto totali calcolati sui blocchi vecchi.
+Alla lettura successiva refresh() ricalcola il riepilogo sulla finestra
+delle settimane segnate e riscrive solo le loro righe cambiate o sparite;
+con una settimana ignota confronta tutto. Senza segnalazioni i lettori
+leggono direttamente la tabella, anche dopo un riavvio: le segnalazioni
+sono nel database, non in memoria.
+
+rebuild() la rigenera da zero (scripts/rebuild_weekly_totals.py).
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from database import (
+    get_known_products,
+    get_weekly_product_totals,
+    get_weekly_totals_pending,
+    get_weekly_totals_products,
+    write_weekly_product_totals,
+)
+from services import week_calendar
+from services.production_service import ProductionService
+
+TOTAL_COLUMNS = (
+    "produzione_lorda",
+    "produzione_netta",
+    "manuali",
+    "acquisti",
+    "vendite",
+    "vendite_non_assegnate",
+    "totale_netto",
+)
+
+_lock = threading.Lock()
+
+
+def get_weekly_totals(products: Optional[Iterable[str]] = None, from_week: Optional[tuple] = None,
+                      to_week: Optional[tuple] = None) -> List[Dict]:
+    """
+    Materialized totals, ordered by (prodotto, anno, settimana), optionally
+    limited to `products` and the from_week..to_week window ((anno,
+    settimana), inclusive). The table is brought up to date first. Raises
+    ValueError for products that have no lotti, trading or manual rows.
+    """
+    if products is not None:
+        products = list(products)
+        unknown = sorted(set(products) - set(get_known_products()))
+        if unknown:
+            raise ValueError(f"Prodotti sconosciuti: {', '.join(unknown)}")
+    refresh()
+    return get_weekly_product_totals(products, from_week, to_week)
+
+
+def refresh(full: bool = False) -> Dict:
+    """
+    Applies the pending refreshes of weekly_totals_pending: only the
+    (prodotto, week) rows of the recorded weeks when they are all known,
+    every row when one of them is unknown. With `full` the table is
+    emptied and regenerated. Returns {"written", "deleted"}.
+    """
+    with _lock:
+        pending = get_weekly_totals_pending()
+        if not pending and not full:
+            return {"written": 0, "deleted": 0}
+        pending_upto = pending[-1][0] if pending else None
+        keys = {week_key for _, week_key in pending}
+        products = get_known_products()
+
+        # (products, from_week, to_week, week keys to rewrite or None for all)
+        jobs = []
+        if full or None in keys:
+            jobs.append((products, None, None, None))
+            stored_rows = [] if full else get_weekly_product_totals()
+        else:
+            # Products new to the table get all their weeks (manual rows
+            # apply to every product); vanished ones lose all of theirs
+            stored_products = set(get_weekly_totals_products())
+            added = [p for p in products if p not in stored_products]
+            removed = sorted(stored_products.difference(products))
+            window = (week_calendar.key_to_week(min(keys)), week_calendar.key_to_week(max(keys)))
+            jobs.append(([p for p in products if p in stored_products], *window, keys))
+            jobs.append((added, None, None, None))
+            stored_rows = [r for r in get_weekly_product_totals(None, *window) if r["week_key"] in keys]
+            if removed:
+                stored_rows += get_weekly_product_totals(removed)
+        stored = {(r["prodotto"], r["week_key"]): tuple(r[c] for c in TOTAL_COLUMNS) for r in stored_rows}
+
+        fresh, rows = {}, {}
+        for job_products, from_week, to_week, job_keys in jobs:
+            if not job_products:
+                continue
+            summaries = ProductionService.calculate_weekly_summaries(job_products, from_week, to_week)
+            for product, summary in summaries.items():
+                for summary_row in summary:
+                    key = (product, week_calendar.week_key(summary_row["anno"], summary_row["settimana"]))
+                    if job_keys is not None and key[1] not in job_keys:
+                        continue
+                    totals = ProductionService.summary_row_totals(summary_row)
+                    fresh[key] = tuple(totals[c] for c in TOTAL_COLUMNS)
+                    rows[key] = {
+                        "prodotto": product,
+                        "anno": summary_row["anno"],
+                        "settimana": summary_row["settimana"],
+                        "week_key": key[1],
+                        **totals,
+                    }
+
+        upserts = [rows[k] for k, v in fresh.items() if stored.get(k) != v]
+        deletes = [k for k in stored if k not in fresh]
+        write_weekly_product_totals(upserts, deletes, replace_all=full, pending_upto=pending_upto)
+        return {"written": len(upserts), "deleted": len(deletes)}
+
+
+def rebuild() -> Dict:
+    """Regenerates weekly_product_totals from scratch."""
+    return refresh(full=True)
+
@@ -27,9 +27,9 @@ def formatta_numero(n):
 # Fixing imports for backend structure
 # If running mainly from main.py, database will be in the path
 try:
-    from database import init_db, get_lotti, add_lotto, engine, init_trading_db_tables, init_default_trading_config, migrate_gallo_data
+    from database import init_db, get_lotti, add_lotto, engine, init_trading_db_tables, init_default_trading_config, migrate_gallo_data, mark_weekly_totals_stale
 except ImportError:
-    from backend.database import init_db, get_lotti, add_lotto, engine, init_trading_db_tables, init_default_trading_config, migrate_gallo_data
+    from backend.database import init_db, get_lotti, add_lotto, engine, init_trading_db_tables, init_default_trading_config, migrate_gallo_data, mark_weekly_totals_stale
     
 import sqlalchemy
 
@@ -107,6 +107,9 @@ def migrate_t003_extend_to_w75():
         df_extended = pd.concat([df, new_df], ignore_index=True)
         df_extended.to_sql("standard_curves", conn, if_exists='replace', index=False)
         conn.commit()
+        from services.curve_store import invalidate_curves
+        invalidate_curves()
+        mark_weekly_totals_stale()
         print(f"T003 migration: extended standard_curves from W{int(current_max)} to W{TARGET_MAX_W}.")
         # Also bump cycle_settings.eta_fine_ciclo if it's still at the old default (<=64)
         try:
@@ -114,6 +117,10 @@ def migrate_t003_extend_to_w75():
             if settings_row and settings_row[1] <= 64:
                 conn.execute("UPDATE cycle_settings SET eta_fine_ciclo = ? WHERE id = ?", (TARGET_MAX_W, settings_row[0]))
                 conn.commit()
+                # Raw sqlite3 write: the session listeners do not see it
+                from services import generations
+                generations.bump("cycle_settings")
+                mark_weekly_totals_stale()
                 print(f"T003 migration: updated cycle_settings.eta_fine_ciclo to {TARGET_MAX_W}.")
         except Exception as ce:
             print(f"T003 migration: could not update cycle_settings: {ce}")
@@ -393,8 +393,11 @@ export default function IncubationTable() {
                 method: "POST"
             });
             if (response.ok) {
+                const data = await response.json();
                 await fetchIncubations();
-                await fetchEggStorage();
+                // The commit returns the updated storage: no refetch needed
+                if (Array.isArray(data.storage)) setEggStorage(data.storage);
+                else await fetchEggStorage();
                 alert("Incubazione salvata! Il magazzino è stato aggiornato.");
             } else {
                 const data = await response.json();
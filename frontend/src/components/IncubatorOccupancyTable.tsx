@@ -7,7 +7,7 @@ import { useState, useEffect } from "react";
 import { API_BASE_URL } from "@/lib/config";
 
 const API_BASE = API_BASE_URL;
-const MAX_INCUBABILE = 387200;
+const DEFAULT_MAX_INCUBABILE = 387200;  // Until the backend reports the configured capacity
 
 const SETTINGS_KEY = "t017_settings";
 
@@ -60,6 +60,7 @@ export default function IncubatorOccupancyTable() {
     const [rows, setRows] = useState<PlanningRow[]>([]);
     const [conti, setConti] = useState<Conto[]>([]);
     const [loading, setLoading] = useState(true);
+    const [maxIncubabile, setMaxIncubabile] = useState<number>(DEFAULT_MAX_INCUBABILE);
     const [settings, setSettings] = useState<T017Settings>(loadSettings);
 
     // Settings modal
@@ -95,7 +96,7 @@ export default function IncubatorOccupancyTable() {
                 settimana_label: `${year}/${String(week).padStart(2, "0")}`,
                 granpollo: 0, pollo70: 0, coloryeald: 0, ross: 0,
                 conto_values: {}, zona_faraone: 0,
-                somma_incubato: 0, posti_restanti: MAX_INCUBABILE, occupazione: 0,
+                somma_incubato: 0, posti_restanti: maxIncubabile, occupazione: 0,
             });
             week++;
             if (week > 52) { week = 1; year++; }
@@ -110,6 +111,7 @@ export default function IncubatorOccupancyTable() {
             if (!res.ok) throw new Error(`HTTP ${res.status}`);
             const json = await res.json();
             setConti(json.conti || []);
+            if (typeof json.max_incubabile === "number") setMaxIncubabile(json.max_incubabile);
             setRows(json.rows?.length > 0 ? json.rows : generateFallbackRows(s.numWeeks));
         } catch (err) {
             console.error("Failed to load incubation planning data:", err);
@@ -444,13 +446,13 @@ export default function IncubatorOccupancyTable() {
                 <span>Doppio click su celle gialle/viola per modificare</span>
                 <span className="flex items-center gap-1">
                     <span className="w-3 h-3 rounded bg-pink-100 inline-block border border-pink-300" />
-                    Oltre capacità massima ({formatNumber(MAX_INCUBABILE)})
+                    Oltre capacità massima ({formatNumber(maxIncubabile)})
                 </span>
                 <span className="flex items-center gap-1">
                     <span className="w-3 h-3 rounded bg-yellow-100 inline-block border border-yellow-300" />
                     Polmone &lt; {formatNumber(settings.polmone)}
                 </span>
-                <span className="text-gray-400 ml-auto">{rows.length} settimane • Cap. max: {formatNumber(MAX_INCUBABILE)}</span>
+                <span className="text-gray-400 ml-auto">{rows.length} settimane • Cap. max: {formatNumber(maxIncubabile)}</span>
             </div>
         </div>
     );
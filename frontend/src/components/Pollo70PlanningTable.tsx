@@ -59,11 +59,23 @@ interface EditingCell {
     clientId: number;
 }
 
+interface PlanningTableData {
+    data: PlanningRow[];
+    clients: Client[];
+    has_vendite: boolean;
+    has_acquisti: boolean;
+}
+
 interface Pollo70PlanningTableProps {
     showTooltips?: boolean;
+    // Slice of /chick-planning/all loaded by PulciniPage (null while loading);
+    // without it the table loads /chick-planning/pollo70-extended itself
+    table?: PlanningTableData | null;
+    // Receives the table re-read after an edit, in place of local state
+    onTableChange?: (table: PlanningTableData) => void;
 }
 
-export default function Pollo70PlanningTable({ showTooltips = true }: Pollo70PlanningTableProps) {
+export default function Pollo70PlanningTable({ showTooltips = true, table, onTableChange }: Pollo70PlanningTableProps) {
     const [data, setData] = useState<PlanningRow[]>([]);
     const [clients, setClients] = useState<Client[]>([]);
     const [loading, setLoading] = useState(true);
@@ -86,10 +98,18 @@ export default function Pollo70PlanningTable({ showTooltips = true }: Pollo70Pla
     const [showSexSplit, setShowSexSplit] = useState(true);
 
     useEffect(() => {
-        fetchData();
         fetchSettings();
     }, []);
 
+    useEffect(() => {
+        if (table) {
+            applyTable(table);
+        } else if (table === undefined) {
+            fetchData();
+        }
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [table]);
+
     const fetchSettings = async () => {
         try {
             const res = await fetch(`${API_BASE}/api/settings/planning-table/T011`);
@@ -114,17 +134,25 @@ export default function Pollo70PlanningTable({ showTooltips = true }: Pollo70Pla
         }
     };
 
+    const applyTable = (json: PlanningTableData) => {
+        setData(json.data || []);
+        setClients(json.clients || []);
+        setHasVendite(json.has_vendite || false);
+        setHasAcquisti(json.has_acquisti || false);
+        setLoading(false);
+    };
+
     const fetchData = async () => {
         try {
             const res = await fetch(`${API_BASE}/api/chick-planning/pollo70-extended`);
             const json = await res.json();
-            setData(json.data || []);
-            setClients(json.clients || []);
-            setHasVendite(json.has_vendite || false);
-            setHasAcquisti(json.has_acquisti || false);
+            if (onTableChange) {
+                onTableChange(json);
+            } else {
+                applyTable(json);
+            }
         } catch (err) {
             console.error("Failed to load planning data:", err);
-        } finally {
             setLoading(false);
         }
     };
@@ -18,11 +18,11 @@ import { Badge } from "@/components/ui/badge";
 import { Card, CardContent } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { API_BASE_URL } from "@/lib/config";
-import { ManualAdjustmentsAPI } from "@/lib/api";
-import type { WeeklySummary, SaleDetail, ManualAdjustment } from "@/types";
+import { ManualAdjustmentsAPI, ProductionAPI } from "@/lib/api";
+import type { WeeklySummary, WeeklySummaryTotals, SaleDetail, ManualAdjustment } from "@/types";
 
 interface WeeklySummaryTableProps {
-    data: WeeklySummary[];
+    data: WeeklySummaryTotals[];  // listing rows; a week's details are loaded when opened
     includeTradingData?: boolean; // Control whether to show trading data
     productFilter?: string;       // current product filter (per-product manual rows)
     onUpdate?: () => void;        // refresh parent (chart + table) after assigning a sale
@@ -349,9 +349,35 @@ function ManualRowsEditor({ week, productFilter, onUpdate }: ManualRowsEditorPro
 
 export function WeeklySummaryTable({ data, includeTradingData = true, productFilter, onUpdate }: WeeklySummaryTableProps) {
     const [expandedRow, setExpandedRow] = useState<string | null>(null);
+    // periodo -> week with its dettagli_* lists (/production/summary/{anno}/{settimana})
+    const [details, setDetails] = useState<Record<string, WeeklySummary>>({});
 
-    const toggleRow = (periodo: string) => {
-        setExpandedRow(expandedRow === periodo ? null : periodo);
+    const loadDetails = async (row: WeeklySummaryTotals, force = false) => {
+        if (!force && details[row.periodo]) return;
+        try {
+            const week = await ProductionAPI.getSummaryWeek(row.anno, row.settimana, productFilter);
+            setDetails(d => ({ ...d, [row.periodo]: week }));
+        } catch (error) {
+            console.error("Failed to fetch week details", error);
+        }
+    };
+
+    // New listing (e.g. after a mutation): drop the loaded details and
+    // re-read the open row
+    useEffect(() => {
+        setDetails({});
+        const open = data.find(r => r.periodo === expandedRow);
+        if (open) loadDetails(open, true);
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [data]);
+
+    const toggleRow = (row: WeeklySummaryTotals) => {
+        if (expandedRow === row.periodo) {
+            setExpandedRow(null);
+        } else {
+            setExpandedRow(row.periodo);
+            loadDetails(row);
+        }
     };
 
     const fmt = (n: number) => new Intl.NumberFormat("it-IT").format(n);
@@ -371,167 +397,180 @@ export function WeeklySummaryTable({ data, includeTradingData = true, productFil
                     </TableRow>
                 </TableHeader>
                 <TableBody>
-                    {data.map((row) => (
-                        <Fragment key={row.periodo}>
-                            <TableRow
-                                className="cursor-pointer hover:bg-muted/50 transition-colors"
-                                onClick={() => toggleRow(row.periodo)}
-                                data-state={expandedRow === row.periodo ? "selected" : undefined}
-                            >
-                                <TableCell>
-                                    {expandedRow === row.periodo ? (
-                                        <ChevronDown className="h-4 w-4 text-muted-foreground" />
-                                    ) : (
-                                        <ChevronRight className="h-4 w-4 text-muted-foreground" />
-                                    )}
-                                </TableCell>
-                                <TableCell className="font-medium">{row.periodo}</TableCell>
-                                <TableCell className="text-right">
-                                    {row.produzione_totale > 0 ? (
-                                        <Badge variant="secondary" className="font-mono text-green-700 bg-green-50 hover:bg-green-100 border-green-200">
-                                            {fmt(row.produzione_totale)}
-                                        </Badge>
-                                    ) : "-"}
-                                </TableCell>
-                                {includeTradingData && (
+                    {data.map((row) => {
+                        const week = details[row.periodo];
+                        return (
+                            <Fragment key={row.periodo}>
+                                <TableRow
+                                    className="cursor-pointer hover:bg-muted/50 transition-colors"
+                                    onClick={() => toggleRow(row)}
+                                    data-state={expandedRow === row.periodo ? "selected" : undefined}
+                                >
+                                    <TableCell>
+                                        {expandedRow === row.periodo ? (
+                                            <ChevronDown className="h-4 w-4 text-muted-foreground" />
+                                        ) : (
+                                            <ChevronRight className="h-4 w-4 text-muted-foreground" />
+                                        )}
+                                    </TableCell>
+                                    <TableCell className="font-medium">{row.periodo}</TableCell>
                                     <TableCell className="text-right">
-                                        {row.acquisti_totale > 0 ? (
-                                            <TooltipProvider>
-                                                <Tooltip>
-                                                    <TooltipTrigger asChild>
-                                                        <span className="font-mono text-blue-600 cursor-help border-b border-dashed border-blue-400">
-                                                            {fmt(row.acquisti_totale)}
-                                                        </span>
-                                                    </TooltipTrigger>
-                                                    <TooltipContent side="left" className="max-w-xs">
-                                                        <div className="space-y-1">
-                                                            <p className="font-semibold text-xs mb-2">Dettaglio Acquisti:</p>
-                                                            {row.dettagli_acquisti.map((d, i) => (
-                                                                <p key={i} className="text-xs">
-                                                                    {d.azienda} - {fmt(d.quantita)}
-                                                                </p>
-                                                            ))}
-                                                        </div>
-                                                    </TooltipContent>
-                                                </Tooltip>
-                                            </TooltipProvider>
+                                        {row.produzione_totale > 0 ? (
+                                            <Badge variant="secondary" className="font-mono text-green-700 bg-green-50 hover:bg-green-100 border-green-200">
+                                                {fmt(row.produzione_totale)}
+                                            </Badge>
                                         ) : "-"}
                                     </TableCell>
-                                )}
-                                {includeTradingData && (
-                                    <TableCell className="text-right text-muted-foreground">
-                                        {row.vendite_totale > 0 ? fmt(row.vendite_totale) : "-"}
+                                    {includeTradingData && (
+                                        <TableCell className="text-right">
+                                            {row.acquisti_totale > 0 ? (
+                                                <TooltipProvider>
+                                                    <Tooltip onOpenChange={(open) => open && loadDetails(row)}>
+                                                        <TooltipTrigger asChild>
+                                                            <span className="font-mono text-blue-600 cursor-help border-b border-dashed border-blue-400">
+                                                                {fmt(row.acquisti_totale)}
+                                                            </span>
+                                                        </TooltipTrigger>
+                                                        <TooltipContent side="left" className="max-w-xs">
+                                                            <div className="space-y-1">
+                                                                <p className="font-semibold text-xs mb-2">Dettaglio Acquisti:</p>
+                                                                {week ? week.dettagli_acquisti.map((d, i) => (
+                                                                    <p key={i} className="text-xs">
+                                                                        {d.azienda} - {fmt(d.quantita)}
+                                                                    </p>
+                                                                )) : (
+                                                                    <p className="text-xs italic">Caricamento...</p>
+                                                                )}
+                                                            </div>
+                                                        </TooltipContent>
+                                                    </Tooltip>
+                                                </TooltipProvider>
+                                            ) : "-"}
+                                        </TableCell>
+                                    )}
+                                    {includeTradingData && (
+                                        <TableCell className="text-right text-muted-foreground">
+                                            {row.vendite_totale > 0 ? fmt(row.vendite_totale) : "-"}
+                                        </TableCell>
+                                    )}
+                                    <TableCell className="text-right font-bold text-lg">
+                                        {fmt(includeTradingData ? row.totale_netto : row.produzione_totale)}
                                     </TableCell>
+                                </TableRow>
+
+                                {expandedRow === row.periodo && !week && (
+                                    <TableRow className="bg-muted/30 hover:bg-muted/30">
+                                        <TableCell colSpan={includeTradingData ? 6 : 4} className="p-4 text-sm text-muted-foreground italic">
+                                            Caricamento dettagli...
+                                        </TableCell>
+                                    </TableRow>
                                 )}
-                                <TableCell className="text-right font-bold text-lg">
-                                    {fmt(includeTradingData ? row.totale_netto : row.produzione_totale)}
-                                </TableCell>
-                            </TableRow>
-
-                            {expandedRow === row.periodo && (
-                                <TableRow className="bg-muted/30 hover:bg-muted/30">
-                                    <TableCell colSpan={includeTradingData ? 6 : 4} className="p-4">
-                                        <div className={`grid grid-cols-1 ${includeTradingData ? 'md:grid-cols-2 lg:grid-cols-3' : ''} gap-6 animate-in slide-in-from-top-2 duration-200`}>
-
-                                            {/* PRODUCTION DETAILS - always visible */}
-                                            <Card className="shadow-sm border-l-4 border-l-green-500">
-                                                <CardContent className="pt-6">
-                                                    <div className="flex items-center gap-2 mb-4">
-                                                        <Egg className="w-5 h-5 text-green-600" />
-                                                        <h3 className="font-semibold text-lg">Dettaglio Produzione</h3>
-                                                    </div>
-
-                                                    {row.dettagli_produzione.length > 0 ? (
-                                                        <div className="space-y-3">
-                                                            {row.dettagli_produzione.map((d, i) => (
-                                                                <div key={i} className="flex justify-between items-center text-sm border-b border-dashed pb-2 last:border-0 last:pb-0">
-                                                                    <div>
-                                                                        <span className="font-medium text-foreground">{d.allevamento}</span>
-                                                                        <div className="text-xs text-muted-foreground">Età: {d.eta} settimane</div>
-                                                                        {(d.razza || d.razza_gallo) && (
-                                                                            <div className="text-xs text-muted-foreground">
-                                                                                {d.razza && <span>Gallina: {d.razza}</span>}
-                                                                                {d.razza && d.razza_gallo && <span className="mx-1">·</span>}
-                                                                                {d.razza_gallo && <span>Gallo: {d.razza_gallo}</span>}
-                                                                            </div>
-                                                                        )}
-                                                                    </div>
-                                                                    <div className="font-mono font-bold text-green-700">
-                                                                        {fmt(d.quantita)}
-                                                                    </div>
-                                                                </div>
-                                                            ))}
-                                                        </div>
-                                                    ) : (
-                                                        <p className="text-sm text-muted-foreground italic">Nessuna produzione attiva</p>
-                                                    )}
-                                                </CardContent>
-                                            </Card>
-
-                                            {/* PURCHASE DETAILS - only when trading data enabled and there are purchases */}
-                                            {includeTradingData && row.dettagli_acquisti.length > 0 && (
-                                                <Card className="shadow-sm border-l-4 border-l-blue-500">
-                                                    <CardContent className="pt-6">
-                                                        <div className="flex items-center gap-2 mb-4">
-                                                            <ShoppingCart className="w-5 h-5 text-blue-600" />
-                                                            <h3 className="font-semibold text-lg">Dettaglio Acquisti</h3>
-                                                        </div>
 
-                                                        <div className="space-y-3">
-                                                            {row.dettagli_acquisti.map((d, i) => (
-                                                                <div key={i} className="flex justify-between items-center text-sm border-b border-dashed pb-2 last:border-0 last:pb-0">
-                                                                    <span className="font-medium text-foreground">{d.azienda}</span>
-                                                                    <div className="font-mono font-bold text-blue-600">
-                                                                        {fmt(d.quantita)}
-                                                                    </div>
-                                                                </div>
-                                                            ))}
-                                                        </div>
-                                                    </CardContent>
-                                                </Card>
-                                            )}
+                                {expandedRow === row.periodo && week && (
+                                    <TableRow className="bg-muted/30 hover:bg-muted/30">
+                                        <TableCell colSpan={includeTradingData ? 6 : 4} className="p-4">
+                                            <div className={`grid grid-cols-1 ${includeTradingData ? 'md:grid-cols-2 lg:grid-cols-3' : ''} gap-6 animate-in slide-in-from-top-2 duration-200`}>
 
-                                            {/* SALE DETAILS - always visible when trading data enabled (so manual rows can be added) */}
-                                            {includeTradingData && (
-                                                <Card className="shadow-sm border-l-4 border-l-orange-500">
+                                                {/* PRODUCTION DETAILS - always visible */}
+                                                <Card className="shadow-sm border-l-4 border-l-green-500">
                                                     <CardContent className="pt-6">
                                                         <div className="flex items-center gap-2 mb-4">
-                                                            <TrendingDown className="w-5 h-5 text-orange-600" />
-                                                            <h3 className="font-semibold text-lg">Dettaglio Vendite</h3>
+                                                            <Egg className="w-5 h-5 text-green-600" />
+                                                            <h3 className="font-semibold text-lg">Dettaglio Produzione</h3>
                                                         </div>
 
-                                                        {row.dettagli_vendite.length > 0 ? (
-                                                            <div className="space-y-5">
-                                                                {row.dettagli_vendite.map((d, i) => (
-                                                                    <div key={d.vendita_id ?? i} className="text-sm border-b border-dashed pb-3 last:border-0 last:pb-0">
-                                                                        <div className="flex justify-between items-center">
-                                                                            <span className="font-medium text-foreground">
-                                                                                {d.azienda}
-                                                                                {d.prodotto && <span className="text-muted-foreground ml-2 text-xs">({d.prodotto})</span>}
-                                                                            </span>
-                                                                            <div className="font-mono font-bold text-orange-600">
-                                                                                {fmt(d.quantita)}
-                                                                            </div>
+                                                        {week.dettagli_produzione.length > 0 ? (
+                                                            <div className="space-y-3">
+                                                                {week.dettagli_produzione.map((d, i) => (
+                                                                    <div key={i} className="flex justify-between items-center text-sm border-b border-dashed pb-2 last:border-0 last:pb-0">
+                                                                        <div>
+                                                                            <span className="font-medium text-foreground">{d.allevamento}</span>
+                                                                            <div className="text-xs text-muted-foreground">Età: {d.eta} settimane</div>
+                                                                            {(d.razza || d.razza_gallo) && (
+                                                                                <div className="text-xs text-muted-foreground">
+                                                                                    {d.razza && <span>Gallina: {d.razza}</span>}
+                                                                                    {d.razza && d.razza_gallo && <span className="mx-1">·</span>}
+                                                                                    {d.razza_gallo && <span>Gallo: {d.razza_gallo}</span>}
+                                                                                </div>
+                                                                            )}
+                                                                        </div>
+                                                                        <div className="font-mono font-bold text-green-700">
+                                                                            {fmt(d.quantita)}
                                                                         </div>
-                                                                        <SaleAllocationEditor sale={d} week={row} onSaved={onUpdate} />
                                                                     </div>
                                                                 ))}
                                                             </div>
                                                         ) : (
-                                                            <p className="text-sm text-muted-foreground italic">Nessuna vendita registrata.</p>
+                                                            <p className="text-sm text-muted-foreground italic">Nessuna produzione attiva</p>
                                                         )}
-
-                                                        <ManualRowsEditor week={row} productFilter={productFilter} onUpdate={onUpdate} />
                                                     </CardContent>
                                                 </Card>
-                                            )}
 
-                                        </div>
-                                    </TableCell>
-                                </TableRow>
-                            )}
-                        </Fragment>
-                    ))}
+                                                {/* PURCHASE DETAILS - only when trading data enabled and there are purchases */}
+                                                {includeTradingData && week.dettagli_acquisti.length > 0 && (
+                                                    <Card className="shadow-sm border-l-4 border-l-blue-500">
+                                                        <CardContent className="pt-6">
+                                                            <div className="flex items-center gap-2 mb-4">
+                                                                <ShoppingCart className="w-5 h-5 text-blue-600" />
+                                                                <h3 className="font-semibold text-lg">Dettaglio Acquisti</h3>
+                                                            </div>
+
+                                                            <div className="space-y-3">
+                                                                {week.dettagli_acquisti.map((d, i) => (
+                                                                    <div key={i} className="flex justify-between items-center text-sm border-b border-dashed pb-2 last:border-0 last:pb-0">
+                                                                        <span className="font-medium text-foreground">{d.azienda}</span>
+                                                                        <div className="font-mono font-bold text-blue-600">
+                                                                            {fmt(d.quantita)}
+                                                                        </div>
+                                                                    </div>
+                                                                ))}
+                                                            </div>
+                                                        </CardContent>
+                                                    </Card>
+                                                )}
+
+                                                {/* SALE DETAILS - always visible when trading data enabled (so manual rows can be added) */}
+                                                {includeTradingData && (
+                                                    <Card className="shadow-sm border-l-4 border-l-orange-500">
+                                                        <CardContent className="pt-6">
+                                                            <div className="flex items-center gap-2 mb-4">
+                                                                <TrendingDown className="w-5 h-5 text-orange-600" />
+                                                                <h3 className="font-semibold text-lg">Dettaglio Vendite</h3>
+                                                            </div>
+
+                                                            {week.dettagli_vendite.length > 0 ? (
+                                                                <div className="space-y-5">
+                                                                    {week.dettagli_vendite.map((d, i) => (
+                                                                        <div key={d.vendita_id ?? i} className="text-sm border-b border-dashed pb-3 last:border-0 last:pb-0">
+                                                                            <div className="flex justify-between items-center">
+                                                                                <span className="font-medium text-foreground">
+                                                                                    {d.azienda}
+                                                                                    {d.prodotto && <span className="text-muted-foreground ml-2 text-xs">({d.prodotto})</span>}
+                                                                                </span>
+                                                                                <div className="font-mono font-bold text-orange-600">
+                                                                                    {fmt(d.quantita)}
+                                                                                </div>
+                                                                            </div>
+                                                                            <SaleAllocationEditor sale={d} week={week} onSaved={onUpdate} />
+                                                                        </div>
+                                                                    ))}
+                                                                </div>
+                                                            ) : (
+                                                                <p className="text-sm text-muted-foreground italic">Nessuna vendita registrata.</p>
+                                                            )}
+
+                                                            <ManualRowsEditor week={week} productFilter={productFilter} onUpdate={onUpdate} />
+                                                        </CardContent>
+                                                    </Card>
+                                                )}
+
+                                            </div>
+                                        </TableCell>
+                                    </TableRow>
+                                )}
+                            </Fragment>
+                        );
+                    })}
                 </TableBody>
             </Table>
         </div>
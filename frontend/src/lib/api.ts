@@ -12,11 +12,44 @@ export const api = axios.create({
 
 // Production Service Wrapper
 export const ProductionAPI = {
-    getWeeklySummary: async (productFilter?: string) => {
-        const params = productFilter ? { product: productFilter } : {};
+    // fromWeek / toWeek: "YYYY-WW", inclusive window computed server-side
+    // detail: "none" | "totals" drop the dettagli_* lists (see getSummaryWeek)
+    getWeeklySummary: async (productFilter?: string, fromWeek?: string, toWeek?: string,
+                             detail?: "none" | "totals" | "full") => {
+        const params: Record<string, string> = {};
+        if (productFilter) params.product = productFilter;
+        if (fromWeek) params.from_week = fromWeek;
+        if (toWeek) params.to_week = toWeek;
+        if (detail) params.detail = detail;
         const res = await api.get("/production/summary", { params });
         return res.data;
     },
+    // One week with all detail lists, for tooltips / expanded rows
+    getSummaryWeek: async (anno: number, settimana: number, productFilter?: string) => {
+        const params: Record<string, string> = {};
+        if (productFilter) params.product = productFilter;
+        const res = await api.get(`/production/summary/${anno}/${settimana}`, { params });
+        return res.data;
+    },
+    // Per-product weekly totals only (materialized server-side), no detail lists
+    getWeeklyTotals: async (products?: string[], fromWeek?: string, toWeek?: string) => {
+        const params: Record<string, string> = {};
+        if (products && products.length) params.products = products.join(",");
+        if (fromWeek) params.from_week = fromWeek;
+        if (toWeek) params.to_week = toWeek;
+        const res = await api.get("/production/weekly-totals", { params });
+        return res.data;
+    },
+    // What-if lotto plans: nothing is saved, see POST /production/scenarios
+    evaluateScenarios: async (scenarios: any[], products?: string[], fromWeek?: string, toWeek?: string) => {
+        const res = await api.post("/production/scenarios", {
+            scenarios,
+            products,
+            from_week: fromWeek,
+            to_week: toWeek,
+        });
+        return res.data;
+    },
 };
 
 // Production Tables Service Wrapper
@@ -254,3 +287,28 @@ export const ManualAdjustmentsAPI = {
     },
 };
 
+
+// Chick Planning (T010-T013) Service Wrapper
+export const ChickPlanningAPI = {
+    // The four *-extended tables at once: { granpollo, pollo70, colorYeald, ross }
+    getAllExtended: async () => {
+        const res = await api.get("/chick-planning/all");
+        return res.data;
+    },
+    // Many client cells of a *-extended table in one request; returns the recomputed table
+    bulkUpdateClientData: async (
+        product: string,
+        cells: { anno: number; settimana: number; cliente_id: number; quantita: number }[]
+    ) => {
+        const res = await api.put(`/chick-planning/${product}/client-data/bulk`, { cells });
+        return res.data;
+    },
+    // Many richiesta_guidi / altri_clienti cells in one request; returns the recomputed table
+    bulkUpdatePlanning: async (
+        product: string,
+        cells: { anno: number; settimana: number; field: "richiesta_guidi" | "altri_clienti"; quantita: number }[]
+    ) => {
+        const res = await api.put(`/chick-planning/${product}/bulk`, { cells });
+        return res.data;
+    },
+};
@@ -2,7 +2,7 @@ import { useEffect, useState, useMemo } from "react";
 import { GiNestEggs } from "react-icons/gi";
 import { ProductionAPI, ProductionTablesAPI } from "@/lib/api";
 import { AllevamentiAPI } from "@/lib/api";
-import type { WeeklySummary, Lotto } from "@/types";
+import type { WeeklySummary, WeeklySummaryTotals, Lotto } from "@/types";
 import ProductionChart from "@/components/ProductionChart";
 import EggsChart from "@/components/EggsChart";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
@@ -35,7 +35,7 @@ type Section = "produzioni_totali" | "acquisti_vendite" | "tabelle_produzioni";
 
 export default function ProductionPage({ onNavigate }: ProductionPageProps) {
     const [section, setSection] = useState<Section>("produzioni_totali");
-    const [data, setData] = useState<WeeklySummary[]>([]);
+    const [data, setData] = useState<WeeklySummaryTotals[]>([]);
     const [productionTablesData, setProductionTablesData] = useState<any[]>([]);
     const [productionTablesColumns, setProductionTablesColumns] = useState<string[]>([]);
     const [lotti, setLotti] = useState<Lotto[]>([]);
@@ -46,7 +46,8 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
     const [includeTradingData, setIncludeTradingData] = useState<boolean>(true); // Checkbox for trading data
     const [tradingDataAcquisti, setTradingDataAcquisti] = useState<any>(null); // Trading purchases data
     const [tradingDataVendite, setTradingDataVendite] = useState<any>(null); // Trading sales data
-    const [productData, setProductData] = useState<WeeklySummary[]>([]); // Product-specific data for table
+    const [productData, setProductData] = useState<WeeklySummaryTotals[]>([]); // Product-specific data for table
+    const [shedData, setShedData] = useState<WeeklySummary[]>([]); // Per-shed details of the chart period
     const [postiUovoIncubatoio, setPostiUovoIncubatoio] = useState<number>(387200);
 
     // Editing states for Tabelle Produzioni
@@ -132,7 +133,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
     const refreshAllData = async () => {
         try {
             const [result, lottiData, tablesResult, tradingAcquisti, tradingVendite] = await Promise.all([
-                ProductionAPI.getWeeklySummary(),
+                ProductionAPI.getWeeklySummary(undefined, undefined, undefined, "totals"),
                 AllevamentiAPI.getLotti(),
                 ProductionTablesAPI.getProductionTables(),
                 fetch(`${API_BASE_URL}/api/trading/data/acquisto`).then(r => r.json()),
@@ -165,9 +166,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
             return;
         }
         try {
-            const result = await fetch(`${API_BASE_URL}/api/production/summary?product=${encodeURIComponent(chartProductFilter)}`);
-            const json = await result.json();
-            setProductData(json);
+            setProductData(await ProductionAPI.getWeeklySummary(chartProductFilter, undefined, undefined, "totals"));
         } catch (error) {
             console.error("Failed to fetch product data", error);
             setProductData([]);
@@ -180,6 +179,31 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [chartProductFilter]);
 
+    // The per-shed chart needs the production details: only for the chart
+    // period, re-read whenever the summary listing is refreshed
+    useEffect(() => {
+        if (chartProductFilter === 'all') {
+            setShedData([]);
+            return;
+        }
+        const toApiWeek = (periodo: string) => periodo ? periodo.replace(" - ", "-") : undefined;
+        ProductionAPI.getWeeklySummary(undefined, toApiWeek(startPeriod), toApiWeek(effectiveEndPeriod), "full")
+            .then(setShedData)
+            .catch(error => {
+                console.error("Failed to fetch shed data", error);
+                setShedData([]);
+            });
+    }, [chartProductFilter, startPeriod, effectiveEndPeriod, data]);
+
+    // T002 rows of the selected period
+    const productTableData = useMemo(() => productData.filter(week => {
+        if (week.settimana === 53) return false;
+        const periodo = `${week.anno} - ${String(week.settimana).padStart(2, '0')}`;
+        if (startPeriod && periodo < startPeriod) return false;
+        if (effectiveEndPeriod && periodo > effectiveEndPeriod) return false;
+        return true;
+    }), [productData, startPeriod, effectiveEndPeriod]);
+
     // After mutations (e.g. saving vendita assegnazioni) we want both the global
     // summary (chart) and the per-product summary (table T002) refreshed.
     const refreshAfterMutation = async () => {
@@ -214,10 +238,9 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
                 const weekData = weeklyByProduct.get(periodo)!;
 
                 // Sum production by product
-                week.dettagli_produzione.forEach(detail => {
-                    const product = detail.prodotto;
+                Object.entries(week.produzione_per_prodotto).forEach(([product, quantita]) => {
                     if (product && product in weekData) {
-                        weekData[product] += detail.quantita;
+                        weekData[product] += quantita;
                     }
                 });
             });
@@ -284,7 +307,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
 
             // First pass: collect all shed keys for this product
             const allShedKeys = new Set<string>();
-            data.forEach(week => {
+            shedData.forEach(week => {
                 week.dettagli_produzione.forEach(detail => {
                     if (detail.prodotto === chartProductFilter) {
                         allShedKeys.add(`${chartProductFilter}_${detail.allevamento}`);
@@ -292,7 +315,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
                 });
             });
 
-            data.forEach(week => {
+            shedData.forEach(week => {
                 // Filter out week 53
                 if (week.settimana === 53) return;
 
@@ -361,7 +384,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
                 }))
                 .sort((a, b) => a.periodo.localeCompare(b.periodo));
         }
-    }, [data, chartProductFilter, startPeriod, effectiveEndPeriod, includeTradingData, tradingDataAcquisti, tradingDataVendite]);
+    }, [data, shedData, chartProductFilter, startPeriod, effectiveEndPeriod, includeTradingData, tradingDataAcquisti, tradingDataVendite]);
     return (
         <div className="min-h-screen bg-gradient-to-br from-gray-50 to-gray-100 flex">
             {/* SIDEBAR */}
@@ -560,13 +583,7 @@ export default function ProductionPage({ onNavigate }: ProductionPageProps) {
                                     <div>
                                         <h3 className="text-lg font-semibold text-gray-700 mb-4">Riepilogo Settimanale - {chartProductFilter}</h3>
                                         <WeeklySummaryTable
-                                            data={productData.filter(week => {
-                                                if (week.settimana === 53) return false;
-                                                const periodo = `${week.anno} - ${String(week.settimana).padStart(2, '0')}`;
-                                                if (startPeriod && periodo < startPeriod) return false;
-                                                if (effectiveEndPeriod && periodo > effectiveEndPeriod) return false;
-                                                return true;
-                                            })}
+                                            data={productTableData}
                                             includeTradingData={includeTradingData}
                                             productFilter={chartProductFilter}
                                             onUpdate={refreshAfterMutation}
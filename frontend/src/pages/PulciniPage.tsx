@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Table2 } from "lucide-react";
 import { GiChicken, GiFactory } from "react-icons/gi";
 import BirthRatesTable from "@/components/BirthRatesTable";
@@ -9,6 +9,7 @@ import ColorYealdPlanningTable from "@/components/ColorYealdPlanningTable";
 import RossPlanningTable from "@/components/RossPlanningTable";
 import ResponsiveSidebar from "@/components/ResponsiveSidebar";
 import IncubatorOccupancyTable from "@/components/IncubatorOccupancyTable";
+import { ChickPlanningAPI } from "@/lib/api";
 
 interface PulciniPageProps {
     onNavigate: (page: string) => void;
@@ -27,6 +28,25 @@ type Section = "granpollo" | "pollo70" | "colorYeald" | "ross" | "tabelleNascita
 export default function PulciniPage({ onNavigate }: PulciniPageProps) {
     const [section, setSection] = useState<Section>("granpollo");
     const [showTooltips, setShowTooltips] = useState(true);
+    // The four T010-T013 tables from one /chick-planning/all request, keyed
+    // by product; null while loading, {} if it failed (each table loads its own)
+    const [planning, setPlanning] = useState<Record<string, any> | null>(null);
+
+    useEffect(() => {
+        ChickPlanningAPI.getAllExtended()
+            .then(setPlanning)
+            .catch(err => {
+                console.error("Failed to load planning tables:", err);
+                setPlanning({});
+            });
+    }, []);
+
+    const planningProps = (product: string) => ({
+        showTooltips,
+        table: planning === null ? null : planning[product],
+        onTableChange: (table: any) => setPlanning(current => ({ ...current, [product]: table })),
+    });
+
     const renderContent = () => {
         if (section === "tabelleNascita") {
             return (
@@ -42,19 +62,19 @@ export default function PulciniPage({ onNavigate }: PulciniPageProps) {
         }
 
         if (section === "granpollo") {
-            return <GranpolloPlanningTable showTooltips={showTooltips} />;
+            return <GranpolloPlanningTable {...planningProps("granpollo")} />;
         }
 
         if (section === "pollo70") {
-            return <Pollo70PlanningTable showTooltips={showTooltips} />;
+            return <Pollo70PlanningTable {...planningProps("pollo70")} />;
         }
 
         if (section === "colorYeald") {
-            return <ColorYealdPlanningTable showTooltips={showTooltips} />;
+            return <ColorYealdPlanningTable {...planningProps("colorYeald")} />;
         }
 
         if (section === "ross") {
-            return <RossPlanningTable showTooltips={showTooltips} />;
+            return <RossPlanningTable {...planningProps("ross")} />;
         }
 
         const product = PRODUCTS.find(p => p.id === section);
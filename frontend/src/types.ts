@@ -49,6 +49,17 @@ export interface WeeklySummary {
     dettagli_manuali?: ManualAdjustment[];
 }
 
+// Row of /production/summary?detail=totals: the dettagli_* lists are read
+// one week at a time from /production/summary/{anno}/{settimana}
+export interface WeeklySummaryTotals extends Omit<WeeklySummary,
+    "dettagli_produzione" | "dettagli_acquisti" | "dettagli_vendite" | "dettagli_manuali"> {
+    produzione_lorda: number;
+    produzione_netta: number;
+    manuali: number;
+    vendite_non_assegnate: number;
+    produzione_per_prodotto: Record<string, number>; // net production per prodotto
+}
+
 // Allevamenti Types
 export interface Lotto {
     id: number;
@@ -17,6 +17,7 @@ Uso:
 """
 
 import argparse
+import json
 import sys
 from collections import defaultdict
 
@@ -32,12 +33,19 @@ except ImportError:
 
 DEFAULT_BASE_URL = "http://localhost:8000"
 PRODUCTS = ["Granpollo", "Pollo70", "Color Yeald", "Ross"]
+AUTO_ASSIGN_ETA_MIN = 30
+AUTO_ASSIGN_ETA_MAX = 45
 
 
 def fetch_summary(base_url: str, prodotto: str):
-    r = requests.get(f"{base_url}/api/production/summary", params={"product": prodotto}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    """Streams the summary (format=ndjson) and yields one week at a time."""
+    with requests.get(f"{base_url}/api/production/summary",
+                      params={"product": prodotto, "format": "ndjson"},
+                      stream=True, timeout=30) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if line:
+                yield json.loads(line)
 
 
 def fetch_settings(base_url: str) -> dict:
@@ -49,6 +57,42 @@ def fetch_settings(base_url: str) -> dict:
         return {}
 
 
+def allocate_sales(dettagli: list, explicit: dict, vendite_total: int,
+                   auto_assign: bool = False) -> list:
+    """Net quantity of each detail after the sales, same rule as
+    backend/services/sales_allocation.py (kept here in plain Python so the
+    script only needs `requests`):
+
+      1. explicit[allevamento] is consumed from that shed's details in order;
+      2. with auto_assign, the residue (vendite - explicit) is taken from the
+         eta 30-45 details first, then the others, youngest first.
+    """
+    net = [det.get("quantita_lorda", det["quantita"]) for det in dettagli]
+    budget = dict(explicit)
+    for i, det in enumerate(dettagli):
+        allev = det["allevamento"]
+        take = min(net[i], max(budget.get(allev, 0), 0)) if allev else 0
+        if take:
+            net[i] -= take
+            budget[allev] -= take
+    if not auto_assign:
+        return net
+
+    remaining = max(0, vendite_total - sum(explicit.values()))
+
+    def order(i):
+        eta = dettagli[i].get("eta", 0)
+        return (not AUTO_ASSIGN_ETA_MIN <= eta <= AUTO_ASSIGN_ETA_MAX, eta, i)
+
+    for i in sorted(range(len(dettagli)), key=order):
+        if remaining <= 0:
+            break
+        take = min(net[i], remaining)
+        net[i] -= take
+        remaining -= take
+    return net
+
+
 def analyse_week(week: dict, auto_assign: bool = False) -> dict:
     """Returns a dict with the diagnostic numbers + a list of anomalies.
 
@@ -59,16 +103,12 @@ def analyse_week(week: dict, auto_assign: bool = False) -> dict:
     """
     lordo_per_allev: dict[str, int] = defaultdict(int)
     netto_per_allev: dict[str, int] = defaultdict(int)
-    eta_per_allev: dict[str, int] = {}
-    for det in week.get("dettagli_produzione", []):
+    dettagli = week.get("dettagli_produzione", [])
+    for det in dettagli:
         allev = det["allevamento"]
         # Multiple lotti can share an allevamento — sum them.
         lordo_per_allev[allev] += det.get("quantita_lorda", det["quantita"])
         netto_per_allev[allev] += det["quantita"]
-        # Keep the lowest eta seen for that shed (used to predict oldest-first).
-        eta = det.get("eta", 0)
-        if allev not in eta_per_allev or eta < eta_per_allev[allev]:
-            eta_per_allev[allev] = eta
 
     vendite_total = 0
     assegnato_per_allev: dict[str, int] = defaultdict(int)
@@ -91,25 +131,13 @@ def analyse_week(week: dict, auto_assign: bool = False) -> dict:
 
     non_assegnato = max(0, vendite_total - sum(assegnato_per_allev.values()))
 
-    # Pass 1 — explicit assignments win.
-    predicted_netto: dict[str, int] = {
-        allev: max(0, lordo - assegnato_per_allev.get(allev, 0))
-        for allev, lordo in lordo_per_allev.items()
-    }
-    # Pass 2 — only when auto_assign is enabled, distribute the residue with
-    # the 30-45-first / youngest-first rule. Matches production_service.
-    if auto_assign and non_assegnato > 0:
-        in_window = [a for a in predicted_netto if 30 <= eta_per_allev.get(a, 0) <= 45]
-        others = [a for a in predicted_netto if not (30 <= eta_per_allev.get(a, 0) <= 45)]
-        in_window.sort(key=lambda a: eta_per_allev.get(a, 0))
-        others.sort(key=lambda a: eta_per_allev.get(a, 0))
-        remaining = non_assegnato
-        for a in in_window + others:
-            if remaining <= 0:
-                break
-            take = min(predicted_netto[a], remaining)
-            predicted_netto[a] -= take
-            remaining -= take
+    # Predicted net per shed from the gross details, with the backend's own
+    # rule: explicit assignments first, then (auto_assign) the residue.
+    predicted = allocate_sales(dettagli, dict(assegnato_per_allev), vendite_total, auto_assign)
+    predicted_netto: dict[str, int] = defaultdict(int)
+    for det, netto in zip(dettagli, predicted):
+        predicted_netto[det["allevamento"]] += netto
+    predicted_netto = dict(predicted_netto)
 
     anomalie: list[str] = []
     if over_assign_vendite:
@@ -215,12 +243,14 @@ def main():
         print(f"PRODOTTO: {prodotto}")
         print("=" * 72)
         try:
-            summary = fetch_summary(args.url, prodotto)
+            weeks_with_sales = [
+                w for w in fetch_summary(args.url, prodotto)
+                if w.get("vendite_totale", 0) > 0 or w.get("dettagli_vendite")
+            ]
         except Exception as e:
             print(f"  ERRORE: {e}")
             continue
 
-        weeks_with_sales = [w for w in summary if w.get("vendite_totale", 0) > 0 or w.get("dettagli_vendite")]
         if not weeks_with_sales:
             print("  Nessuna vendita registrata.")
             continue
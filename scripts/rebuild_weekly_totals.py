@@ -0,0 +1,30 @@
+"""
+RICOSTRUZIONE WEEKLY_PRODUCT_TOTALS - Incubatoio Manager
+========================================================
+Rigenera da zero la tabella materializzata dei totali settimanali per
+prodotto (services/weekly_totals.py) leggendo direttamente il database
+del backend. Da usare dopo import massivi o modifiche fatte fuori dall'API.
+
+Uso:
+    python scripts/rebuild_weekly_totals.py
+"""
+
+import os
+import sys
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from database import init_db  # noqa: E402
+from services import weekly_totals  # noqa: E402
+
+
+def main():
+    init_db()
+    stats = weekly_totals.rebuild()
+    print(f"weekly_product_totals rigenerata: {stats['written']} righe")
+
+
+if __name__ == "__main__":
+    main()